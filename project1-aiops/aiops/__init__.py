@@ -0,0 +1,9 @@
+"""
+AIOps platform: NAB ingestion, anomaly detection, forecasting and the
+CPU investigation agent, behind one command line:
+
+    python -m aiops {ingest,convert,analyze,forecast,investigate,serve,render,replay} ...
+
+Importing the package is cheap on purpose; every command imports its
+dependencies (pandas, scikit-learn, prophet, langchain, ...) only when it runs.
+"""
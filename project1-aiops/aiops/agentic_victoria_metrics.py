@@ -0,0 +1,351 @@
+# tools/vm_cpu_tool.py
+from langchain_core.tools import StructuredTool
+import contextvars
+import datetime
+import json
+import numpy as np
+
+from .config import config
+from .export_format import escape_label_value
+from .query_client import QueryError, afetch_range, fetch_range, parse_duration, parse_time
+from .ts_cache import TTLCache, config_cache
+
+VM_URL = "http://localhost:8428/prometheus"
+# NAB history is immutable: repeated investigations of the same host/window are served
+# from disk (ts_cache.config_cache(): the [Cache] section shared with analyze / forecast)
+# finished tool results: an agent often repeats a call within one investigation
+RESULTS = TTLCache(config.getfloat('Agent', 'CacheTTL', fallback=300))
+# points of the downsampled series handed to the model
+MAX_SAMPLES = config.getint('Agent', 'MaxSamples', fallback=48)
+# investigations run at once by investigate_many()
+CONCURRENCY = config.getint('Agent', 'Concurrency', fallback=4)
+# httpx.AsyncClient shared by the async tool calls of one investigate_many() batch
+HTTP_CLIENT = contextvars.ContextVar("HTTP_CLIENT", default=None)
+
+def iso(ts):
+    return datetime.datetime.fromtimestamp(float(ts), datetime.timezone.utc).replace(tzinfo=None).isoformat()
+
+def downsample(timestamps, values, max_points=MAX_SAMPLES, step=0.0):
+    """
+    Buckets a series into at most max_points equal time buckets (a multiple
+    of step wide) and returns (bucket seconds, {"time", "min", "mean", "max"}
+    arrays) for the non-empty buckets, time being each bucket's start.
+    """
+    span = float(timestamps[-1] - timestamps[0]) + max(step, 1e-9)
+    width = span / max_points
+    if step:
+        width = np.ceil(width / step) * step
+    ids = ((timestamps - timestamps[0]) // width).astype(np.int64)
+    firsts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+    counts = np.diff(np.r_[firsts, len(values)])
+    return width, {"time": timestamps[0] + ids[firsts] * width,
+                   "min": np.minimum.reduceat(values, firsts),
+                   "mean": np.add.reduceat(values, firsts) / counts,
+                   "max": np.maximum.reduceat(values, firsts)}
+
+def cpu_query(host):
+    return f'nab_aws_cpu_value{{host="{escape_label_value(host)}"}}'
+
+def cpu_summary(host, start, end, step="5m", max_samples=MAX_SAMPLES):
+    """
+    CPU statistics of host over [start, end] and a downsampled series of at
+    most max_samples points, or {"error": ...}. Points come through the disk
+    cache, statistics are computed with NumPy and values rounded to 3 decimals.
+    """
+    try:
+        data = fetch_range(VM_URL, cpu_query(host), start, end, step, timeout=60,
+                           cache=config_cache(), limit=100)
+    except QueryError as e:
+        return {"error": f"Query failed: {e}"}
+    return summarize(data, host, start, end, step, max_samples)
+
+async def acpu_summary(host, start, end, step="5m", max_samples=MAX_SAMPLES):
+    """
+    cpu_summary() for asyncio callers, on HTTP_CLIENT (or a client of its own).
+
+    The points are always fetched from the server, not through the disk
+    cache: SeriesCache is synchronous and holds its lock while it fetches,
+    which would serialize concurrent investigations. Finished summaries are
+    still shared with the sync path through RESULTS.
+    """
+    import httpx
+
+    client = HTTP_CLIENT.get()
+    try:
+        if client is not None:
+            data = await afetch_range(client, VM_URL, cpu_query(host), start, end, step,
+                                      timeout=60, limit=100)
+        else:
+            async with httpx.AsyncClient() as own:
+                data = await afetch_range(own, VM_URL, cpu_query(host), start, end, step,
+                                          timeout=60, limit=100)
+    except (QueryError, httpx.HTTPError) as e:
+        return {"error": f"Query failed: {e}"}
+    return summarize(data, host, start, end, step, max_samples)
+
+def summarize(data, host, start, end, step="5m", max_samples=MAX_SAMPLES):
+    """The cpu_summary() result for the query_range result `data`."""
+    if not data:
+        return {"error": "No data found for given host/time range"}
+
+    # Flatten values into arrays, dropping non-numeric (NaN/Inf) samples
+    values = np.concatenate([series.values for series in data])
+    timestamps = np.concatenate([series.timestamps for series in data])
+    valid = np.isfinite(values)
+    values, timestamps = values[valid], timestamps[valid]
+    order = np.argsort(timestamps, kind="stable")
+    values, timestamps = values[order], timestamps[order]
+
+    if not len(values):
+        return {"error": "No valid numeric values found"}
+
+    # Compute stats
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    peak = int(values.argmax())
+    stats = {
+        "count": int(len(values)),
+        "min": round(float(values.min()), 3),
+        "max": round(float(values.max()), 3),
+        "mean": round(float(values.mean()), 3),
+        "median": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "stdev": round(float(values.std()), 3) if len(values) > 1 else 0,
+        "max_time": iso(timestamps[peak]),
+        "first_point": {"time": iso(timestamps[0]), "value": round(float(values[0]), 3)},
+        "last_point": {"time": iso(timestamps[-1]), "value": round(float(values[-1]), 3)},
+    }
+
+    width, buckets = downsample(timestamps, values, max_samples, parse_duration(step))
+    rows = [[iso(t), round(lo, 3), round(mean, 3), round(hi, 3)] for t, lo, mean, hi in
+            zip(buckets["time"].tolist(), buckets["min"].tolist(), buckets["mean"].tolist(),
+                buckets["max"].tolist())]
+
+    return {
+        "host": host,
+        "start": start,
+        "end": end,
+        "step": step,
+        "stats": stats,
+        "samples": {"bucket_seconds": float(width), "columns": ["time", "min", "mean", "max"],
+                    "rows": rows},
+    }
+
+def _cache_key(host, start, end, step):
+    return host, parse_time(start), parse_time(end), parse_duration(step)
+
+def _query_cpu(host: str, start: str, end: str, step: str = "5m") -> dict:
+    """
+    Query CPU usage for a given host from VictoriaMetrics and return statistics.
+    
+    Args:
+        host: Hostname or ID.
+        start: Start time (RFC3339).
+        end: End time (RFC3339).
+        step: Resolution step (default: 5m).
+    
+    Returns:
+        Dict with CPU statistics (min, max, mean, median, p95, p99, stdev,
+        time of the max) and the series downsampled to at most {max_samples}
+        rows of [bucket start, min, mean, max].
+    """
+    try:
+        key = _cache_key(host, start, end, step)
+    except ValueError as e:
+        return {"error": f"Invalid time range or step: {e}"}
+    result = RESULTS.get(key)
+    if result is None:
+        result = cpu_summary(host, start, end, step)
+        if "error" not in result:
+            RESULTS.put(key, result)
+    return result
+
+# the tool description the model reads: state the configured [Agent] MaxSamples
+if _query_cpu.__doc__:  # None under python -OO
+    _query_cpu.__doc__ = _query_cpu.__doc__.format(max_samples=MAX_SAMPLES)
+
+async def _aquery_cpu(host: str, start: str, end: str, step: str = "5m") -> dict:
+    try:
+        key = _cache_key(host, start, end, step)
+    except ValueError as e:
+        return {"error": f"Invalid time range or step: {e}"}
+    result = RESULTS.get(key)
+    if result is None:
+        result = await acpu_summary(host, start, end, step)
+        if "error" not in result:
+            RESULTS.put(key, result)
+    return result
+
+# sync for agent.invoke, async (no blocking requests.get) for ainvoke / abatch
+query_cpu = StructuredTool.from_function(func=_query_cpu, coroutine=_aquery_cpu,
+                                         name="query_cpu")
+
+
+def triage_windows(start, end, step="5m", top_k=None, selector="nab_aws_cpu_value",
+                   min_suspicion=1.0):
+    """
+    Pulls every host of selector over [start, end] in one query, ranks them
+    (triage.rank_series) and returns (ranking, windows): investigate_many()
+    windows for the top_k hosts at or above min_suspicion, each carrying its
+    query_cpu result as "stats" (also stored in the tool's cache).
+    """
+    from .triage import TOP_K, host_name, rank_series
+
+    top_k = TOP_K if top_k is None else top_k
+    series = fetch_range(VM_URL, selector, start, end, step, timeout=60, cache=config_cache())
+    if not series:
+        return [], []
+    ranking = rank_series(series, start, end, step)
+    by_host = {host_name(s.labels): s for s in series}
+    windows = []
+    for entry in ranking[:top_k]:
+        if entry["suspicion"] < min_suspicion:
+            break
+        stats = summarize([by_host[entry["host"]]], entry["host"], start, end, step)
+        if "error" in stats:
+            continue
+        stats["triage"] = {k: v for k, v in entry.items() if k != "host"}
+        RESULTS.put(_cache_key(entry["host"], start, end, step), stats)
+        windows.append({"host": entry["host"], "start": start, "end": end, "stats": stats})
+    return ranking, windows
+
+
+# aiops_agent.py
+from langchain_ollama import ChatOllama
+from langgraph.prebuilt import create_react_agent
+# from tools.vm_cpu_tool import query_cpu
+import os
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI # or from langchain_community.chat_models import ChatOpenAI
+
+load_dotenv()
+
+# model_name = "qwen2.5:1.5b"
+# llm = ChatOllama(model="qwen2.5:1.5b")
+#llm = ChatOllama(model=model_name, base_url="http://localhost:11434")
+llm = ChatOpenAI(
+    base_url="https://openrouter.ai/api/v1",
+    model_name="qwen/qwen3-235b-a22b:free", # Replace with your desired model
+    openai_api_key=os.environ.get("OPENROUTER_API_KEY")
+)
+tools = [query_cpu]
+
+def make_agent(model=None):
+    """The ReAct agent over `tools`, on model (default: llm above)."""
+    return create_react_agent(
+        model=model or llm,
+        tools=tools,
+        prompt="You are an AIOps assistant that can call tools for data. Use tools when needed."
+    )
+
+# Create the agent
+agent = make_agent()
+
+def build_prompt(host: str, start: str, end: str, stats: dict = None) -> str:
+    # Build a clear user message and required schema so agent knows to call the tool
+    if stats is not None:
+        # triage already holds what the tool would return: spare the agent the round trip
+        return (
+            f"Investigate CPU for host={host} from {start} to {end}.\n"
+            "CPU statistics for this range (the query_cpu tool result) are already attached "
+            "below; call the tool only for a different range.\n"
+            f"Stats: {json.dumps(stats, separators=(',', ':'))}\n"
+            "Steps: (1) Summarize CPU Health with min/mean/max/stdev. "
+            "(2) Give Possible Root Cause hypotheses and Troubleshooting steps.\n"
+            "Return concise maximum 200 words final answer with headings: CPU Health, Possible Root Cause, Troubleshooting / Solution."
+        )
+    return (
+        f"Investigate CPU for host={host} from {start} to {end}.\n"
+        "You have access to a tool that returns CPU statistics for the requested range.\n"
+        "Steps: (1) Use the tool to fetch CPU stats. (2) Summarize CPU Health with min/mean/max/stdev. "
+        "(3) Give Possible Root Cause hypotheses and Troubleshooting steps.\n"
+        "Return concise maximum 200 words final answer with headings: CPU Health, Possible Root Cause, Troubleshooting / Solution."
+    )
+
+def investigate_cpu(host: str, start: str, end: str, stats: dict = None):
+    user_prompt = build_prompt(host, start, end, stats)
+
+    # IMPORTANT: pass messages key (correct input shape)
+    response = agent.invoke({"messages": [{"role": "user", "content": user_prompt}]})
+
+    # response is a dict with 'messages' list and optionally 'structured_response'
+    # Inspect messages to find assistant final reply:
+    # messages = response.get("messages", [])
+    # The final assistant message is often the last message with role 'assistant'
+    # assistant_texts = [m.get("content", "") for m in messages if m.get("role") == "assistant"]
+    # final_text = assistant_texts[-1] if assistant_texts else ""
+
+    # Optionally, inspect structured_response if present:
+    # structured = response.get("structured_response")
+
+    # return {"raw": response, "final_text": final_text, "structured": structured}
+    return response
+
+async def investigate_many(windows, concurrency: int = CONCURRENCY, react_agent=None):
+    """
+    Investigates [{"host", "start", "end"[, "stats"]}, ...] concurrently and yields
+    (window, response) as each investigation finishes, or (window,
+    exception) for one that failed. At most `concurrency` run at once
+    (abatch_as_completed); their query_cpu calls share one httpx.AsyncClient
+    and bypass the disk cache (see acpu_summary).
+    """
+    import httpx
+
+    react_agent = react_agent or agent
+    inputs = [{"messages": [{"role": "user",
+                             "content": build_prompt(w["host"], w["start"], w["end"],
+                                                     w.get("stats"))}]}
+              for w in windows]
+    limits = httpx.Limits(max_connections=max(concurrency, 1) * 2)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        token = HTTP_CLIENT.set(client)
+        try:
+            async for i, response in react_agent.abatch_as_completed(
+                    inputs, config={"max_concurrency": concurrency}, return_exceptions=True):
+                yield windows[i], response
+        finally:
+            HTTP_CLIENT.reset(token)
+
+def load_windows(path: str) -> list:
+    """Investigation windows from a JSON list or JSON lines of {"host", "start", "end"}."""
+    with open(path) as fh:
+        text = fh.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+async def _print_as_completed(windows, concurrency):
+    done = 0
+    async for window, response in investigate_many(windows, concurrency):
+        done += 1
+        print(f"=== [{done}/{len(windows)}] {window['host']} {window['start']} .. {window['end']}")
+        if isinstance(response, Exception):
+            print(f"Investigation failed: {response!r}\n")
+        else:
+            print(response['messages'][-1].content + "\n", flush=True)
+
+def run(args):
+    """Entry point of `aiops investigate` (see cli.py for the arguments)."""
+    import asyncio
+
+    if args.triage:
+        ranking, windows = triage_windows(args.start, args.end, top_k=args.top_k,
+                                          selector=args.selector)
+        print(f"{'host':<40} {'suspicion':>9} {'spike':>8} {'shift':>7}  shift at")
+        for entry in ranking:
+            print(f"{entry['host']:<40} {entry['suspicion']:>9.2f} {entry['spike']:>8.1f} "
+                  f"{entry['shift']:>7.2f}  {entry['shift_time']}")
+        print(f"\n{len(windows)} of {len(ranking)} hosts selected for investigation.\n")
+        if not windows:
+            return
+    elif args.windows:
+        windows = load_windows(args.windows)
+    else:
+        windows = [{"host": host, "start": args.start, "end": args.end} for host in args.host]
+    if len(windows) == 1 and not args.triage:
+        window = windows[0]
+        out = investigate_cpu(window["host"], window["start"], window["end"],
+                              window.get("stats"))
+        print(out['messages'][-1].content)
+        return
+    asyncio.run(_print_as_completed(windows, args.concurrency or CONCURRENCY))
@@ -0,0 +1,276 @@
+"""
+analysis_daemon.py
+
+Resident analysis service: loads configuration, libraries and per-series
+state once, then runs a cycle every [Daemon] Interval seconds:
+
+  1. pulls only the samples newer than the previous cycle (the first cycle
+     pulls Lookback seconds of history to warm up)
+  2. scores the new points with the streaming detectors (online_detectors)
+     and imports the scores into VictoriaMetrics
+  3. every ForecastInterval seconds, forecasts every series from the
+     in-memory history window (forecasters / forecast_engine) and imports
+     yhat, yhat_lower and yhat_upper
+
+Detector state and the pull cursor are saved to StateFile after every cycle,
+so a restarted daemon continues where it stopped instead of rescoring.
+SIGINT / SIGTERM finish the current cycle, save and exit. With
+[Daemon] MetricsPort (or --metrics-port) the per-stage timings of every
+cycle (instrumentation.py) are served on http://<host>:<port>/metrics.
+
+Usage:
+  python -m aiops serve [--selector 'cpu{job="x"}'] [--interval 60] [--once] [--metrics-port 9464]
+"""
+import json
+import logging
+import math
+import os
+import signal
+import time
+
+import numpy as np
+import pandas as pd
+
+from .config import config, log_file, resolve_path
+from .export_format import format_samples, import_url, post_lines
+from .forecasters import make_forecaster
+from .instrumentation import serve_stage_metrics, stage
+from .matrix_scoring import align_series
+from .online_detectors import StreamingScorer
+from .query_client import fetch_range, make_session, parse_duration, series_key
+
+PROMETHEUS_API = config['Prometheus']['API']
+VM_URL = config.get('VictoriaMetrics', 'URL', fallback='http://localhost:8428')
+EXPORT_BATCH_SIZE = config.getint('Export', 'BatchSize', fallback=5000)
+EXPORT_FORMAT = config.get('Export', 'Format', fallback='prometheus')
+DETECTOR = config.get('Analysis', 'Detector', fallback='ewma')
+BACKEND = config.get('Forecast', 'Backend', fallback='prophet')
+SEASON = config.getint('Forecast', 'Season', fallback=288)
+HORIZON = config.getint('Forecast', 'Horizon', fallback=288)
+MODEL_DIR = resolve_path(config.get('Forecast', 'ModelDir', fallback='../data/models'))
+MAX_MODEL_AGE = config.getfloat('Forecast', 'MaxModelAge', fallback=86400)
+REFIT_AFTER = config.getint('Forecast', 'RefitAfter', fallback=288)
+SELECTOR = config.get('Daemon', 'Selector', fallback='numenta_cpu_aws')
+INTERVAL = config.getfloat('Daemon', 'Interval', fallback=60)
+STEP = config.get('Daemon', 'Step', fallback='300')
+LOOKBACK = config.getfloat('Daemon', 'Lookback', fallback=14 * 86400)
+LAG = config.getfloat('Daemon', 'Lag', fallback=60)
+FORECAST_INTERVAL = config.getfloat('Daemon', 'ForecastInterval', fallback=3600)
+STATE_FILE = resolve_path(config.get('Daemon', 'StateFile', fallback='../data/state/daemon.json'))
+METRICS_PORT = config.getint('Daemon', 'MetricsPort', fallback=0)
+LOG_FILE = log_file('daemon.log')
+
+# Configure logging
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+def output_labels(labels, job):
+    out = {k: v for k, v in labels.items() if k != '__name__'}
+    out.setdefault('job', job)
+    return out
+
+class AnalysisDaemon:
+    """Per-series detector state, history window and pull cursor of one selector."""
+
+    def __init__(self, selector=SELECTOR, step=STEP, lookback=LOOKBACK, lag=LAG,
+                 detector=DETECTOR, backend=BACKEND, forecast_interval=FORECAST_INTERVAL,
+                 horizon=HORIZON, state_file=STATE_FILE, workers=None):
+        self.selector = selector
+        self.step = parse_duration(step)
+        self.lookback = lookback
+        self.lag = lag
+        self.backend = backend
+        self.forecast_interval = forecast_interval
+        self.horizon = horizon
+        self.state_file = state_file
+        self.workers = workers
+        self.scorer = StreamingScorer(detector)
+        self.cursor = None
+        self.last_forecast = 0.0
+        self.labels = {}
+        self.history = {}
+        self.session = make_session(4)
+        self.stopping = False
+        self.load_state()
+
+    def load_state(self):
+        """Restores detector state and the pull cursor saved by a previous run."""
+        try:
+            with open(self.state_file) as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return
+        if state.get('selector') != self.selector or state.get('step') != self.step:
+            logging.info("Ignoring state for %s/%s in %s", state.get('selector'),
+                         state.get('step'), self.state_file)
+            return
+        self.scorer = StreamingScorer.from_state(state['scorer'])
+        self.cursor = state['cursor']
+        self.last_forecast = state.get('last_forecast', 0.0)
+        logging.info("Restored state of %d series, cursor %s", len(self.scorer.detectors),
+                     self.cursor)
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        tmp = self.state_file + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump({'selector': self.selector, 'step': self.step, 'cursor': self.cursor,
+                       'last_forecast': self.last_forecast,
+                       'scorer': self.scorer.get_state()}, fh)
+        os.replace(tmp, self.state_file)
+
+    def pull(self, now):
+        """Fetches the samples since the cursor (or the lookback window when the history is empty)."""
+        end = math.floor((now - self.lag) / self.step) * self.step
+        if self.history and self.cursor is not None:
+            start = self.cursor + self.step
+        else:
+            start = end - self.lookback
+        if start > end:
+            return end, []
+        results = fetch_range(PROMETHEUS_API, self.selector, start, end, self.step,
+                              session=self.session)
+        return end, results
+
+    def update_history(self, results, end):
+        """Appends new samples to each series' window and drops those older than lookback."""
+        oldest = end - self.lookback
+        for r in results:
+            key = series_key(r.labels)
+            self.labels[key] = r.labels
+            ts, vals = self.history.get(key, (np.empty(0), np.empty(0)))
+            new = r.timestamps > (ts[-1] if len(ts) else -np.inf)
+            self.history[key] = (np.concatenate([ts, r.timestamps[new]]),
+                                 np.concatenate([vals, r.values[new]]))
+        for key, (ts, vals) in list(self.history.items()):
+            keep = ts >= oldest
+            if not keep.any():
+                del self.history[key]
+            elif not keep.all():
+                self.history[key] = (ts[keep], vals[keep])
+
+    def score(self, results):
+        """Feeds new points to the per-series detectors; returns export lines for their scores."""
+        lines, points = [], 0
+        for r in results:
+            key = series_key(r.labels)
+            ts, scores = self.scorer.update(key, r.timestamps, r.values)
+            ok = ~np.isnan(scores)
+            points += int(ok.sum())
+            if ok.any():
+                lines.extend(format_samples('aws_cpu_anomaly_score',
+                                            output_labels(r.labels, 'anomaly_analysis'),
+                                            ts[ok], scores[ok], EXPORT_FORMAT).tolist())
+        return lines, points
+
+    def forecast(self, end):
+        """Forecasts every series in the history window; returns export lines."""
+        series = dict(self.history)
+        forecasts = {}
+        if self.backend == 'prophet':
+            # only series past MaxModelAge / RefitAfter are refitted (warm-started)
+            from .forecast_engine import forecast_many
+
+            for key, forecast, info in forecast_many(series, MODEL_DIR, self.horizon,
+                                                     workers=self.workers, step=self.step,
+                                                     max_age=MAX_MODEL_AGE, refit_after=REFIT_AFTER):
+                if forecast is None:
+                    logging.error("Forecast failed for %s: %s", key, info['error'])
+                else:
+                    forecasts[key] = forecast
+        else:
+            grid, matrix = align_series(list(series.values()), end - self.lookback, end, self.step)
+            with stage("forecast", rows=matrix.size):
+                yhat, lower, upper = make_forecaster(self.backend, season=SEASON).forecast(
+                    matrix, self.horizon, grid)
+            ds = pd.to_datetime(end + self.step * np.arange(1, self.horizon + 1), unit='s')
+            n = len(grid)
+            for i, key in enumerate(series):
+                forecasts[key] = pd.DataFrame({'ds': ds, 'yhat': yhat[i, n:],
+                                               'yhat_lower': lower[i, n:],
+                                               'yhat_upper': upper[i, n:]})
+        lines = []
+        for key, forecast in forecasts.items():
+            labels = output_labels(self.labels[key], 'trend_forecast')
+            ts = (forecast['ds'] - pd.Timestamp(0)).dt.total_seconds()
+            for column, suffix in (('yhat', ''), ('yhat_lower', '_lower'), ('yhat_upper', '_upper')):
+                lines.extend(format_samples('forecast' + suffix, labels, ts, forecast[column],
+                                            EXPORT_FORMAT).tolist())
+        return lines, len(forecasts)
+
+    def run_cycle(self, now=None):
+        """One pull / score / (forecast) / push cycle. Returns a summary dict."""
+        now = now if now is not None else time.time()
+        with stage("cycle") as cycle:
+            with stage("pull") as pull:
+                end, results = self.pull(now)
+                pull.add(rows=sum(len(r.timestamps) for r in results))
+            # score() advances the detectors' watermarks; keep the previous state so a
+            # failed push rolls them back and the next cycle rescores the same points
+            scorer_state, last_forecast = self.scorer.get_state(), self.last_forecast
+            try:
+                with stage("score") as score:
+                    self.update_history(results, end)
+                    lines, scored = self.score(results)
+                    score.add(rows=scored)
+                forecasted, forecast_s = 0, 0.0
+                if self.history and now - self.last_forecast >= self.forecast_interval:
+                    with stage("forecast_cycle") as forecast:
+                        forecast_lines, forecasted = self.forecast(end)
+                    lines.extend(forecast_lines)
+                    self.last_forecast, forecast_s = now, forecast.seconds
+                pushed = post_lines(self.session, import_url(VM_URL, EXPORT_FORMAT), lines,
+                                    EXPORT_BATCH_SIZE) if lines else 0
+            except Exception:
+                self.scorer = StreamingScorer.from_state(scorer_state)
+                self.last_forecast = last_forecast
+                raise
+            self.cursor = end
+            self.save_state()
+            cycle.add(rows=pushed)
+        summary = {'series': len(results), 'scored': scored, 'forecasted': forecasted,
+                   'pushed': pushed, 'pull_s': pull.seconds, 'score_s': score.seconds,
+                   'forecast_s': forecast_s, 'total_s': cycle.seconds}
+        logging.info("Cycle up to %s: %d series, %d points scored, %d forecasts, %d samples "
+                     "pushed; pull %.2fs, score %.2fs, forecast %.2fs, total %.2fs", end,
+                     summary['series'], scored, forecasted, pushed, summary['pull_s'],
+                     summary['score_s'], summary['forecast_s'], summary['total_s'])
+        return summary
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self, interval=INTERVAL):
+        """Runs a cycle every `interval` seconds until stop() (SIGINT / SIGTERM)."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        logging.info("Analysis daemon started for %s every %ss", self.selector, interval)
+        next_run = time.monotonic()
+        while not self.stopping:
+            try:
+                self.run_cycle()
+            except Exception as e:
+                # keep serving: the cursor and detector state only advance on success,
+                # so the next cycle retries
+                logging.error("Analysis cycle failed: %s", e)
+            next_run += interval
+            while not self.stopping and time.monotonic() < next_run:
+                time.sleep(min(1.0, next_run - time.monotonic()))
+            next_run = max(next_run, time.monotonic())
+        self.session.close()
+        logging.info("Analysis daemon stopped.")
+
+def run(args):
+    """Entry point of `aiops serve` (see cli.py for the arguments)."""
+    daemon = AnalysisDaemon(selector=args.selector or SELECTOR, step=args.step or STEP,
+                            backend=args.backend or BACKEND, workers=args.workers)
+    port = args.metrics_port if args.metrics_port is not None else METRICS_PORT
+    if port and not args.once:
+        serve_stage_metrics(port)
+    if args.once:
+        daemon.run_cycle()
+    else:
+        daemon.run(args.interval or INTERVAL)
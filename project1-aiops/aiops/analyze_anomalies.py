@@ -0,0 +1,244 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+import requests
+from .anomaly_models import score_many, score_series
+from .config import config, log_file, resolve_path
+from .export_format import format_samples, import_url, post_batch, post_lines
+from .instrumentation import stage
+from .online_detectors import StreamingScorer
+from .matrix_scoring import align_series, score_matrix
+from .query_client import fetch_range, floor_step, series_key
+from .ts_cache import config_cache
+
+PROMETHEUS_GATEWAY = config['Prometheus']['PushGateway']
+PROMETHEUS_API = config['Prometheus']['API']
+VM_URL = config.get('VictoriaMetrics', 'URL', fallback='http://localhost:8428')
+EXPORT_BATCH_SIZE = config.getint('Export', 'BatchSize', fallback=5000)
+EXPORT_FORMAT = config.get('Export', 'Format', fallback='prometheus')
+DETECTOR = config.get('Analysis', 'Detector', fallback='ewma')
+# [Analysis] Detector and `analyze --method` name the stored-model detector alike
+MODEL_DETECTOR = 'isolation_forest_model'
+MODEL_DIR = resolve_path(config.get('Analysis', 'ModelDir', fallback='../data/models/iforest'))
+MODEL_PARAMS = {
+    'max_age': config.getfloat('Analysis', 'MaxModelAge', fallback=86400),
+    'drift_threshold': config.getfloat('Analysis', 'DriftThreshold', fallback=3.0),
+    'min_drift_points': config.getint('Analysis', 'DriftPoints', fallback=12),
+    'keep_versions': config.getint('Analysis', 'KeepVersions', fallback=3),
+}
+LOG_FILE = log_file('analysis.log')
+
+# Configure logging
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+def pull_from_prometheus(metric_name):
+    """Fetches data from Prometheus and preprocesses it."""
+    try:
+        cache = config_cache()
+        results = fetch_range(PROMETHEUS_API, 'numenta_cpu_aws{instance="cloudwatch_benchmark"}',
+                              "1754604140", "1755814940", "300.0", cache=cache)
+
+        # Log the raw data structure for debugging
+        logging.debug("Raw data from Prometheus: %s", [r.labels for r in results[:5]])
+
+        if not any(len(r.timestamps) for r in results):
+            logging.error("No valid data found for metric: %s", metric_name)
+            raise ValueError("No data available for the specified metric.")
+
+        df = pd.DataFrame({"timestamp": np.concatenate([r.timestamps for r in results]),
+                           "value": np.concatenate([r.values for r in results])})
+        logging.info("Data pulled and preprocessed from Prometheus for metric: %s", metric_name)
+        if cache is not None:
+            logging.info("Query cache: %s", cache.stats())
+        return df
+    except Exception as e:
+        logging.error("Error pulling data from Prometheus: %s", e)
+        raise
+
+def detect_anomalies(data, key='default', store_root=MODEL_DIR):
+    """Scores points with the stored windowed-feature IsolationForest of key (anomaly_models).
+
+    Returns the scored rows with a continuous 'anomaly_score' (higher is
+    more anomalous); the model is only refitted on drift or once it is
+    older than [Analysis] MaxModelAge.
+    """
+    try:
+        data = data.sort_values('timestamp').drop_duplicates('timestamp', keep='last')
+        data = data[np.isfinite(data['value'])]
+        with stage("score", rows=len(data)):
+            _, timestamps, scores, info = score_series(key, data['timestamp'], data['value'],
+                                                       store_root, **MODEL_PARAMS)
+        scored = data.iloc[len(data) - len(timestamps):].copy()
+        scored['anomaly_score'] = scores
+        logging.info("Anomaly detection completed for %s: %d points, model v%d (%s).",
+                     key, len(scored), info['version'], info['model'])
+        return scored
+    except Exception as e:
+        logging.error("Error during anomaly detection: %s", e)
+        raise
+
+def detect_anomalies_streaming(data, scorer=None, key='default', kind=DETECTOR):
+    """Scores points with an online detector; only points newer than the series watermark are scored.
+
+    Returns the new rows with a continuous 'anomaly_score' (robust/EWMA
+    z-score). Pass the same scorer across calls to keep per-series state.
+    """
+    try:
+        scorer = scorer if scorer is not None else StreamingScorer(kind)
+        data = data.sort_values('timestamp')
+        with stage("score", rows=len(data)):
+            timestamps, scores = scorer.update(key, data['timestamp'], data['value'])
+        scored = data.iloc[len(data) - len(timestamps):].copy()
+        scored['anomaly_score'] = scores
+        logging.info("Streaming anomaly scoring completed: %d new points for %s.", len(scored), key)
+        return scored
+    except Exception as e:
+        logging.error("Error during streaming anomaly detection: %s", e)
+        raise
+
+def push_anomalies_to_prometheus(anomaly_scores):
+    """Pushes anomaly scores to Prometheus, one Pushgateway request per score.
+
+    Use push_anomalies_bulk to export the scored history in a few requests,
+    with the timestamp of every point.
+    """
+    try:
+        registry = CollectorRegistry()
+        gauge = Gauge('aws_cpu_anomaly_score', 'Anomaly Score', registry=registry)
+        for score in anomaly_scores:
+            gauge.set(score)
+            push_to_gateway(PROMETHEUS_GATEWAY, job='anomaly_analysis', registry=registry)
+        logging.info("Anomaly scores pushed to Prometheus.")
+    except Exception as e:
+        logging.error("Failed to push anomaly scores to Prometheus: %s", e)
+        raise
+
+def push_anomalies_bulk(data, metric_name='aws_cpu_anomaly_score', labels=None,
+                        url=VM_URL, batch_size=EXPORT_BATCH_SIZE, fmt=EXPORT_FORMAT,
+                        session=None):
+    """Pushes every scored point, with its timestamp, in batches of batch_size lines.
+
+    data is the DataFrame returned by detect_anomalies ('timestamp' in Unix
+    seconds and 'anomaly_score'). One HTTP request is sent per batch over a
+    single keep-alive session. Returns the number of samples pushed.
+    """
+    labels = labels if labels is not None else {'job': 'anomaly_analysis'}
+    endpoint = import_url(url, fmt)
+    own_session = session is None
+    session = session or requests.Session()
+    try:
+        lines = format_samples(metric_name, labels, data['timestamp'], data['anomaly_score'], fmt)
+        for i in range(0, len(lines), batch_size):
+            post_batch(session, endpoint, lines.iloc[i:i + batch_size])
+        logging.info("Pushed %d anomaly scores to %s in %d request(s).",
+                     len(lines), endpoint, -(-len(lines) // batch_size))
+        return len(lines)
+    except Exception as e:
+        logging.error("Failed to bulk push anomaly scores to %s: %s", endpoint, e)
+        raise
+    finally:
+        if own_session:
+            session.close()
+
+def pull_series_matrix(selector, start, end, step, session=None):
+    """Fetches every series matching selector as one NaN-padded series x time matrix.
+
+    Returns (labels, grid, matrix): labels[i] is the label dict of row i and
+    grid holds the Unix-second timestamps of the columns.
+    """
+    try:
+        cache = config_cache()
+        results = fetch_range(PROMETHEUS_API, selector, start, end, step, session=session,
+                              cache=cache)
+        if not results:
+            raise ValueError(f"No series match {selector}")
+        labels = [r.labels for r in results]
+        series = [(r.timestamps, r.values) for r in results]
+        grid, matrix = align_series(series, floor_step(float(start), float(step)), float(end),
+                                    float(step))
+        logging.info("Pulled %d series x %d steps for %s", len(labels), len(grid), selector)
+        if cache is not None:
+            logging.info("Query cache: %s", cache.stats())
+        return labels, grid, matrix
+    except Exception as e:
+        logging.error("Error pulling series matrix from Prometheus: %s", e)
+        raise
+
+def push_matrix_scores(labels, grid, scores, metric_name='aws_cpu_anomaly_score',
+                       url=VM_URL, batch_size=EXPORT_BATCH_SIZE, fmt=EXPORT_FORMAT):
+    """Pushes the scores of every series in one batched export; NaN cells are skipped."""
+    endpoint = import_url(url, fmt)
+    try:
+        def score_lines():
+            for series_labels, row in zip(labels, scores):
+                ok = ~np.isnan(row)
+                out_labels = {k: v for k, v in series_labels.items() if k != '__name__'}
+                out_labels.setdefault('job', 'anomaly_analysis')
+                yield from format_samples(metric_name, out_labels, grid[ok], row[ok], fmt).tolist()
+
+        with requests.Session() as session:
+            sent = post_lines(session, endpoint, score_lines(), batch_size)
+        logging.info("Pushed %d anomaly scores for %d series to %s.", sent, len(labels), endpoint)
+        return sent
+    except Exception as e:
+        logging.error("Failed to push anomaly scores to %s: %s", endpoint, e)
+        raise
+
+def score_matrix_models(labels, grid, matrix, workers=None, store_root=MODEL_DIR):
+    """Scores every row with its stored windowed-feature IsolationForest; NaN where unscored."""
+    index = {}
+    for i, series_labels in enumerate(labels):
+        key = series_key(series_labels)
+        if key in index:
+            raise ValueError(f"Duplicate series {key} in rows {index[key]} and {i}")
+        index[key] = i
+    rows = {key: (grid[~np.isnan(matrix[i])], matrix[i][~np.isnan(matrix[i])])
+            for key, i in index.items()}
+    scores = np.full(matrix.shape, np.nan)
+    models = dict.fromkeys(('hit', 'drift', 'scheduled', 'cold', 'error'), 0)
+    for key, timestamps, row_scores, info in score_many(rows, store_root, workers, **MODEL_PARAMS):
+        models[info['model']] += 1
+        if info['model'] == 'error':
+            logging.error("IsolationForest scoring of %s failed: %s", key, info['error'])
+            continue
+        scores[index[key], np.searchsorted(grid, timestamps)] = row_scores
+    logging.info("IsolationForest models per result: %s", models)
+    return scores
+
+def analyze_fleet(selector, start, end, step, method='robust', workers=None):
+    """Pulls, scores and pushes every series matching selector in one pass."""
+    with stage("pull") as pull:
+        labels, grid, matrix = pull_series_matrix(selector, start, end, step)
+        pull.add(rows=matrix.size)
+    with stage("score", rows=matrix.size) as score:
+        if method == MODEL_DETECTOR:
+            scores = score_matrix_models(labels, grid, matrix, workers)
+        else:
+            scores = score_matrix(matrix, method=method, workers=workers)
+    with stage("export") as export:
+        pushed = push_matrix_scores(labels, grid, scores)
+        export.add(rows=pushed)
+    logging.info("Fleet analysis of %d series: pull %.2fs, score %.2fs, push %.2fs",
+                 len(labels), pull.seconds, score.seconds, export.seconds)
+    return labels, grid, scores, pushed
+
+def run(args):
+    """Entry point of `aiops analyze` (see cli.py for the arguments)."""
+    if args.selector:
+        end = args.end or time.time()
+        start = args.start or end - 14 * 86400
+        analyze_fleet(args.selector, start, end, args.step, args.method, args.workers)
+    else:
+        metric_name = 'aws_cpu'
+        data = pull_from_prometheus(metric_name)
+        if DETECTOR == MODEL_DETECTOR:
+            anomalies = detect_anomalies(data, key=metric_name)
+        else:
+            anomalies = detect_anomalies_streaming(data, key=metric_name)
+        push_anomalies_bulk(anomalies, labels={'job': 'anomaly_analysis', 'instance': 'cloudwatch_benchmark'})
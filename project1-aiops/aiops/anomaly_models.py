@@ -0,0 +1,254 @@
+"""
+anomaly_models.py
+
+IsolationForest anomaly scoring on rolling-window features, with fitted
+models kept per series so that most cycles only run inference.
+
+Every point is described by window_features(): its value, the values
+LAGS steps earlier, mean and standard deviation over the last WINDOWS
+points, its distance from those means and its rate of change. A spike,
+a burst of volatility or a sudden slope then stands out even when the
+value itself is in the normal range.
+
+IForestStore keeps one directory per series key with
+  v<N>.joblib  fitted models, the last KeepVersions versions
+  meta.json    current version, fit time, training end, points, the
+               feature medians / spreads of the training data and the
+               last point the drift check has examined
+
+score_series() reports which model scored a series as its "model" result:
+
+  hit        the stored model, younger than max_age and no drift
+  drift      the feature medians of the points since the last drift
+             check moved more than drift_threshold training spreads away
+  scheduled  the stored model is older than max_age
+  cold       no stored model (or other features): fitted, then scored
+
+On drift and scheduled the points are scored by the stored model and a
+new version is fitted afterwards for the next calls, so a level shift
+scores as anomalous once instead of being absorbed before it is seen.
+
+Scores are -score_samples: continuous, higher is more anomalous (about
+0.35-0.45 for typical points, 0.6 and above for clear outliers), rather
+than fit_predict's +/-1.
+
+    for key, ts, scores, info in score_many({"host1": (ts, values), ...}, "../data/models/iforest"):
+        info  # {'model': 'hit', 'version': 3, 'drift': 0.4, 'fit_seconds': 0.0, ...}
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import STATS
+
+LAGS = (1, 2, 3)
+WINDOWS = (12, 288)
+MODEL_RESULTS = ("hit", "drift", "scheduled", "cold", "error")
+
+def feature_names(lags=LAGS, windows=WINDOWS) -> list:
+    names = ["value", "diff"] + [f"lag_{k}" for k in lags]
+    for w in windows:
+        names += [f"mean_{w}", f"std_{w}", f"dev_{w}"]
+    return names
+
+def window_features(values, lags=LAGS, windows=WINDOWS) -> np.ndarray:
+    """
+    n x len(feature_names()) float64 matrix of the features of every point
+    (columns in feature_names() order). Windows cover the points up to and
+    including each point; the first max(lags) rows hold NaN lags.
+    """
+    x = pd.Series(np.asarray(values, dtype=np.float64))
+    columns = [x, x.diff()] + [x.shift(k) for k in lags]
+    for w in windows:
+        rolling = x.rolling(w, min_periods=1)
+        mean = rolling.mean()
+        columns += [mean, rolling.std().fillna(0.0), x - mean]
+    return np.column_stack([c.to_numpy() for c in columns])
+
+class IForestStore:
+    """Per-series versioned IsolationForest models and their metadata on local disk."""
+
+    def __init__(self, root: str, keep_versions: int = 3):
+        self.root = root
+        self.keep_versions = max(keep_versions, 1)
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(key.encode()).hexdigest())
+
+    def meta(self, key: str):
+        """The series' meta.json as a dict, or None when nothing is stored."""
+        try:
+            with open(os.path.join(self.path(key), "meta.json")) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, key: str, version: int = None):
+        """Returns (model, meta) of the current (or given) version, or (None, None)."""
+        import joblib
+
+        meta = self.meta(key)
+        if meta is None:
+            return None, None
+        version = version or meta["version"]
+        try:
+            model = joblib.load(os.path.join(self.path(key), f"v{version}.joblib"))
+        except (OSError, ValueError, EOFError) as e:
+            logging.error("Unreadable IsolationForest v%s for %s: %s", version, key, e)
+            return None, None
+        return model, dict(meta, version=version)
+
+    def save(self, key: str, model, meta: dict) -> int:
+        """Stores model as the next version of key, drops old versions; returns the version."""
+        import joblib
+
+        path = self.path(key)
+        os.makedirs(path, exist_ok=True)
+        previous = self.meta(key)
+        version = previous["version"] + 1 if previous else 1
+        tmp = os.path.join(path, f"v{version}.joblib.tmp")
+        joblib.dump(model, tmp)
+        os.replace(tmp, os.path.join(path, f"v{version}.joblib"))
+        meta = dict(meta, key=key, version=version)
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+        for old in range(version - self.keep_versions, 0, -1):
+            try:
+                os.remove(os.path.join(path, f"v{old}.joblib"))
+            except FileNotFoundError:
+                break
+        return version
+
+    def update_meta(self, key: str, **fields):
+        """Updates fields of the current version's meta.json in place."""
+        meta = dict(self.meta(key), **fields)
+        tmp = os.path.join(self.path(key), "meta.json.tmp")
+        with open(tmp, "w") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, os.path.join(self.path(key), "meta.json"))
+
+def _reference(features: np.ndarray):
+    """Per-feature medians and robust spreads (IQR / 1.349, std as fallback) of training rows."""
+    median = np.median(features, axis=0)
+    q75, q25 = np.percentile(features, [75, 25], axis=0)
+    spread = (q75 - q25) / 1.349
+    spread = np.where(spread > 0, spread, features.std(axis=0))
+    return median, np.maximum(spread, 1e-9)
+
+def drift_score(features: np.ndarray, meta: dict) -> float:
+    """Largest shift of a feature median from training, in training spreads."""
+    median = np.median(features, axis=0)
+    return float(np.max(np.abs(median - np.asarray(meta["median"])) / np.asarray(meta["spread"])))
+
+def score_series(key: str, timestamps, values, store_root: str, max_age: float = 86400, drift_threshold: float = 3.0, min_drift_points: int = 12,
+                 keep_versions: int = 3, n_estimators: int = 100, random_state: int = 0,
+                 lags=LAGS, windows=WINDOWS):
+    """
+    Scores one series; see the module docstring for the model results.
+
+    timestamps are Unix seconds; pass the history the features need (at
+    least max(windows) points). Every point with complete features is
+    scored and a fit trains on all of them. The drift check looks at the
+    points newer than the last one it examined, once there are
+    min_drift_points of them. Returns (key, timestamps, scores, info) for
+    the scored points; info["version"] is the model version that scored
+    them, info["saved_version"] the one fitted now.
+    """
+    from sklearn.ensemble import IsolationForest
+
+    store = IForestStore(store_root, keep_versions)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    ok = np.isfinite(values)
+    timestamps, values = timestamps[ok], values[ok]
+    features = window_features(values, lags, windows)
+    usable = ~np.isnan(features).any(axis=1)
+    if usable.sum() < 2:
+        raise ValueError(f"Not enough points to score {key}")
+    names = feature_names(lags, windows)
+    info = {"points": int(usable.sum()), "fit_seconds": 0.0, "drift": None}
+
+    model, meta = store.load(key)
+    if model is None or meta.get("features") != names:
+        result = "cold"
+    elif time.time() - meta["fitted_at"] > max_age:
+        result = "scheduled"
+    else:
+        result = "hit"
+        checked = meta.get("checked_until", meta["trained_until"])
+        unseen = usable & (timestamps > checked)
+        if unseen.sum() >= min_drift_points:
+            info["drift"] = round(drift_score(features[unseen], meta), 3)
+            if info["drift"] > drift_threshold:
+                result = "drift"
+            else:
+                store.update_meta(key, checked_until=float(timestamps[unseen][-1]))
+
+    def infer():
+        t0 = time.perf_counter()
+        out = -model.score_samples(features[usable])
+        info.update(version=meta["version"], score_seconds=round(time.perf_counter() - t0, 4))
+        return out
+
+    if result in ("drift", "scheduled"):
+        # the points that moved away are scored by the model they moved away from
+        scores = infer()
+    if result != "hit":
+        train = features[usable]
+        t0 = time.perf_counter()
+        model = IsolationForest(n_estimators=n_estimators, random_state=random_state).fit(train)
+        info.update(fit_seconds=round(time.perf_counter() - t0, 4), trained_points=len(train))
+        median, spread = _reference(train)
+        meta = {"features": names, "fitted_at": time.time(),
+                "trained_until": float(timestamps[usable][-1]), "points": int(len(train)),
+                "median": median.tolist(), "spread": spread.tolist()}
+        meta["version"] = store.save(key, model, meta)
+        info["saved_version"] = meta["version"]
+        logging.info("IsolationForest for %s: %s fit of v%d on %d points in %.2fs",
+                     key, result, meta["version"], len(train), info["fit_seconds"])
+    if result in ("hit", "cold"):
+        scores = infer()
+    info["model"] = result
+    return key, timestamps[usable], scores, info
+
+def _record(result):
+    """Records a worker's fit / inference times as stages in this (the parent) process."""
+    key, ts, scores, info = result
+    if info["model"] != "hit":
+        STATS.record("fit", info["fit_seconds"], rows=info["trained_points"])
+    STATS.record("infer", info["score_seconds"], rows=len(scores))
+    return result
+
+def score_many(series: dict, store_root: str, workers: int = None, **params):
+    """
+    Scores {key: (timestamps, values)} with score_series in `workers`
+    processes. Yields (key, timestamps, scores, info) as series finish; a
+    series that fails yields empty arrays and info {'model': 'error', ...}.
+    Fit and inference times are recorded as the 'fit' / 'infer' stages.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(series) <= 1:
+        for key, (ts, vals) in series.items():
+            try:
+                yield _record(score_series(key, ts, vals, store_root, **params))
+            except Exception as e:
+                yield key, np.empty(0), np.empty(0), {"model": "error", "error": str(e)}
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(series))) as pool:
+        futures = {pool.submit(score_series, key, ts, vals, store_root, **params): key
+                   for key, (ts, vals) in series.items()}
+        for future in as_completed(futures):
+            try:
+                yield _record(future.result())
+            except Exception as e:
+                yield futures[future], np.empty(0), np.empty(0), {"model": "error",
+                                                                   "error": str(e)}
@@ -0,0 +1,176 @@
+"""
+cli.py
+
+Single entry point for every pipeline stage:
+
+  python -m aiops ingest       NAB CSVs -> OpenMetrics backfill files  (ingest_data)
+  python -m aiops convert      NAB CSVs -> line protocol, push to VM    (nab_to_vm)
+  python -m aiops analyze      anomaly scores -> VictoriaMetrics        (analyze_anomalies)
+  python -m aiops forecast     forecasts -> VictoriaMetrics             (forecast_trends)
+  python -m aiops investigate  LLM agent CPU investigation              (agentic_victoria_metrics)
+  python -m aiops serve        resident incremental analysis            (analysis_daemon)
+  python -m aiops render       columnar files -> OpenMetrics / line protocol (columnar)
+  python -m aiops replay       NAB CSVs replayed as live hosts          (replay)
+
+Only argparse is imported here. A command's module, and with it pandas,
+scikit-learn, prophet or langchain, is imported after the arguments are
+parsed, so --help, usage errors and light commands start in milliseconds
+(benchmarks/bench_import_time.py keeps it that way).
+
+Every command also takes --report FILE (JSON per-stage timings, rows, bytes
+and retries), --profile FILE (cProfile dump) and --push-metrics (stage
+metrics to the Pushgateway); see instrumentation.py.
+"""
+import argparse
+import importlib
+
+# command -> module implementing run(args)
+COMMANDS = {
+    "ingest": "ingest_data",
+    "convert": "nab_to_vm",
+    "analyze": "analyze_anomalies",
+    "forecast": "forecast_trends",
+    "investigate": "agentic_victoria_metrics",
+    "serve": "analysis_daemon",
+    "render": "columnar",
+    "replay": "replay",
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="aiops", description="AIOps platform pipeline.")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--report", metavar="FILE",
+                        help="write a JSON run report with per-stage timings to FILE")
+    common.add_argument("--profile", metavar="FILE", help="write a cProfile dump of the run to FILE")
+    common.add_argument("--push-metrics", action="store_true",
+                        help="push per-stage metrics to the Pushgateway when done")
+
+    p = sub.add_parser("ingest", parents=[common],
+                       help="backfill a NAB CSV into an OpenMetrics file")
+    p.add_argument("--input", help="NAB CSV file or a directory of CSVs "
+                                   "(default: the ec2_cpu_utilization_ac20cd series)")
+    p.add_argument("--output", help="output file (default: metrics.om, metrics.col or, "
+                                    "for a directory of CSVs, the metrics_col directory)")
+    p.add_argument("--format", choices=("openmetrics", "columnar"), default="openmetrics",
+                   help="OpenMetrics text for promtool or compact columnar files")
+    p.add_argument("--workers", type=int, help="conversion processes (default: CPU count)")
+    p.add_argument("--block-range", help="write one OpenMetrics file per aligned time range, "
+                                         "e.g. 2h or 1d (default: a single file)")
+    p.add_argument("--shift", choices=("year", "now", "none"), default="year",
+                   help="move each series into the current year, end it now, or keep it")
+    p.add_argument("--metric", help="metric name (default: numenta_cpu_aws)")
+    p.add_argument("--time-format", help="strptime format of the timestamps (default: ISO 8601)")
+    p.add_argument("--manifest", help="checkpoint manifest (default: <output>.manifest.json)")
+    p.add_argument("--full", action="store_true", help="ignore the manifest and rewrite")
+
+    p = sub.add_parser("convert", parents=[common],
+                       help="convert NAB CSVs to line protocol and push to VictoriaMetrics")
+    p.add_argument("--input-dir", required=True, help="folder with CSV files")
+    p.add_argument("--out-dir", default="./out_lp", help="where to write .lp files")
+    p.add_argument("--vm-url", default="http://localhost:8428", help="VictoriaMetrics URL")
+    p.add_argument("--push", action="store_true", help="POST data to VM /write")
+    p.add_argument("--metric-prefix", default="nab", help="metric name prefix")
+    p.add_argument("--batch-size", default=5000, type=int, help="lines per POST")
+    p.add_argument("--time-format", default="%Y-%m-%d %H:%M:%S", help="python strptime format")
+    p.add_argument("--engine", choices=("vectorized", "legacy"), default="vectorized",
+                   help="conversion engine")
+    p.add_argument("--workers", default=1, type=int, help="conversion processes")
+    p.add_argument("--max-in-flight", default=4, type=int, help="concurrent POSTs")
+    p.add_argument("--retries", default=3, type=int, help="retries per batch")
+    p.add_argument("--no-gzip", action="store_true", help="send batches uncompressed")
+    p.add_argument("--manifest", default=None, help="checkpoint manifest path")
+    p.add_argument("--full", action="store_true", help="ignore the manifest, reprocess all")
+    p.add_argument("--out-format", choices=("lp", "col"), default="lp",
+                   help="intermediate files: text line protocol or compact columnar")
+
+    p = sub.add_parser("analyze", parents=[common],
+                       help="score series for anomalies and push the scores")
+    p.add_argument("--selector", help="score every series matching this selector in one pass")
+    p.add_argument("--start", type=float, help="range start (Unix seconds)")
+    p.add_argument("--end", type=float, help="range end (Unix seconds, default: now)")
+    p.add_argument("--step", type=float, default=300.0, help="step in seconds")
+    p.add_argument("--method", default="robust",
+                   choices=("robust", "rolling_robust", "seasonal_robust", "isolation_forest",
+                            "isolation_forest_model"),
+                   help="matrix scoring method; isolation_forest_model uses the stored "
+                        "per-series models on window features, like [Analysis] Detector")
+    p.add_argument("--workers", type=int, default=None,
+                   help="processes for isolation_forest / isolation_forest_model")
+
+    p = sub.add_parser("forecast", parents=[common],
+                       help="forecast series and push yhat and its bands")
+    p.add_argument("--selector", help="forecast every series matching this selector")
+    p.add_argument("--step", default="300", help="query step (seconds or duration)")
+    p.add_argument("--horizon", type=int, help="steps to forecast per series "
+                                               "(default: [Forecast] Horizon)")
+    p.add_argument("--workers", type=int, help="fit processes (default: CPU count)")
+    p.add_argument("--backend", choices=("prophet", "holt_winters", "seasonal_naive"),
+                   help="forecasting backend (default: [Forecast] Backend)")
+
+    p = sub.add_parser("investigate", parents=[common],
+                       help="ask the LLM agent to investigate a host's CPU")
+    p.add_argument("--host", nargs="+", default=["ac20cd"],
+                   help="hosts to investigate, concurrently when several")
+    p.add_argument("--start", default="2025-07-14T22:14:08Z", help="start time (RFC3339)")
+    p.add_argument("--end", default="2025-07-15T03:43:58Z", help="end time (RFC3339)")
+    p.add_argument("--windows", metavar="FILE",
+                   help='JSON (lines) of {"host", "start", "end"} to investigate instead')
+    p.add_argument("--concurrency", type=int,
+                   help="investigations at once (default: [Agent] Concurrency)")
+    p.add_argument("--triage", action="store_true",
+                   help="score every host of --selector first, investigate only the suspicious")
+    p.add_argument("--selector", default="nab_aws_cpu_value",
+                   help="fleet query for --triage, one series per host label")
+    p.add_argument("--top-k", type=int, help="hosts investigated after --triage "
+                                             "(default: [Triage] TopK)")
+
+    p = sub.add_parser("serve", parents=[common],
+                       help="run the resident incremental analysis daemon")
+    p.add_argument("--selector", help="series to analyze (default: [Daemon] Selector)")
+    p.add_argument("--interval", type=float, help="seconds between cycles (default: [Daemon] Interval)")
+    p.add_argument("--step", help="query step, seconds or duration (default: [Daemon] Step)")
+    p.add_argument("--backend", help="forecasting backend (default: [Forecast] Backend)")
+    p.add_argument("--workers", type=int, help="Prophet fit processes (default: CPU count)")
+    p.add_argument("--once", action="store_true", help="run a single cycle and exit")
+    p.add_argument("--metrics-port", type=int,
+                   help="serve stage metrics on this port (default: [Daemon] MetricsPort, 0 = off)")
+
+    p = sub.add_parser("render", parents=[common],
+                       help="render columnar (.col) files as OpenMetrics or line protocol")
+    p.add_argument("files", nargs="+", help=".col files")
+    p.add_argument("--format", choices=("openmetrics", "influx"), default="openmetrics",
+                   help="output format")
+    p.add_argument("--output", help="output file (default: stdout)")
+    p.add_argument("--batch-size", default=5000, type=int, help="lines rendered at a time")
+
+    p = sub.add_parser("replay", parents=[common],
+                       help="replay NAB CSVs as live hosts, in bulk or in real time")
+    p.add_argument("--input", help="NAB CSV file or directory (default: realAWSCloudwatch)")
+    p.add_argument("--hosts", type=int, help="hosts to simulate, cycling through the CSVs "
+                                             "(default: one per CSV)")
+    p.add_argument("--mode", choices=("bulk", "realtime"), default="realtime",
+                   help="import whole histories, or send samples paced by --speedup")
+    p.add_argument("--target", choices=("pushgateway", "vm"),
+                   help="where samples go (default: pushgateway in realtime, vm in bulk)")
+    p.add_argument("--url", help="target URL (default: [Prometheus] PushGateway "
+                                 "or [VictoriaMetrics] URL)")
+    p.add_argument("--metric", default="node_cpu_usage", help="metric name")
+    p.add_argument("--job", default="node", help="job label")
+    p.add_argument("--speedup", type=float, default=60.0,
+                   help="realtime: replay speed, 60 sends 5-minute samples every 5 s")
+    p.add_argument("--duration", type=float, help="realtime: stop after this many seconds")
+    p.add_argument("--loop", action="store_true", help="realtime: start over at the end")
+    p.add_argument("--max-connections", type=int, default=100,
+                   help="realtime: concurrent connections")
+    p.add_argument("--batch-size", default=5000, type=int, help="bulk: samples per request")
+    p.add_argument("--max-in-flight", default=4, type=int, help="bulk: concurrent requests")
+    p.add_argument("--no-gzip", action="store_true", help="bulk: send batches uncompressed")
+    p.add_argument("--time-format", help="strptime format of the timestamps (default: ISO 8601)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    module = importlib.import_module("." + COMMANDS[args.command], __package__)
+    from .instrumentation import run_instrumented
+    return run_instrumented(module.run, args)
@@ -0,0 +1,27 @@
+"""
+config.py
+
+config/config.ini of the project, found next to this package instead of
+relative to the working directory, so commands behave the same from cron,
+CI or any shell. AIOPS_CONFIG points to another file.
+
+Relative paths inside the file (e.g. Dir = ../data/cache) are resolved
+against the file's own directory by resolve_path().
+"""
+import configparser
+import os
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FILE = os.environ.get("AIOPS_CONFIG", os.path.join(PROJECT_DIR, "config", "config.ini"))
+
+config = configparser.ConfigParser()
+config.read(CONFIG_FILE)
+
+def resolve_path(path: str) -> str:
+    """Absolute path of a path taken from the config file."""
+    base = os.path.dirname(os.path.abspath(CONFIG_FILE))
+    return os.path.normpath(os.path.join(base, os.path.expanduser(path)))
+
+def log_file(name: str) -> str:
+    """Path of a log file in the project's data/logs directory."""
+    return os.path.join(PROJECT_DIR, "data", "logs", name)
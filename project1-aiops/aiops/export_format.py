@@ -0,0 +1,85 @@
+"""
+export_format.py
+
+Text formats for pushing timestamped samples to VictoriaMetrics' import
+endpoints: Prometheus text exposition (/api/v1/import/prometheus) and
+Influx line protocol (/write). Shared by the analysis and forecast scripts.
+"""
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import stage
+
+def escape_label_value(value):
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def escape_lp(s):
+    """Escapes a measurement or tag for Influx line protocol."""
+    return str(s).replace(" ", "\\ ").replace(",", "\\,").replace("=", "\\=")
+
+def format_lines(prefix, values, stamps):
+    """
+    Renders '<prefix><value> <stamp>\n' for every value / stamp pair with a
+    single savetxt-style %-format over the interleaved columns, instead of a
+    Python-level loop per row. Both columns print as str() of their Python
+    scalars (floats keep their shortest repr). Returns one str.
+    """
+    n = len(values)
+    columns = [None] * (2 * n)
+    columns[0::2] = np.asarray(values).tolist()
+    columns[1::2] = np.asarray(stamps).tolist()
+    return ((prefix.replace("%", "%%") + "%s %s\n") * n) % tuple(columns)
+
+def format_samples(metric_name, labels, timestamps, values, fmt='prometheus'):
+    """Formats a series as text lines, one per point, with its own timestamp.
+
+    timestamps are Unix seconds. fmt is 'prometheus' (text exposition with
+    millisecond timestamps) or 'influx' (line protocol with nanosecond timestamps).
+    Returns a pandas Series of lines without trailing newlines.
+    """
+    if fmt not in ('prometheus', 'influx'):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    with stage("format") as s:
+        ts = pd.Series(timestamps, dtype='float64').reset_index(drop=True)
+        vals = pd.Series(values, dtype='float64').astype(str).reset_index(drop=True)
+        s.add(rows=len(ts))
+        if fmt == 'prometheus':
+            label_str = ",".join(f'{k}="{escape_label_value(v)}"' for k, v in labels.items())
+            prefix = f"{metric_name}{{{label_str}}} " if label_str else f"{metric_name} "
+            ts_str = (ts * 1000).round().astype('int64').astype(str)
+            return prefix + vals + " " + ts_str
+        tag_str = "".join(f",{escape_lp(k)}={escape_lp(v)}" for k, v in labels.items())
+        prefix = f"{escape_lp(metric_name)}{tag_str} value="
+        ts_str = (ts * 1_000_000_000).round().astype('int64').astype(str)
+        return prefix + vals + " " + ts_str
+
+def import_url(base_url, fmt='prometheus'):
+    """Returns the VictoriaMetrics import endpoint for an export format."""
+    if fmt == 'prometheus':
+        return base_url.rstrip('/') + '/api/v1/import/prometheus'
+    if fmt == 'influx':
+        return base_url.rstrip('/') + '/write'
+    raise ValueError(f"Unsupported export format: {fmt}")
+
+def post_batch(session, endpoint, batch, timeout=60):
+    """POSTs one batch of lines (recorded as the 'push' stage); returns the number sent."""
+    with stage("push", rows=len(batch)) as s:
+        payload = ("\n".join(batch) + "\n").encode('utf-8')
+        s.add(bytes=len(payload))
+        session.post(endpoint, data=payload, timeout=timeout).raise_for_status()
+    return len(batch)
+
+def post_lines(session, endpoint, lines, batch_size=5000, timeout=60):
+    """
+    POSTs a list (sliced in place) or any iterable of lines (consumed
+    batch_size at a time, e.g. a generator) in batches; returns the number sent.
+    """
+    if isinstance(lines, (list, tuple)):
+        batches = (lines[i:i + batch_size] for i in range(0, len(lines), batch_size))
+    else:
+        it = iter(lines)
+        batches = iter(lambda: list(islice(it, batch_size)), [])
+    return sum(post_batch(session, endpoint, batch, timeout) for batch in batches)
@@ -0,0 +1,228 @@
+"""
+forecast_engine.py
+
+Prophet forecasts for many series at once: series are fitted in a process
+pool and every fit is warm-started from the parameters of the previous run.
+
+ModelStore keeps one directory per series key with
+  model.json  the last fitted model (prophet.serialize.model_to_json)
+  meta.json   key, fit time, training end, number of training points, ...
+
+For each series forecast_many() picks one of three paths, reported as the
+series' "cache" result:
+
+  hit   the stored model is younger than max_age and the series has fewer
+        than refit_after new points since it was trained: no fit at all,
+        the stored model only predicts the horizon
+  warm  refit, with the stored k, m, sigma_obs, delta and beta as Stan's
+        starting point (converges in far fewer iterations than a cold start)
+  cold  no usable stored model, a stored model whose changepoint count or
+        seasonalities no longer match the data, or a failed warm start:
+        a regular fit
+
+Only the horizon after the last observed point is predicted, never the
+in-sample history.
+
+    results = forecast_many({"host1": (ts, values), ...}, "../data/models", horizon=288)
+    for key, forecast, info in results:
+        info  # {'cache': 'warm', 'fit_seconds': 0.41, 'points': 4032, ...}
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import STATS
+
+FORECAST_COLUMNS = ["ds", "yhat", "yhat_lower", "yhat_upper"]
+CACHE_RESULTS = ("hit", "warm", "cold", "error")
+
+class ModelStore:
+    """Per-series fitted Prophet models and their metadata on local disk."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(key.encode()).hexdigest())
+
+    def load(self, key: str):
+        """Returns (model_json, meta) or (None, None) when nothing is stored."""
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as fh:
+                meta = json.load(fh)
+            with open(os.path.join(path, "model.json")) as fh:
+                return fh.read(), meta
+        except (OSError, ValueError):
+            return None, None
+
+    def save(self, key: str, model_json: str, meta: dict):
+        path = self.path(key)
+        os.makedirs(path, exist_ok=True)
+        for name, text in (("model.json", model_json), ("meta.json", json.dumps(meta))):
+            tmp = os.path.join(path, name + ".tmp")
+            with open(tmp, "w") as fh:
+                fh.write(text)
+            os.replace(tmp, os.path.join(path, name))
+
+def warm_start_params(model) -> dict:
+    """Stan init values from a fitted model (MAP fit or mean of the MCMC samples)."""
+    params = {}
+    for name in ("k", "m", "sigma_obs"):
+        values = np.asarray(model.params[name])
+        params[name] = float(values[0][0] if model.mcmc_samples == 0 else values.mean())
+    for name in ("delta", "beta"):
+        values = np.asarray(model.params[name])
+        params[name] = values[0] if model.mcmc_samples == 0 else values.mean(axis=0)
+    return params
+
+def _future(last_ts: float, step: float, horizon: int) -> pd.DataFrame:
+    return pd.DataFrame({"ds": pd.to_datetime(last_ts + step * np.arange(1, horizon + 1), unit="s")})
+
+def model_shapes(history: pd.DataFrame, prophet_params: dict) -> tuple:
+    """
+    (changepoints, seasonal features) a Prophet model with prophet_params
+    would have on history, i.e. the lengths of its delta and beta, from the
+    preparation steps Prophet.fit() runs before handing the data to Stan.
+    """
+    from prophet import Prophet
+
+    probe = Prophet(**prophet_params)
+    df = history[history["y"].notnull()].copy()
+    probe.history_dates = pd.to_datetime(pd.Series(df["ds"].unique(), name="ds")).sort_values()
+    df = probe.setup_dataframe(df, initialize_scales=True)
+    probe.history = df
+    probe.set_auto_seasonalities()
+    features, _, _, _ = probe.make_all_seasonality_features(df)
+    probe.set_changepoints()
+    return len(probe.changepoints_t), features.shape[1]
+
+def _fit(history: pd.DataFrame, prophet_params: dict, init: dict = None):
+    """Fits a Prophet model; returns (model, 'warm' or 'cold') for the path that ran."""
+    from prophet import Prophet
+
+    if init is not None and (np.size(init["delta"]), np.size(init["beta"])) != \
+            model_shapes(history, prophet_params):
+        # the changepoint count or seasonalities differ from the stored fit: Prophet
+        # would silently swap these inits for its defaults, i.e. fit cold anyway
+        init = None
+    model = Prophet(**prophet_params)
+    if init is None:
+        return model.fit(history), "cold"
+    try:
+        return model.fit(history, init=init), "warm"
+    except Exception:
+        return Prophet(**prophet_params).fit(history), "cold"
+
+def forecast_series(key: str, timestamps, values, store_root: str, horizon: int = 288,
+                    step: float = None, max_age: float = 86400, refit_after: int = 288,
+                    prophet_params: dict = None):
+    """
+    Forecasts one series; see the module docstring for the hit/warm/cold paths.
+
+    timestamps are Unix seconds. Returns (key, forecast, info) where forecast
+    has FORECAST_COLUMNS for the `horizon` steps after the last point.
+    """
+    from prophet.serialize import model_from_json, model_to_json
+
+    logging.getLogger("cmdstanpy").disabled = True
+    prophet_params = prophet_params or {}
+    store = ModelStore(store_root)
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    ok = np.isfinite(values)
+    timestamps, values = timestamps[ok], values[ok]
+    if len(timestamps) < 2:
+        raise ValueError(f"Not enough points to forecast {key}")
+    step = step or float(np.median(np.diff(timestamps)))
+    last_ts = float(timestamps[-1])
+    info = {"points": int(len(timestamps)), "fit_seconds": 0.0}
+
+    stored_json, meta = store.load(key)
+    stored = model_from_json(stored_json) if stored_json is not None else None
+    fresh = (stored is not None
+             and meta.get("prophet_params") == prophet_params
+             and time.time() - meta["fitted_at"] < max_age
+             and int((timestamps > meta["train_end"]).sum()) < refit_after)
+    if fresh:
+        model = stored
+        info["cache"] = "hit"
+    else:
+        history = pd.DataFrame({"ds": pd.to_datetime(timestamps, unit="s"), "y": values})
+        init = warm_start_params(stored) if stored is not None else None
+        t0 = time.perf_counter()
+        model, info["cache"] = _fit(history, prophet_params, init)
+        info["fit_seconds"] = time.perf_counter() - t0
+        store.save(key, model_to_json(model), {
+            "key": key, "fitted_at": time.time(), "train_end": last_ts,
+            "points": info["points"], "fit_seconds": info["fit_seconds"],
+            "prophet_params": prophet_params})
+
+    t0 = time.perf_counter()
+    forecast = model.predict(_future(last_ts, step, horizon))[FORECAST_COLUMNS]
+    info["predict_seconds"] = time.perf_counter() - t0
+    return key, forecast, info
+
+def _record(result):
+    """Records a worker's fit / predict times as stages in this (the parent) process."""
+    key, forecast, info = result
+    if forecast is not None:
+        if info["cache"] != "hit":
+            STATS.record("fit", info["fit_seconds"], rows=info["points"])
+        STATS.record("predict", info["predict_seconds"], rows=len(forecast))
+    return result
+
+def forecast_many(series: dict, store_root: str, horizon: int = 288, workers: int = None,
+                  **params):
+    """
+    Forecasts {key: (timestamps, values)} with forecast_series in `workers`
+    processes. Yields (key, forecast, info) as series finish; a series that
+    fails yields forecast None and info {'cache': 'error', 'error': ...}.
+    Fit and predict times are recorded as the 'fit' / 'predict' stages.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(series) <= 1:
+        for key, (ts, vals) in series.items():
+            try:
+                yield _record(forecast_series(key, ts, vals, store_root, horizon, **params))
+            except Exception as e:
+                yield key, None, {"cache": "error", "error": str(e)}
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(series))) as pool:
+        futures = {pool.submit(forecast_series, key, ts, vals, store_root, horizon, **params): key
+                   for key, (ts, vals) in series.items()}
+        for future in as_completed(futures):
+            try:
+                yield _record(future.result())
+            except Exception as e:
+                yield futures[future], None, {"cache": "error", "error": str(e)}
+
+def forecast_metrics(infos: dict, registry):
+    """
+    Registers per-series fit/predict seconds and cache result counts from
+    {key: info} on a prometheus_client registry (for push_to_gateway).
+    """
+    from prometheus_client import Gauge
+
+    fit = Gauge("forecast_fit_seconds", "Prophet fit time per series (0 on a cache hit)",
+                ["series"], registry=registry)
+    predict = Gauge("forecast_predict_seconds", "Prophet predict time per series",
+                    ["series"], registry=registry)
+    cache = Gauge("forecast_model_cache_results", "Series per model cache result in the last run",
+                  ["result"], registry=registry)
+    counts = dict.fromkeys(CACHE_RESULTS, 0)
+    for key, info in infos.items():
+        counts[info["cache"]] += 1
+        if info["cache"] != "error":
+            fit.labels(series=key).set(info["fit_seconds"])
+            predict.labels(series=key).set(info["predict_seconds"])
+    for result, n in counts.items():
+        cache.labels(result=result).set(n)
+    return registry
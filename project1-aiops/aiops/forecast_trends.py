@@ -0,0 +1,215 @@
+import logging
+import time
+import numpy as np
+import pandas as pd
+from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+import requests
+from .config import config, log_file, resolve_path
+from .export_format import format_samples, import_url, post_lines
+from .forecast_engine import forecast_many, forecast_metrics
+from .forecasters import horizon_steps, make_forecaster
+from .instrumentation import stage
+from .matrix_scoring import align_series
+from .query_client import fetch_range, make_session, parse_duration, series_key
+from .ts_cache import config_cache
+
+PROMETHEUS_GATEWAY = config['Prometheus']['PushGateway']
+PROMETHEUS_API = config['Prometheus']['API']
+VM_URL = config.get('VictoriaMetrics', 'URL', fallback='http://localhost:8428')
+EXPORT_BATCH_SIZE = config.getint('Export', 'BatchSize', fallback=5000)
+EXPORT_FORMAT = config.get('Export', 'Format', fallback='prometheus')
+MODEL_DIR = resolve_path(config.get('Forecast', 'ModelDir', fallback='../data/models'))
+HORIZON = config.getint('Forecast', 'Horizon', fallback=288)
+MAX_MODEL_AGE = config.getfloat('Forecast', 'MaxModelAge', fallback=86400)
+REFIT_AFTER = config.getint('Forecast', 'RefitAfter', fallback=288)
+BACKEND = config.get('Forecast', 'Backend', fallback='prophet')
+SEASON = config.getint('Forecast', 'Season', fallback=288)
+LOG_FILE = log_file('forecast.log')
+
+# Configure logging
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+def pull_from_prometheus(metric_name, start=None, end=None, step="300"):
+    """Fetches the history of a metric from Prometheus (default: the last 14 days).
+
+    Returns a DataFrame with 'timestamp' (datetime) and 'value' columns. Spans
+    already in the local query cache are not downloaded again.
+    """
+    try:
+        cache = config_cache()
+        end = end if end is not None else time.time()
+        start = start if start is not None else end - 14 * 86400
+        results = fetch_range(PROMETHEUS_API, metric_name, start, end, step, cache=cache)
+        if not results:
+            raise ValueError(f"No data available for metric: {metric_name}")
+        data = pd.DataFrame({
+            "timestamp": pd.to_datetime(np.concatenate([r.timestamps for r in results]), unit="s"),
+            "value": np.concatenate([r.values for r in results]),
+        })
+        logging.info("Data pulled from Prometheus for metric: %s", metric_name)
+        if cache is not None:
+            logging.info("Query cache: %s", cache.stats())
+        return data
+    except Exception as e:
+        logging.error("Error pulling data from Prometheus: %s", e)
+        raise
+
+def forecast_trend(data, backend=BACKEND, periods=30, freq='D'):
+    """Forecasts trends with Prophet or one of the NumPy backends in forecasters.py.
+
+    Returns the in-sample fit and `periods` x `freq` ahead with 'ds', 'yhat',
+    'yhat_lower' and 'yhat_upper' columns (Prophet adds its components).
+    """
+    try:
+        if backend == 'prophet':
+            from prophet import Prophet
+
+            model = Prophet()
+            data = data.rename(columns={"timestamp": "ds", "value": "y"})
+            with stage("fit", rows=len(data)):
+                model.fit(data)
+            future = model.make_future_dataframe(periods=periods, freq=freq)
+            with stage("predict", rows=len(future)):
+                forecast = model.predict(future)
+        else:
+            ts = (data['timestamp'] - pd.Timestamp(0)).dt.total_seconds().to_numpy()
+            # data may hold several series back to back: average them per timestamp
+            ts, inverse = np.unique(ts, return_inverse=True)
+            if len(ts) < 2:
+                raise ValueError(f"Need at least 2 distinct timestamps, got {len(ts)}")
+            vals = np.bincount(inverse, weights=data['value'].to_numpy(dtype=np.float64)) / \
+                np.bincount(inverse)
+            step = float(np.median(np.diff(ts)))
+            grid, matrix = align_series([(ts, vals)], ts[0], ts[-1], step)
+            horizon = horizon_steps(periods, freq, step)
+            with stage("forecast", rows=matrix.size):
+                yhat, lower, upper = make_forecaster(backend, season=SEASON).forecast(matrix, horizon, grid)
+            ds = np.concatenate([grid, grid[-1] + step * np.arange(1, horizon + 1)])
+            forecast = pd.DataFrame({"ds": pd.to_datetime(ds, unit="s"), "yhat": yhat[0],
+                                     "yhat_lower": lower[0], "yhat_upper": upper[0]})
+        logging.info("Trend forecasting completed with %s.", backend)
+        return forecast
+    except Exception as e:
+        logging.error("Error during trend forecasting: %s", e)
+        raise
+
+def push_forecast_to_prometheus(forecast_data):
+    """Pushes forecast data to Prometheus."""
+    try:
+        registry = CollectorRegistry()
+        gauge = Gauge('forecast', 'Forecast Data', registry=registry)
+        for _, row in forecast_data.iterrows():
+            gauge.set(row['yhat'])
+            push_to_gateway(PROMETHEUS_GATEWAY, job='trend_forecast', registry=registry)
+        logging.info("Forecast data pushed to Prometheus.")
+    except Exception as e:
+        logging.error("Failed to push forecast data to Prometheus: %s", e)
+        raise
+
+def forecast_fleet(selector, start=None, end=None, step="300", horizon=HORIZON, workers=None,
+                   backend=BACKEND):
+    """Forecasts `horizon` steps for every series matching selector.
+
+    Prophet fits run in a process pool, warm-started from the stored models
+    (forecast_engine); the NumPy backends forecast all series as one matrix.
+    Returns ({key: labels}, {key: forecast}, {key: info}); failed series are
+    logged and left out of the forecasts. info is only filled for Prophet.
+    """
+    try:
+        cache = config_cache()
+        end = end if end is not None else time.time()
+        start = start if start is not None else end - 14 * 86400
+        results = fetch_range(PROMETHEUS_API, selector, start, end, step, cache=cache)
+        if not results:
+            raise ValueError(f"No series match {selector}")
+        results = [r for r in results if len(r.timestamps)]
+        if not results:
+            raise ValueError(f"Every series matching {selector} is empty")
+        labels = {series_key(r.labels): r.labels for r in results}
+        series = {series_key(r.labels): (r.timestamps, r.values) for r in results}
+        logging.info("Forecasting %d series for %s with %s", len(series), selector, backend)
+    except Exception as e:
+        logging.error("Error pulling series for %s: %s", selector, e)
+        raise
+    t0 = time.perf_counter()
+    forecasts, infos = {}, {}
+    if backend != 'prophet':
+        step_s = parse_duration(step)
+        start_s = float(min(ts[0] for ts, _ in series.values()))
+        grid, matrix = align_series(list(series.values()), start_s, float(end), step_s)
+        with stage("forecast", rows=matrix.size):
+            yhat, lower, upper = make_forecaster(backend, season=SEASON).forecast(matrix, horizon, grid)
+        ds = pd.to_datetime(grid[-1] + step_s * np.arange(1, horizon + 1), unit="s")
+        n = len(grid)
+        for i, key in enumerate(series):
+            forecasts[key] = pd.DataFrame({"ds": ds, "yhat": yhat[i, n:],
+                                           "yhat_lower": lower[i, n:], "yhat_upper": upper[i, n:]})
+        logging.info("Fleet forecast of %d series in %.2fs", len(series), time.perf_counter() - t0)
+        return labels, forecasts, infos
+    for key, forecast, info in forecast_many(series, MODEL_DIR, horizon, workers=workers,
+                                             max_age=MAX_MODEL_AGE, refit_after=REFIT_AFTER):
+        infos[key] = info
+        if forecast is None:
+            logging.error("Forecast failed for %s: %s", key, info['error'])
+        else:
+            forecasts[key] = forecast
+            logging.info("Forecast %s: %s, fit %.2fs", key, info['cache'], info['fit_seconds'])
+    counts = pd.Series([i['cache'] for i in infos.values()]).value_counts().to_dict()
+    logging.info("Fleet forecast of %d series in %.2fs: %s",
+                 len(series), time.perf_counter() - t0, counts)
+    return labels, forecasts, infos
+
+def push_fleet_forecasts(labels, forecasts, metric_name='forecast', url=VM_URL,
+                         batch_size=EXPORT_BATCH_SIZE, fmt=EXPORT_FORMAT):
+    """Imports yhat, yhat_lower and yhat_upper of every series, with their timestamps.
+
+    The bands are written as <metric_name>, <metric_name>_lower and
+    <metric_name>_upper with the labels of the source series.
+    """
+    endpoint = import_url(url, fmt)
+    try:
+        def forecast_lines():
+            for key, forecast in forecasts.items():
+                out_labels = {k: v for k, v in labels[key].items() if k != '__name__'}
+                out_labels.setdefault('job', 'trend_forecast')
+                ts = (forecast['ds'] - pd.Timestamp(0)).dt.total_seconds()
+                for column, suffix in (('yhat', ''), ('yhat_lower', '_lower'), ('yhat_upper', '_upper')):
+                    yield from format_samples(metric_name + suffix, out_labels, ts,
+                                              forecast[column], fmt).tolist()
+
+        with make_session(1) as session:
+            sent = post_lines(session, endpoint, forecast_lines(), batch_size)
+        logging.info("Pushed %d forecast samples for %d series to %s.", sent, len(forecasts), endpoint)
+        return sent
+    except Exception as e:
+        logging.error("Failed to push forecasts to %s: %s", endpoint, e)
+        raise
+
+def push_forecast_metrics(infos):
+    """Pushes per-series fit time and model cache results to the Pushgateway."""
+    try:
+        registry = forecast_metrics(infos, CollectorRegistry())
+        push_to_gateway(PROMETHEUS_GATEWAY, job='trend_forecast_engine', registry=registry)
+    except Exception as e:
+        logging.error("Failed to push forecast metrics to Prometheus: %s", e)
+        raise
+
+def run(args):
+    """Entry point of `aiops forecast` (see cli.py for the arguments)."""
+    backend = args.backend or BACKEND
+    if args.selector:
+        labels, forecasts, infos = forecast_fleet(args.selector, step=args.step,
+                                                  horizon=args.horizon or HORIZON,
+                                                  workers=args.workers, backend=backend)
+        push_fleet_forecasts(labels, forecasts)
+        if infos:
+            push_forecast_metrics(infos)
+    else:
+        metric_name = 'nab_metric'
+        data = pull_from_prometheus(metric_name)
+        forecast = forecast_trend(data, backend=backend)
+        push_forecast_to_prometheus(forecast)
@@ -0,0 +1,198 @@
+"""
+forecasters.py
+
+Pluggable forecasting backends with one batch interface:
+
+    yhat, lower, upper = make_forecaster("holt_winters", season=288).forecast(matrix, horizon)
+
+matrix is series x time on an equally spaced grid (NaN = missing point, as
+built by matrix_scoring.align_series). Every output has shape
+(n_series, T + horizon): the in-sample fit for the T observed steps followed
+by the forecast, like Prophet's predict() over make_future_dataframe().
+Bands are the `interval_width` central interval (0.8, Prophet's default).
+
+  holt_winters    additive Holt-Winters (optional damped trend); all series are
+                  smoothed together, one NumPy step per time point, and the
+                  smoothing level is chosen per series from a small grid
+  seasonal_naive  the value one season earlier (mean of the last `seasons`
+                  seasons for the forecast)
+  prophet         Prophet fitted per series (imported only when used)
+
+The NumPy backends take their bands from the empirical quantiles of the
+in-sample one-step residuals, widened with the horizon.
+"""
+import abc
+import math
+
+import numpy as np
+import pandas as pd
+
+class Forecaster(abc.ABC):
+    """Base class: subclasses implement forecast(matrix, horizon, grid=None)."""
+
+    kind = None
+
+    def __init__(self, interval_width: float = 0.8):
+        self.interval_width = interval_width
+
+    @abc.abstractmethod
+    def forecast(self, matrix: np.ndarray, horizon: int, grid: np.ndarray = None):
+        """Returns (yhat, yhat_lower, yhat_upper), each n_series x (T + horizon)."""
+
+    def _bands(self, matrix, fitted, yhat, growth):
+        """Residual-quantile bands; growth[h] scales them at horizon step h (1 in-sample)."""
+        q = (1 - self.interval_width) / 2
+        resid = matrix - fitted[:, :matrix.shape[1]]
+        ok = ~np.isnan(resid).all(axis=1)
+        lo = np.zeros((len(matrix), 1))
+        hi = np.zeros((len(matrix), 1))
+        if ok.any():
+            lo[ok, 0], hi[ok, 0] = np.nanquantile(resid[ok], [q, 1 - q], axis=1)
+        return yhat + lo * growth, yhat + hi * growth
+
+def _fill(matrix: np.ndarray) -> np.ndarray:
+    """Forward-fills gaps per series; leading gaps take the series mean (0 if all NaN)."""
+    filled = pd.DataFrame(matrix.T).ffill().to_numpy().T
+    with np.errstate(all="ignore"):
+        means = np.nan_to_num(np.nanmean(matrix, axis=1, keepdims=True)) if matrix.size else 0
+    return np.where(np.isnan(filled), means, filled)
+
+class HoltWintersForecaster(Forecaster):
+    """
+    Additive Holt-Winters, vectorized across series. The damped trend is off
+    by default (beta=0): extrapolated trends hurt more than they help on
+    CPU-style series (see benchmarks/bench_forecasters.py).
+    """
+
+    kind = "holt_winters"
+
+    def __init__(self, season: int = 288, alphas=(0.005, 0.01, 0.02, 0.05, 0.1),
+                 beta: float = 0.0, gamma: float = 0.1, phi: float = 0.98,
+                 interval_width: float = 0.8):
+        super().__init__(interval_width)
+        self.season = season
+        self.alphas = tuple(alphas)
+        self.beta = beta
+        self.gamma = gamma
+        self.phi = phi
+
+    def _smooth(self, x: np.ndarray, alpha: np.ndarray):
+        """One pass over time for all rows of x; returns (fitted, level, trend, seasonal)."""
+        n, t_len = x.shape
+        m = self.season if t_len >= 2 * self.season else 1
+        level = x[:, :m].mean(axis=1)
+        trend = (x[:, m:2 * m].mean(axis=1) - level) / m if t_len >= 2 * m else np.zeros(n)
+        seasonal = x[:, :m] - level[:, None] if m > 1 else np.zeros((n, 1))
+        fitted = np.empty_like(x)
+        beta, gamma, phi = self.beta, self.gamma, self.phi
+        for t in range(t_len):
+            s = seasonal[:, t % m]
+            damped = phi * trend
+            fitted[:, t] = level + damped + s
+            y = x[:, t]
+            new_level = alpha * (y - s) + (1 - alpha) * (level + damped)
+            trend = beta * (new_level - level) + (1 - beta) * damped
+            seasonal[:, t % m] = gamma * (y - new_level) + (1 - gamma) * s
+            level = new_level
+        return fitted, level, trend, seasonal, m
+
+    def forecast(self, matrix, horizon, grid=None):
+        matrix = np.asarray(matrix, dtype=np.float64)
+        n, t_len = matrix.shape
+        x = _fill(matrix)
+        # every candidate alpha is smoothed in the same pass: rows are (alpha, series)
+        k = len(self.alphas)
+        alpha = np.repeat(np.asarray(self.alphas), n)
+        fitted, level, trend, seasonal, m = self._smooth(np.tile(x, (k, 1)), alpha)
+        warm = min(m, t_len - 1)
+        sse = np.nansum(((np.tile(matrix, (k, 1)) - fitted)[:, warm:]) ** 2, axis=1)
+        best = sse.reshape(k, n).argmin(axis=0) * n + np.arange(n)
+        fitted, level, trend, seasonal = fitted[best], level[best], trend[best], seasonal[best]
+        alpha = alpha[best]
+
+        h = np.arange(1, horizon + 1)
+        damp = np.cumsum(self.phi ** h)
+        phase = (t_len + h - 1) % m
+        future = level[:, None] + trend[:, None] * damp + seasonal[:, phase]
+        yhat = np.hstack([fitted, future])
+        # forecast variance of simple exponential smoothing: 1 + (h - 1) * alpha^2
+        growth = np.hstack([np.ones((n, t_len)),
+                            np.sqrt(1 + (h - 1) * alpha[:, None] ** 2)])
+        fit_part = np.where(np.arange(t_len) < warm, np.nan, fitted)
+        lower, upper = self._bands(matrix, fit_part, yhat, growth)
+        return yhat, lower, upper
+
+class SeasonalNaiveForecaster(Forecaster):
+    """Repeats the last season (the mean of the last `seasons` seasons)."""
+
+    kind = "seasonal_naive"
+
+    def __init__(self, season: int = 288, seasons: int = 1, interval_width: float = 0.8):
+        super().__init__(interval_width)
+        self.season = season
+        self.seasons = seasons
+
+    def forecast(self, matrix, horizon, grid=None):
+        matrix = np.asarray(matrix, dtype=np.float64)
+        n, t_len = matrix.shape
+        x = _fill(matrix)
+        m = min(self.season, t_len)
+        fitted = np.full((n, t_len), np.nan)
+        fitted[:, m:] = x[:, :t_len - m]
+        k = max(1, min(self.seasons, t_len // m))
+        last = x[:, t_len - k * m:].reshape(n, k, m).mean(axis=1)
+        h = np.arange(1, horizon + 1)
+        future = last[:, (h - 1) % m]
+        yhat = np.hstack([np.where(np.isnan(fitted), x, fitted), future])
+        # each further season adds one more independent seasonal difference
+        growth = np.concatenate([np.ones(t_len), np.sqrt(np.ceil(h / m))])
+        lower, upper = self._bands(matrix, fitted, yhat, growth)
+        return yhat, lower, upper
+
+class ProphetForecaster(Forecaster):
+    """Prophet fitted per series; grid (Unix seconds of the columns) is required."""
+
+    kind = "prophet"
+
+    def __init__(self, interval_width: float = 0.8, **prophet_params):
+        super().__init__(interval_width)
+        self.prophet_params = prophet_params
+
+    def forecast(self, matrix, horizon, grid=None):
+        import logging
+        from prophet import Prophet
+
+        logging.getLogger("cmdstanpy").disabled = True
+        if grid is None:
+            raise ValueError("The prophet backend needs the timestamps of the columns (grid)")
+        matrix = np.asarray(matrix, dtype=np.float64)
+        step = grid[1] - grid[0] if len(grid) > 1 else 1.0
+        ds = pd.to_datetime(np.concatenate([grid, grid[-1] + step * np.arange(1, horizon + 1)]),
+                            unit="s")
+        out = [np.full((len(matrix), len(ds)), np.nan) for _ in range(3)]
+        for i, row in enumerate(matrix):
+            ok = ~np.isnan(row)
+            if ok.sum() < 2:
+                continue
+            model = Prophet(interval_width=self.interval_width, **self.prophet_params)
+            model.fit(pd.DataFrame({"ds": ds[:len(grid)][ok], "y": row[ok]}))
+            pred = model.predict(pd.DataFrame({"ds": ds}))
+            for arr, column in zip(out, ("yhat", "yhat_lower", "yhat_upper")):
+                arr[i] = pred[column].to_numpy()
+        return tuple(out)
+
+FORECASTERS = {cls.kind: cls for cls in
+               (HoltWintersForecaster, SeasonalNaiveForecaster, ProphetForecaster)}
+
+def make_forecaster(kind: str = "holt_winters", **params) -> Forecaster:
+    """Builds a forecaster by name ('holt_winters', 'seasonal_naive' or 'prophet')."""
+    try:
+        return FORECASTERS[kind](**params)
+    except KeyError:
+        raise ValueError(f"Unknown forecaster: {kind} (expected one of {sorted(FORECASTERS)})")
+
+def horizon_steps(periods: int, freq: str, step: float) -> int:
+    """Number of grid steps of `step` seconds covering `periods` x `freq` (e.g. 30, 'D')."""
+    epoch = pd.Timestamp(0)
+    span = (epoch + pd.tseries.frequencies.to_offset(freq) - epoch).total_seconds() * periods
+    return max(1, math.ceil(span / step))
@@ -0,0 +1,357 @@
+"""
+ingest_data.py
+
+NAB CSVs -> backfill files: OpenMetrics text for promtool tsdb
+create-blocks-from openmetrics, or compact columnar .col files (columnar.py).
+CSVs are parsed and formatted column-wise, several files at a time in
+processes.
+
+<output>.manifest.json records every converted file, so a later run skips
+unchanged files, converts only the rows appended to a file since, and
+after an interrupted columnar run redoes only the files it did not finish.
+An OpenMetrics output therefore holds only the samples no previous run
+wrote; --full rewrites everything.
+
+Usage:
+  python -m aiops ingest --input data/nab/realAWSCloudwatch --output metrics.om
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .columnar import append_series, write_series
+from .config import PROJECT_DIR
+from .export_format import escape_label_value, format_lines
+from .instrumentation import STATS, reset_stats, stage
+from .manifest import Manifest, APPENDED, UNCHANGED
+from .query_client import parse_duration
+
+# --- Configuration ---
+csv_file_path = os.path.join(PROJECT_DIR, 'data', 'nab', 'realAWSCloudwatch',
+                             'ec2_cpu_utilization_ac20cd.csv')
+output_file_path = 'metrics.om'
+columnar_file_path = 'metrics.col'
+columnar_dir_path = 'metrics_col'
+metric_name = 'numenta_cpu_aws'
+# Add any labels you want to associate with the metric; with a directory of
+# CSVs, instance is replaced by each file's name
+labels = {'job': 'numenta_import', 'instance': 'cloudwatch_benchmark'}
+# samples formatted and written at a time
+chunk_size = 100_000
+
+def list_inputs(path):
+    """The CSV at path, or every CSV below the directory path, sorted."""
+    if os.path.isdir(path):
+        found = sorted(os.path.join(root, name) for root, _, names in os.walk(path)
+                       for name in names if name.endswith('.csv'))
+        if not found:
+            raise FileNotFoundError(f"No CSV files under '{path}'")
+        return found
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"The file '{path}' was not found")
+    return [path]
+
+def series_labels(csv_path, single=True):
+    """labels for a single input; for one of many, instance is the CSV's file name."""
+    if single:
+        return dict(labels)
+    return dict(labels, instance=os.path.splitext(os.path.basename(csv_path))[0])
+
+def year_shift_ms(first_ms, year):
+    """Offset moving first_ms to the same date and time in `year` (Feb 29 -> Feb 28)."""
+    first = pd.Timestamp(first_ms, unit='ms')
+    try:
+        target = first.replace(year=year)
+    except ValueError:
+        target = first.replace(year=year, day=28)
+    return (target - first) // pd.Timedelta(milliseconds=1)
+
+def shift_offset_ms(ts_ms, shift='year', now_ms=None):
+    """
+    The offset read_series() moves a series by: 'year' puts its first sample
+    in the current year, 'now' its last sample at now_ms, 'none' keeps it.
+    """
+    if shift not in ('year', 'now', 'none'):
+        raise ValueError(f"Unsupported shift: {shift}")
+    if not len(ts_ms) or shift == 'none':
+        return 0
+    if shift == 'year':
+        return int(year_shift_ms(int(ts_ms[0]), datetime.now().year))
+    return (now_ms or int(time.time()) * 1000) - int(ts_ms[-1])
+
+def read_series(csv_path, shift='year', time_fmt=None, now_ms=None, offset_ms=None):
+    """
+    Reads a NAB CSV into time-sorted int64 ms timestamps and float64 values.
+    Unparsable or non-finite rows are dropped and a duplicate timestamp keeps
+    its last value. The whole series is then moved by one offset (see
+    shift_offset_ms(), or offset_ms when given). A single offset keeps the
+    sample spacing intact, which replacing the year of every row does not
+    across Dec 31 or Feb 29.
+    """
+    with stage("parse", bytes=os.path.getsize(csv_path)) as s:
+        df = pd.read_csv(csv_path, usecols=['timestamp', 'value'])
+        ts = pd.to_datetime(df['timestamp'], format=time_fmt or 'ISO8601', errors='coerce')
+        vals = pd.to_numeric(df['value'], errors='coerce').to_numpy(dtype=np.float64)
+        ok = ts.notna().to_numpy() & np.isfinite(vals)
+        ts_ms = ((ts[ok] - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)).to_numpy(np.int64)
+        order = np.argsort(ts_ms, kind='stable')
+        ts_ms, vals = ts_ms[order], vals[ok][order]
+        last = np.append(ts_ms[1:] != ts_ms[:-1], True)
+        ts_ms, vals = ts_ms[last], vals[last]
+        if offset_ms is None:
+            offset_ms = shift_offset_ms(ts_ms, shift, now_ms)
+        ts_ms = ts_ms + offset_ms
+        s.add(rows=len(ts_ms))
+    return ts_ms, vals
+
+def format_openmetrics(ts_ms, vals, prefix):
+    """OpenMetrics sample lines; timestamps in seconds, with milliseconds only when needed."""
+    secs, ms = np.divmod(ts_ms, 1000)
+    if ms.any():
+        # "<s>.<ms>" stamps, rendered in one %-format call as well
+        pairs = np.empty(2 * len(secs), dtype=np.int64)
+        pairs[0::2], pairs[1::2] = secs, ms
+        stamps = ("%d.%03d\n" * len(secs) % tuple(pairs.tolist())).split("\n")[:-1]
+    else:
+        stamps = secs
+    return format_lines(prefix, vals, stamps)
+
+def convert_csv(csv_path, out_path, fmt='openmetrics', metric=metric_name, series=None,
+                shift='year', time_fmt=None, now_ms=None, block_ms=0, offset_ms=None,
+                after_ms=None):
+    """
+    Converts one CSV. 'openmetrics' writes its sample lines (no # TYPE or
+    # EOF, see assemble()) to out_path and records the byte range of every
+    block_ms-aligned block; 'columnar' writes a .col file (see columnar.py).
+    With after_ms only the (shifted) samples newer than it are converted,
+    and appended to an existing .col file; pass the offset_ms of the
+    earlier run so the appended rows are shifted alike.
+    Returns {"source", "path", "labels", "rows", "first_ts", "last_ts",
+    "offset_ms", "blocks"}, blocks being [(block start ms, offset, length), ...].
+    """
+    series = series or series_labels(csv_path)
+    ts_ms, vals = read_series(csv_path, 'none', time_fmt)
+    if offset_ms is None:
+        offset_ms = shift_offset_ms(ts_ms, shift, now_ms)
+    ts_ms = ts_ms + offset_ms
+    if after_ms is not None:
+        newer = ts_ms > after_ms
+        ts_ms, vals = ts_ms[newer], vals[newer]
+    result = {"source": csv_path, "path": out_path, "labels": series, "rows": len(ts_ms),
+              "blocks": [], "offset_ms": int(offset_ms),
+              "first_ts": int(ts_ms[0]) if len(ts_ms) else None,
+              "last_ts": int(ts_ms[-1]) if len(ts_ms) else None}
+    if fmt == 'columnar':
+        write = append_series if after_ms is not None else write_series
+        with stage("write", rows=len(ts_ms)) as s:
+            s.add(bytes=write(out_path, metric, series, ts_ms * 1_000_000, vals))
+        return result
+    if fmt != 'openmetrics':
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    label_str = ",".join(f'{k}="{escape_label_value(v)}"' for k, v in series.items())
+    prefix = f"{metric}{{{label_str}}} "
+    block_ids = ts_ms // block_ms if block_ms else np.zeros(len(ts_ms), dtype=np.int64)
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(block_ids)) + 1, [len(ts_ms)]])
+    with open(out_path, 'wb') as fh:
+        for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            if start == end:
+                continue
+            offset = fh.tell()
+            with stage("format", rows=end - start) as s:
+                for i in range(start, end, chunk_size):
+                    j = min(i + chunk_size, end)
+                    data = format_openmetrics(ts_ms[i:j], vals[i:j], prefix).encode()
+                    fh.write(data)
+                    s.add(bytes=len(data))
+            result["blocks"].append((int(block_ids[start]) * block_ms, offset, fh.tell() - offset))
+    return result
+
+def _convert_pooled(job):
+    return convert_csv(**job), STATS.drain()
+
+def _copy_range(src, dst, offset, length, block_size=1 << 20):
+    src.seek(offset)
+    while length > 0:
+        data = src.read(min(length, block_size))
+        if not data:
+            break
+        dst.write(data)
+        length -= len(data)
+
+def assemble(results, output, metric=metric_name, block_ms=0):
+    """
+    Concatenates the sample lines of convert_csv() results, in the given
+    series order, into OpenMetrics files for promtool tsdb
+    create-blocks-from openmetrics: one # TYPE line, each series contiguous
+    and in time order, # EOF. Without block_ms everything goes to output,
+    otherwise one file per block, <output stem>-<block start s><ext>.
+    Returns the paths written.
+    """
+    by_block = {} if block_ms else {0: []}
+    for result in results:
+        for start, offset, length in result["blocks"]:
+            by_block.setdefault(start, []).append((result["path"], offset, length))
+    stem, ext = os.path.splitext(output)
+    written = []
+    for start in sorted(by_block):
+        path = f"{stem}-{start // 1000}{ext}" if block_ms else output
+        with stage("write") as s, open(f"{path}.tmp", 'wb') as out:
+            out.write(f"# TYPE {metric} gauge\n".encode())
+            for part, offset, length in by_block[start]:
+                with open(part, 'rb') as src:
+                    _copy_range(src, out, offset, length)
+            out.write(b"# EOF\n")
+            s.add(bytes=out.tell())
+        os.replace(f"{path}.tmp", path)
+        written.append(path)
+    return written
+
+def backfill(inputs, output, fmt='openmetrics', workers=1, block_range=0, shift='year',
+             time_fmt=None, metric=metric_name, plans=None, on_converted=None):
+    """
+    Converts the CSVs in inputs, `workers` at a time in processes, into
+    output: an OpenMetrics file (or one per block_range seconds), a .col
+    file for a single columnar input or a directory of .col files.
+    plans maps a CSV to convert_csv() overrides (offset_ms, after_ms), or to
+    None to leave it out; on_converted is called with each result as soon
+    as its file is converted.
+    Returns (convert_csv() results in series order, paths written).
+    """
+    plans = plans or {}
+    single = len(inputs) == 1
+    now_ms = int(time.time()) * 1000
+    block_ms = int(block_range * 1000)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix='.ingest_', dir=os.path.dirname(os.path.abspath(output)))
+    if fmt == 'columnar' and not single:
+        os.makedirs(output, exist_ok=True)
+    jobs = []
+    for i, csv_path in enumerate(inputs):
+        plan = plans.get(csv_path, {})
+        if plan is None:
+            continue
+        series = series_labels(csv_path, single)
+        if fmt == 'columnar':
+            out_path = output if single else os.path.join(output, f"{series['instance']}.col")
+        else:
+            out_path = os.path.join(tmp, f"{i}.part")
+        jobs.append({"csv_path": csv_path, "out_path": out_path, "fmt": fmt, "metric": metric,
+                     "series": series, "shift": shift, "time_fmt": time_fmt, "now_ms": now_ms,
+                     "block_ms": block_ms, **plan})
+    try:
+        results = []
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs)),
+                                     initializer=reset_stats) as pool:
+                for result, stats in pool.map(_convert_pooled, jobs):
+                    STATS.merge(stats)
+                    results.append(result)
+                    if on_converted:
+                        on_converted(result)
+        else:
+            for job in jobs:
+                results.append(convert_csv(**job))
+                if on_converted:
+                    on_converted(results[-1])
+        results.sort(key=lambda r: sorted(r["labels"].items()))
+        if fmt == 'columnar':
+            return results, [r["path"] for r in results]
+        return results, assemble(results, output, metric, block_ms)
+    finally:
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+def plan_file(manifest, csv_path, out_path, options, full=False):
+    """
+    Decides from its manifest entry how much of csv_path to convert: None
+    to skip it, {} for all of it, or the offset_ms/after_ms of the rows
+    appended since the last run (see convert_csv()). A columnar file whose
+    .col is gone is converted again; out_path is None for OpenMetrics,
+    whose output only ever holds the new samples. 'now' shifts move with
+    the clock, so they always convert everything.
+    """
+    entry = manifest.entry(csv_path) or {}
+    status = None
+    if not full and options["shift"] != 'now' and entry.get("options") == options:
+        status = manifest.status(csv_path, "converted")
+    have_output = out_path is None or os.path.exists(out_path)
+    if status == UNCHANGED and have_output:
+        return None
+    if status == APPENDED and have_output and entry.get("last_written_ts") is not None \
+            and entry.get("offset_ms") is not None:
+        plan = {"offset_ms": entry["offset_ms"], "after_ms": entry["last_written_ts"]}
+        manifest.begin(csv_path, status, options=options, rows=entry.get("rows") or 0,
+                       offset_ms=entry["offset_ms"], last_written_ts=entry["last_written_ts"])
+        return plan
+    manifest.begin(csv_path, None, options=options, rows=0)
+    return {}
+
+def finish_file(manifest, result):
+    """Records a converted file in the manifest (saved at most once per autosave interval)."""
+    entry = manifest.entry(result["source"])
+    last_ts = result["last_ts"] if result["last_ts"] is not None else entry.get("last_written_ts")
+    manifest.update(result["source"], save=False, converted=True, offset_ms=result["offset_ms"],
+                    rows=(entry.get("rows") or 0) + result["rows"], last_written_ts=last_ts)
+    manifest.save(force=False)
+
+def run(args):
+    """Entry point of `aiops ingest` (see cli.py for the arguments)."""
+    args.input = args.input or csv_file_path
+    columnar = args.format == 'columnar'
+    try:
+        inputs = list_inputs(args.input)
+    except FileNotFoundError as e:
+        print(f"Error: {e}.")
+        raise SystemExit(1)
+    if columnar and args.block_range:
+        raise SystemExit("--block-range applies to OpenMetrics output only")
+    single = len(inputs) == 1
+    if not args.output:
+        if columnar:
+            args.output = columnar_file_path if single else columnar_dir_path
+        else:
+            args.output = output_file_path
+    block_range = parse_duration(args.block_range) if args.block_range else 0
+    metric = args.metric or metric_name
+    options = {"format": args.format, "block_range": block_range, "shift": args.shift,
+               "metric": metric, "time_format": args.time_format, "single": single}
+
+    manifest = Manifest(args.manifest or f"{args.output}.manifest.json")
+    plans = {}
+    for csv_path in inputs:
+        out_path = None
+        if columnar:
+            out_path = args.output if single else os.path.join(
+                args.output, f"{series_labels(csv_path, single)['instance']}.col")
+        plans[csv_path] = plan_file(manifest, csv_path, out_path, options, args.full)
+    todo = [p for p in inputs if plans[p] is not None]
+    if not todo:
+        print(f"'{args.input}' is unchanged since the last run, nothing to do.")
+        return
+
+    kind = 'columnar' if columnar else 'OpenMetrics'
+    appended = sum(1 for p in todo if plans[p])
+    print(f"Converting {len(todo)} file(s) from '{args.input}' to {kind} format"
+          f"{f' ({appended} appended)' if appended else ''}...")
+    # a .col file is complete once converted, OpenMetrics samples only once assembled
+    on_converted = (lambda result: finish_file(manifest, result)) if columnar else None
+    try:
+        results, written = backfill(inputs, args.output, args.format,
+                                    args.workers or os.cpu_count(), block_range, args.shift,
+                                    args.time_format, metric, plans, on_converted)
+        if not columnar:
+            for result in results:
+                finish_file(manifest, result)
+    finally:
+        manifest.save()
+
+    rows = sum(r["rows"] for r in results)
+    target = args.output if len(written) == 1 else f"{len(written)} files ({args.output})"
+    print(f"✅ Successfully wrote {rows} samples to {kind} {target}")
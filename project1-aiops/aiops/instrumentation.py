@@ -0,0 +1,251 @@
+"""
+instrumentation.py
+
+Where a run spends its time: per-stage wall time, rows, bytes and retries
+for the pipeline hot paths (CSV parse, line formatting, HTTP push, query
+and decode, model fit / predict, scoring).
+
+    with stage("push", rows=len(lines)) as s:
+        body = ...
+        s.add(bytes=len(body))
+    retry("push")
+
+Stages are recorded in process memory (STATS) and exposed to
+prometheus_client by StageCollector as
+
+  aiops_stage_seconds{stage}         histogram of the wall time per call
+  aiops_stage_rows_total{stage}      rows / samples / points processed
+  aiops_stage_bytes_total{stage}     bytes read, formatted or sent
+  aiops_stage_retries_total{stage}   retried requests
+
+so they can be pushed to the Pushgateway (`--push-metrics`), served on
+/metrics by the daemon (`serve --metrics-port`) or written as a JSON run
+report (`--report`). `--profile` also dumps a cProfile of the command.
+Process pools do not share STATS: workers return drain() and the parent
+merge()s it.
+"""
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CollectorRegistry, push_to_gateway, start_http_server
+from prometheus_client.core import CounterMetricFamily, HistogramMetricFamily
+
+from .config import config
+
+PUSH_GATEWAY = config.get('Prometheus', 'PushGateway', fallback=None)
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+class StageStats:
+    """Thread-safe per-stage counters and fixed-bucket latency histograms."""
+
+    FIELDS = ("count", "seconds", "max_seconds", "rows", "bytes", "retries")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def _get(self, name):
+        entry = self._stages.get(name)
+        if entry is None:
+            entry = self._stages[name] = dict.fromkeys(self.FIELDS, 0)
+            entry["buckets"] = [0] * len(BUCKETS)
+        return entry
+
+    def record(self, name, seconds, rows=0, bytes=0):
+        with self._lock:
+            entry = self._get(name)
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["rows"] += rows
+            entry["bytes"] += bytes
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+                    break
+
+    def retry(self, name, n=1):
+        with self._lock:
+            self._get(name)["retries"] += n
+
+    def snapshot(self) -> dict:
+        """{stage: {count, seconds, max_seconds, rows, bytes, retries, buckets}} (a copy)."""
+        with self._lock:
+            return {name: dict(entry, buckets=list(entry["buckets"]))
+                    for name, entry in self._stages.items()}
+
+    def drain(self) -> dict:
+        """snapshot() and reset, for worker processes reporting to their parent."""
+        with self._lock:
+            stages, self._stages = self._stages, {}
+        return stages
+
+    def merge(self, stages: dict):
+        with self._lock:
+            for name, other in stages.items():
+                entry = self._get(name)
+                for field in self.FIELDS:
+                    if field == "max_seconds":
+                        entry[field] = max(entry[field], other[field])
+                    else:
+                        entry[field] += other[field]
+                entry["buckets"] = [a + b for a, b in zip(entry["buckets"], other["buckets"])]
+
+STATS = StageStats()
+
+class Stage:
+    """Handle yielded by stage(): add() rows and bytes as they become known."""
+
+    __slots__ = ("name", "rows", "bytes", "seconds")
+
+    def __init__(self, name, rows=0, bytes=0):
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+        self.seconds = 0.0
+
+    def add(self, rows=0, bytes=0):
+        self.rows += rows
+        self.bytes += bytes
+
+@contextmanager
+def stage(name, rows=0, bytes=0, stats=None):
+    """Times the block as one call of stage `name`, also when it raises."""
+    handle = Stage(name, rows, bytes)
+    t0 = time.perf_counter()
+    try:
+        yield handle
+    finally:
+        handle.seconds = time.perf_counter() - t0
+        (stats or STATS).record(name, handle.seconds, handle.rows, handle.bytes)
+
+def retry(name, n=1):
+    STATS.retry(name, n)
+
+def reset_stats():
+    """Process-pool initializer: a forked worker must not report its parent's stages again."""
+    STATS.drain()
+
+class StageCollector:
+    """prometheus_client collector exposing a StageStats."""
+
+    def __init__(self, stats=None):
+        self.stats = stats or STATS
+
+    def collect(self):
+        seconds = HistogramMetricFamily("aiops_stage_seconds",
+                                        "Wall time per call of a pipeline stage", labels=["stage"])
+        rows = CounterMetricFamily("aiops_stage_rows", "Rows processed by a pipeline stage",
+                                   labels=["stage"])
+        size = CounterMetricFamily("aiops_stage_bytes", "Bytes processed by a pipeline stage",
+                                   labels=["stage"])
+        retries = CounterMetricFamily("aiops_stage_retries", "Retried requests of a pipeline stage",
+                                      labels=["stage"])
+        for name, entry in sorted(self.stats.snapshot().items()):
+            cumulative, buckets = 0, []
+            for bound, n in zip(BUCKETS, entry["buckets"]):
+                cumulative += n
+                buckets.append((str(bound), cumulative))
+            buckets.append(("+Inf", entry["count"]))
+            seconds.add_metric([name], buckets, entry["seconds"])
+            rows.add_metric([name], entry["rows"])
+            size.add_metric([name], entry["bytes"])
+            retries.add_metric([name], entry["retries"])
+        return [seconds, rows, size, retries]
+
+def make_registry(stats=None) -> CollectorRegistry:
+    registry = CollectorRegistry()
+    registry.register(StageCollector(stats))
+    return registry
+
+def push_stage_metrics(gateway, job):
+    """Pushes the stage metrics of this run to the Pushgateway under `job`."""
+    try:
+        push_to_gateway(gateway, job=job, registry=make_registry())
+        logging.info("Stage metrics pushed to %s as job %s.", gateway, job)
+    except Exception as e:
+        logging.error("Failed to push stage metrics to %s: %s", gateway, e)
+        raise
+
+def serve_stage_metrics(port, addr="0.0.0.0"):
+    """Serves the stage metrics on http://addr:port/metrics from a background thread."""
+    start_http_server(port, addr=addr, registry=make_registry())
+    logging.info("Stage metrics served on %s:%d/metrics", addr, port)
+
+def report(stats=None) -> dict:
+    """Per-stage totals of this run: calls, seconds, mean / max, rows, bytes, rows/s, retries."""
+    out = {}
+    for name, entry in sorted((stats or STATS).snapshot().items()):
+        busy = max(entry["seconds"], 1e-12)
+        out[name] = {"count": entry["count"], "seconds": round(entry["seconds"], 6),
+                     "mean_seconds": round(entry["seconds"] / max(entry["count"], 1), 6),
+                     "max_seconds": round(entry["max_seconds"], 6),
+                     "rows": entry["rows"], "bytes": entry["bytes"],
+                     "rows_per_second": round(entry["rows"] / busy, 1),
+                     "retries": entry["retries"]}
+    return out
+
+def summary(stats=None) -> str:
+    """One line per run for the log: 'decode 3x 0.12s 8640 rows, push 2x ...'."""
+    parts = []
+    for name, entry in report(stats).items():
+        part = f"{name} {entry['count']}x {entry['seconds']:.3f}s"
+        if entry["rows"]:
+            part += f" {entry['rows']} rows"
+        if entry["bytes"]:
+            part += f" {entry['bytes'] / 1e6:.2f} MB"
+        if entry["retries"]:
+            part += f" {entry['retries']} retries"
+        parts.append(part)
+    return ", ".join(parts) or "no stages recorded"
+
+def write_report(path, command, elapsed, status):
+    """Writes the JSON run report: command, end time, wall time, status and report()."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump({"command": command, "finished": time.time(), "seconds": round(elapsed, 6),
+                   "status": status, "stages": report()}, fh, indent=2)
+
+@contextmanager
+def profiled(path=None):
+    """cProfile's the block and dumps the stats to path (pstats / snakeviz format); no-op without path."""
+    if not path:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+        logging.info("cProfile stats written to %s", path)
+
+def run_instrumented(func, args, gateway=PUSH_GATEWAY):
+    """
+    Runs func(args) for the CLI: under cProfile with args.profile, then logs
+    the stage summary, writes args.report and pushes to the Pushgateway
+    (job aiops_<command>) with args.push_metrics, also when func raises.
+    """
+    status = "error"
+    t0 = time.perf_counter()
+    try:
+        with profiled(args.profile):
+            result = func(args)
+        status = "ok"
+        return result
+    finally:
+        elapsed = time.perf_counter() - t0
+        logging.info("%s %s in %.2fs: %s", args.command, status, elapsed, summary())
+        if args.report:
+            write_report(args.report, args.command, elapsed, status)
+        if args.push_metrics and gateway:
+            push_stage_metrics(gateway, f"aiops_{args.command}")
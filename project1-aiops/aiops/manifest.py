@@ -0,0 +1,205 @@
+"""
+manifest.py
+
+Per-file checkpoint manifest for incremental / resumable ingestion.
+
+For every source file the manifest records its size, mtime, content hash,
+the last timestamp that was written or acknowledged by the TSDB and the last
+acknowledged batch, so that a later run can:
+
+  * skip files that have not changed since they were fully processed,
+  * process only the rows appended since the previous run,
+  * resume a partially pushed file right after its last acknowledged batch.
+
+The manifest is a small JSON file, rewritten atomically on save().
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+MANIFEST_VERSION = 1
+
+# file status returned by Manifest.status()
+NEW = "new"
+UNCHANGED = "unchanged"
+APPENDED = "appended"
+PARTIAL = "partial"
+CHANGED = "changed"
+
+def file_sha256(path: str, limit: int = None, block_size: int = 1 << 20) -> str:
+    """sha256 of the first `limit` bytes of path (the whole file if limit is None)."""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as fh:
+        while remaining is None or remaining > 0:
+            size = block_size if remaining is None else min(block_size, remaining)
+            block = fh.read(size)
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+class Manifest:
+    """JSON-backed map of source path -> checkpoint entry. Thread-safe."""
+
+    def __init__(self, path: str, autosave_interval: float = 1.0):
+        self.path = path
+        self.autosave_interval = autosave_interval
+        self._lock = threading.RLock()
+        self._last_save = 0.0
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, "r") as fh:
+                doc = json.load(fh)
+            if doc.get("version") == MANIFEST_VERSION:
+                self.files = doc.get("files", {})
+
+    @staticmethod
+    def key(src_path: str) -> str:
+        return os.path.abspath(src_path)
+
+    def entry(self, src_path: str) -> dict:
+        with self._lock:
+            return self.files.get(self.key(src_path))
+
+    def status(self, src_path: str, stage: str) -> str:
+        """
+        Classifies src_path against its entry for `stage` ('pushed' or 'converted').
+
+        size+mtime equality is trusted without hashing so unchanged files cost
+        one stat(); otherwise the hash decides between unchanged (touched only),
+        appended (old content is a prefix of the new one) and changed.
+        """
+        entry = self.entry(src_path)
+        if entry is None:
+            return NEW
+        st = os.stat(src_path)
+        same = st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]
+        resumable = entry.get("last_pushed_ts") is not None
+        if not same:
+            if st.st_size < entry["size"] or \
+                    file_sha256(src_path, entry["size"]) != entry["sha256"]:
+                return CHANGED
+            if st.st_size > entry["size"]:
+                if entry.get(stage):
+                    return APPENDED
+                return PARTIAL if resumable else CHANGED
+            # touched but identical: remember the new mtime to skip the hash next time
+            self.update(src_path, mtime_ns=st.st_mtime_ns)
+        if entry.get(stage):
+            return UNCHANGED
+        return PARTIAL if resumable else CHANGED
+
+    def begin(self, src_path: str, status: str, **extra) -> dict:
+        """
+        Records the current fingerprint of src_path before (re)processing it.
+
+        The push checkpoint survives for appended/partial files and is reset
+        otherwise. Returns the live entry.
+        """
+        st = os.stat(src_path)
+        with self._lock:
+            old = self.files.get(self.key(src_path)) or {}
+            keep = status in (APPENDED, PARTIAL)
+            entry = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha256": file_sha256(src_path),
+                "converted": False,
+                "pushed": False,
+                "last_pushed_ts": old.get("last_pushed_ts") if keep else None,
+                "last_acked_batch": old.get("last_acked_batch", -1) if keep else -1,
+                "updated": time.time(),
+            }
+            entry.update(extra)
+            self.files[self.key(src_path)] = entry
+            self.save()
+            return entry
+
+    def update(self, src_path: str, save: bool = True, **fields):
+        with self._lock:
+            entry = self.files[self.key(src_path)]
+            entry.update(fields)
+            entry["updated"] = time.time()
+            if save:
+                self.save()
+
+    def tracker(self, src_path: str) -> "AckTracker":
+        return AckTracker(self, src_path)
+
+    def save(self, force: bool = True):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < self.autosave_interval:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump({"version": MANIFEST_VERSION, "files": self.files}, fh,
+                          indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._last_save = now
+
+class AckTracker:
+    """
+    Advances a file's checkpoint as its push batches are acknowledged.
+
+    Batches may complete out of order (see nab_to_vm.BatchPusher); only the
+    contiguous acknowledged prefix is recorded, so last_pushed_ts is always
+    safe to resume from. Batch numbering continues from the entry's
+    last_acked_batch. Call next_index() per submitted batch and seal() after
+    the last one; the file is marked pushed once every batch is acked.
+    """
+
+    def __init__(self, manifest: Manifest, src_path: str):
+        self.manifest = manifest
+        self.src_path = src_path
+        self._base = manifest.entry(src_path).get("last_acked_batch", -1) + 1
+        self._acked = {}
+        self._next = self._base
+        self._submitted = 0
+        self._done = 0
+        self._sealed = False
+        self.failed = False
+
+    def next_index(self) -> int:
+        with self.manifest._lock:
+            self._submitted += 1
+            return self._base + self._submitted - 1
+
+    def ack(self, batch_index: int, last_ts: int):
+        with self.manifest._lock:
+            self._acked[batch_index] = last_ts
+            last = None
+            while self._next in self._acked:
+                last = self._acked.pop(self._next)
+                self._next += 1
+            if last is not None:
+                self.manifest.update(self.src_path, save=False,
+                                     last_acked_batch=self._next - 1, last_pushed_ts=last)
+                self.manifest.save(force=False)
+            self._finish_one()
+
+    def fail(self, batch_index: int):
+        with self.manifest._lock:
+            self.failed = True
+            self._finish_one()
+
+    def seal(self):
+        with self.manifest._lock:
+            self._sealed = True
+            self._maybe_complete()
+
+    def _finish_one(self):
+        self._done += 1
+        self._maybe_complete()
+
+    def _maybe_complete(self):
+        if self._sealed and self._done == self._submitted:
+            if not self.failed:
+                self.manifest.update(self.src_path, save=False, pushed=True)
+            self.manifest.save()
@@ -0,0 +1,152 @@
+"""
+matrix_scoring.py
+
+Score many series at once. Series are aligned onto a shared step grid as one
+contiguous float64 matrix (series x time, NaN where a series has no point),
+then scored either with vectorized NumPy/pandas statistics over the whole
+matrix or with IsolationForest fitted per series in a process pool.
+
+Scores are continuous and higher means more anomalous. changepoint_scores()
+rates each whole series instead: the size of its strongest level shift.
+
+  robust          |x - median| / (1.4826 * MAD) per series, one pass over the matrix
+  rolling_robust  same against a trailing window's median/MAD (adapts to drift)
+  seasonal_robust robust z-score of x[t] - x[t - season] (a daily pattern is no anomaly)
+  isolation_forest  -score_samples of a per-series IsolationForest, rows split
+                  across `workers` processes
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# MAD of a standard normal distribution is 1/1.4826 sigma
+MAD_TO_SIGMA = 1.4826
+
+METHODS = ("robust", "rolling_robust", "seasonal_robust", "isolation_forest")
+
+def align_series(series, start: float, end: float, step: float):
+    """
+    Places [(timestamps, values), ...] onto the grid start, start+step, ..., end.
+
+    Returns (grid, matrix) where matrix[i, j] is series i at grid[j] or NaN.
+    Timestamps are snapped to the nearest grid slot; points outside are dropped.
+    """
+    grid = np.arange(start, end + step / 2, step, dtype=np.float64)
+    matrix = np.full((len(series), len(grid)), np.nan)
+    for row, (ts, vals) in zip(matrix, series):
+        idx = np.rint((np.asarray(ts, dtype=np.float64) - start) / step).astype(np.int64)
+        ok = (idx >= 0) & (idx < len(grid))
+        row[idx[ok]] = np.asarray(vals, dtype=np.float64)[ok]
+    return grid, matrix
+
+def robust_zscores(matrix: np.ndarray, min_scale: float = 1e-9) -> np.ndarray:
+    """Robust z-score of every point against its own series' median and MAD."""
+    median = np.nanmedian(matrix, axis=1, keepdims=True)
+    mad = np.nanmedian(np.abs(matrix - median), axis=1, keepdims=True)
+    return np.abs(matrix - median) / np.maximum(mad * MAD_TO_SIGMA, min_scale)
+
+def rolling_robust_zscores(matrix: np.ndarray, window: int = 288,
+                           min_periods: int = 30, min_scale: float = 1e-9) -> np.ndarray:
+    """
+    Robust z-score against the median/MAD of each series' trailing window
+    (the point itself excluded). All series are rolled together by pandas.
+    """
+    frame = pd.DataFrame(matrix.T)
+    rolling = frame.shift(1).rolling(window, min_periods=min_periods)
+    median = rolling.median()
+    # MAD approximated from the IQR so both are single vectorized rolling passes
+    iqr = rolling.quantile(0.75) - rolling.quantile(0.25)
+    scale = (iqr / 1.349).to_numpy().T
+    scores = np.abs(matrix - median.to_numpy().T) / np.maximum(scale, min_scale)
+    return np.where(np.isnan(median.to_numpy().T), 0.0, scores)
+
+def seasonal_robust_zscores(matrix: np.ndarray, season: int = 288, min_scale: float = 1e-9,
+                            rel_floor: float = 0.1) -> np.ndarray:
+    """
+    Robust z-score of each point's change since one season earlier, so a
+    repeating daily pattern does not score. The scale is floored at
+    rel_floor * std of the changes, for series that are constant most of
+    the time (MAD 0). The first season columns score 0; matrices shorter
+    than two seasons fall back to robust_zscores.
+    """
+    if matrix.shape[1] < 2 * season:
+        return robust_zscores(matrix, min_scale)
+    change = matrix[:, season:] - matrix[:, :-season]
+    floor = np.maximum(rel_floor * np.nanstd(change, axis=1, keepdims=True), min_scale)
+    scores = np.zeros(matrix.shape)
+    scores[:, season:] = robust_zscores(change, np.nan_to_num(floor, nan=min_scale))
+    return np.nan_to_num(scores)
+
+def changepoint_scores(matrix: np.ndarray, min_size: int = 12, rel_floor: float = 0.05):
+    """
+    Strongest single level shift of every series, all rows in one pass.
+
+    The split k maximising the between-segment sum of squares
+    k (n - k) / n * (mean_before - mean_after)^2 is found from cumulative
+    sums; the score is |mean_before - mean_after| over the pooled standard
+    deviation within the two segments (floored at rel_floor * the series'
+    std), i.e. the shift in units of the noise around it. NaNs count as the
+    series median. Returns (scores, k), k being the first column after the
+    shift; series shorter than 2 * min_size score 0.
+    """
+    n_rows, n = matrix.shape
+    if n < 2 * min_size:
+        return np.zeros(n_rows), np.zeros(n_rows, dtype=np.int64)
+    median = np.nanmedian(matrix, axis=1, keepdims=True)
+    x = np.nan_to_num(np.where(np.isnan(matrix), median, matrix))
+    total, total_sq = np.cumsum(x, axis=1), np.cumsum(x * x, axis=1)
+    k = np.arange(min_size, n - min_size + 1)
+    left, left_sq = total[:, k - 1], total_sq[:, k - 1]
+    mean_before = left / k
+    mean_after = (total[:, -1:] - left) / (n - k)
+    best = np.argmax(k * (n - k) / n * (mean_before - mean_after) ** 2, axis=1)
+    rows = np.arange(n_rows)
+    kb = k[best]
+    before, after = mean_before[rows, best], mean_after[rows, best]
+    within = (left_sq[rows, best] - kb * before ** 2 +
+              total_sq[:, -1] - left_sq[rows, best] - (n - kb) * after ** 2) / (n - 2)
+    floor = np.maximum(rel_floor * x.std(axis=1), 1e-12)
+    scale = np.maximum(np.sqrt(np.maximum(within, 0.0)), floor)
+    return np.abs(before - after) / scale, kb
+
+def _isolation_forest_rows(rows: np.ndarray, n_estimators: int, random_state: int) -> np.ndarray:
+    from sklearn.ensemble import IsolationForest
+
+    out = np.full(rows.shape, np.nan)
+    for i, row in enumerate(rows):
+        ok = ~np.isnan(row)
+        if ok.sum() < 2:
+            continue
+        model = IsolationForest(n_estimators=n_estimators, random_state=random_state)
+        x = row[ok].reshape(-1, 1)
+        out[i, ok] = -model.fit(x).score_samples(x)
+    return out
+
+def isolation_forest_scores(matrix: np.ndarray, workers: int = None,
+                            n_estimators: int = 100, random_state: int = 0) -> np.ndarray:
+    """-score_samples of a per-series IsolationForest; row groups run in parallel."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(matrix) <= 1:
+        return _isolation_forest_rows(matrix, n_estimators, random_state)
+    groups = np.array_split(matrix, min(workers, len(matrix)))
+    with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+        parts = pool.map(_isolation_forest_rows, groups,
+                         [n_estimators] * len(groups), [random_state] * len(groups))
+        return np.vstack(list(parts))
+
+def score_matrix(matrix: np.ndarray, method: str = "robust", workers: int = None,
+                 **params) -> np.ndarray:
+    """Scores a series x time matrix with one of METHODS; NaN stays NaN."""
+    if method == "robust":
+        scores = robust_zscores(matrix, **params)
+    elif method == "rolling_robust":
+        scores = rolling_robust_zscores(matrix, **params)
+    elif method == "seasonal_robust":
+        scores = seasonal_robust_zscores(matrix, **params)
+    elif method == "isolation_forest":
+        scores = isolation_forest_scores(matrix, workers=workers, **params)
+    else:
+        raise ValueError(f"Unknown scoring method: {method} (expected one of {METHODS})")
+    return np.where(np.isnan(matrix), np.nan, scores)
@@ -0,0 +1,549 @@
+"""
+nab_to_vm.py
+
+Convert Numenta NAB CSVs (timestamp,value) into Influx Line Protocol and
+optionally push to VictoriaMetrics (/write).
+
+Usage examples:
+  # dry-run: convert CSVs to .lp files in ./out_lp
+  python -m aiops convert --input-dir ./nab_csvs --out-dir ./out_lp
+
+  # push directly to local VictoriaMetrics in batches
+  python -m aiops convert --input-dir ./nab_csvs --vm-url http://localhost:8428 --push
+
+Options:
+  --metric-prefix  prefix for metric name (default: nab)
+  --time-format    python strptime format for your timestamps (default: "%Y-%m-%d %H:%M:%S")
+  --timezone       timezone for timestamps (default: "UTC")  # currently informational
+  --batch-size     number of lines per POST (default: 5000)
+  --engine         'vectorized' (chunked pandas/NumPy, default) or 'legacy' (csv module)
+  --workers        processes converting files in parallel (default: 1)
+  --max-in-flight  concurrent POSTs over the shared keep-alive session (default: 4)
+  --retries        retries per batch, with exponential backoff (default: 3)
+  --no-gzip        send batches uncompressed
+  --manifest       checkpoint manifest (default: <out-dir>/manifest.json); unchanged
+                   files are skipped, appended rows and interrupted pushes resume
+  --full           ignore the manifest and reprocess every file
+  --out-format     'lp' (text line protocol, default) or 'col' (compact binary
+                   columnar files, see columnar.py; line protocol is rendered
+                   from them while pushing)
+"""
+import os
+import csv
+import gzip
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
+from itertools import chain, islice
+import numpy as np
+import pandas as pd
+import requests
+
+from .columnar import ColumnarSeries, append_series, write_series
+from .export_format import escape_lp, format_lines
+from .instrumentation import STATS, reset_stats, retry, stage
+from .manifest import Manifest, UNCHANGED, APPENDED, PARTIAL
+
+# shift applied to every NAB timestamp so the series lands in recent history
+TIME_SHIFT = timedelta(days=150)
+
+def csv_to_lines(csv_path: str, metric_prefix: str, host_tag: str,
+                 time_fmt: str) -> list:
+    lines = []
+    with open(csv_path, "r", newline='') as fh:
+        reader = csv.DictReader(fh)
+        if "timestamp" not in reader.fieldnames or "value" not in reader.fieldnames:
+            raise ValueError(f"{csv_path}: expected header 'timestamp,value'")
+        for row in reader:
+            ts_str = row["timestamp"].strip()
+            val_str = row["value"].strip()
+            if ts_str == "" or val_str == "":
+                continue
+            # parse timestamp (assume given format, default: "%Y-%m-%d %H:%M:%S")
+            dt = datetime.strptime(ts_str, time_fmt) + TIME_SHIFT
+            # treat as UTC (if your CSV is local, adjust accordingly)
+            dt = dt.replace(tzinfo=timezone.utc)
+            ts_ns = int(dt.timestamp() * 1_000_000_000)  # nanoseconds
+            # measurement name: metric_prefix + "_" + basename
+            measurement = escape_lp(metric_prefix)
+            tag_part = f'host={escape_lp(host_tag)}'
+            # value is float
+            try:
+                float_val = float(val_str)
+            except:
+                # skip non-numeric
+                continue
+            # Influx LP: measurement,tagk=tagv field=123 123000000000
+            line = f"{measurement},{tag_part} value={float_val} {ts_ns}"
+            lines.append(line)
+    return lines
+
+def _parse_float(s) -> float:
+    try:
+        return float(s)
+    except (TypeError, ValueError):
+        return np.nan
+
+def csv_to_arrays(csv_path: str, time_fmt: str, chunk_size: int = 5000, after_ns: int = None):
+    """
+    Yields (ts_ns, values) int64 / float64 arrays per chunk of csv_path,
+    keeping only rows newer than after_ns when it is given.
+
+    Timestamps and values are parsed a column chunk at a time by pandas, so
+    only one chunk of the file is held in memory; rows with empty or
+    non-numeric values are skipped. Recorded as the 'parse' stage.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    if "timestamp" not in header or "value" not in header:
+        raise ValueError(f"{csv_path}: expected header 'timestamp,value'")
+    shift = np.timedelta64(int(TIME_SHIFT.total_seconds()), "s")
+    reader = pd.read_csv(csv_path, usecols=["timestamp", "value"],
+                         dtype={"timestamp": str}, chunksize=chunk_size,
+                         skipinitialspace=True, float_precision="round_trip")
+    with reader:
+        chunks = iter(reader)
+        while True:
+            # pandas parses inside next(): time it, but not the end-of-file probe
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            try:
+                values = chunk["value"]
+                if not pd.api.types.is_numeric_dtype(values):
+                    # a non-numeric row made the column text: parse each value like
+                    # csv_to_lines does (to_numeric's parser is not round-trip exact)
+                    values = pd.Series([_parse_float(v) for v in values], index=values.index,
+                                       dtype=np.float64)
+                ts = chunk["timestamp"].str.strip()
+                keep = (values.notna() & ts.notna() & (ts != "")).to_numpy()
+                if not keep.all():
+                    values, ts = values[keep], ts[keep]
+                if len(values) == 0:
+                    continue
+                dt = pd.to_datetime(ts, format=time_fmt).to_numpy().astype("datetime64[ns]")
+                ts_ns = (dt + shift).astype(np.int64)
+                vals = values.to_numpy(dtype=np.float64)
+                if after_ns is not None:
+                    newer = ts_ns > after_ns
+                    if not newer.any():
+                        continue
+                    ts_ns, vals = ts_ns[newer], vals[newer]
+            finally:
+                STATS.record("parse", time.perf_counter() - t0, rows=len(chunk))
+            yield ts_ns, vals
+
+def csv_to_lp_chunks(csv_path: str, metric_prefix: str, host_tag: str,
+                     time_fmt: str, chunk_size: int = 5000, after_ns: int = None):
+    """
+    Vectorized counterpart of csv_to_lines: yields (n_lines, bytes, last_ts_ns)
+    per chunk of csv_to_arrays, keeping only rows newer than after_ns when it
+    is given. Each chunk is rendered to line-protocol bytes in one call
+    (export_format.format_lines, 'format' stage). Output is byte-identical
+    to csv_to_lines.
+    """
+    prefix = f"{escape_lp(metric_prefix)},host={escape_lp(host_tag)} value="
+    for ts_ns, vals in csv_to_arrays(csv_path, time_fmt, chunk_size, after_ns):
+        with stage("format", rows=len(vals)) as fmt:
+            data = format_lines(prefix, vals, ts_ns).encode()
+            fmt.add(bytes=len(data))
+        yield len(vals), data, int(ts_ns[-1])
+
+def lp_timestamp(line: bytes) -> int:
+    return int(line.rsplit(b" ", 1)[1])
+
+def lines_after(payload: bytes, after_ns: int):
+    """Returns (n_lines, bytes) for the lines of payload newer than after_ns."""
+    lines = [l for l in payload.splitlines(keepends=True) if lp_timestamp(l) > after_ns]
+    return len(lines), b"".join(lines)
+
+def write_url(vm_url: str) -> str:
+    return vm_url.rstrip("/") + "/write"
+
+def push_payload(vm_write_url: str, payload: bytes, session=None):
+    # POST to /write
+    url = write_url(vm_write_url)
+    resp = (session or requests).post(url, data=payload)
+    if resp.status_code not in (200,204):
+        raise RuntimeError(f"POST {url} returned {resp.status_code}: {resp.text}")
+    return resp.status_code
+
+def push_batch(vm_write_url: str, batch_lines: list, verify_ssl=True):
+    payload = "\n".join(batch_lines) + "\n"
+    return push_payload(vm_write_url, payload)
+
+class BatchPusher:
+    """
+    Sends line-protocol batches to VictoriaMetrics /write from a thread pool.
+
+    All requests share one keep-alive requests.Session sized to max_in_flight
+    connections. submit() blocks once max_in_flight batches are queued or in
+    flight, which bounds memory while conversion keeps running. Batches are
+    gzip-compressed unless use_gzip is False, and connection errors, 429 and
+    5xx responses are retried up to `retries` times with exponential backoff.
+    url replaces the /write endpoint, e.g. export_format.import_url(vm_url)
+    for Prometheus text exposition.
+    """
+
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self, vm_url: str, max_in_flight: int = 4, retries: int = 3,
+                 backoff: float = 0.5, use_gzip: bool = True, timeout: float = 60,
+                 url: str = None):
+        self.url = url or write_url(vm_url)
+        self.retries = retries
+        self.backoff = backoff
+        self.use_gzip = use_gzip
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._futures = []
+        self.lines = 0
+        self.bytes = 0
+        self.wire_bytes = 0
+        self.batches = 0
+        self.retried = 0
+        self.started = time.perf_counter()
+
+    def submit(self, payload: bytes, n_lines: int, on_done=None):
+        """Queues one batch; on_done(ok) is called once it is acked or has failed."""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._send, payload, n_lines)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        def done(f):
+            self._slots.release()
+            if on_done is not None:
+                on_done(f.exception() is None)
+
+        future.add_done_callback(done)
+        self._futures.append(future)
+        return future
+
+    def _send(self, payload: bytes, n_lines: int):
+        if self.use_gzip:
+            with stage("compress", rows=n_lines, bytes=len(payload)):
+                body = gzip.compress(payload, compresslevel=1)
+        else:
+            body = payload
+        headers = {"Content-Encoding": "gzip"} if self.use_gzip else {}
+        with stage("push", rows=n_lines, bytes=len(body)):
+            for attempt in range(self.retries + 1):
+                try:
+                    resp = self.session.post(self.url, data=body, headers=headers,
+                                             timeout=self.timeout)
+                    if resp.status_code in (200, 204):
+                        break
+                    error = RuntimeError(f"POST {self.url} returned {resp.status_code}: {resp.text}")
+                    if resp.status_code not in self.RETRY_STATUS:
+                        raise error
+                except requests.exceptions.RequestException as e:
+                    error = e
+                if attempt == self.retries:
+                    raise error
+                with self._lock:
+                    self.retried += 1
+                retry("push")
+                time.sleep(self.backoff * (2 ** attempt))
+        with self._lock:
+            self.lines += n_lines
+            self.bytes += len(payload)
+            self.wire_bytes += len(body)
+            self.batches += 1
+
+    def close(self):
+        """Waits for every submitted batch and re-raises the first failure."""
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+            self.session.close()
+
+    def report(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return (f"{self.lines} lines in {self.batches} batches, {elapsed:.2f}s: "
+                f"{self.lines / elapsed:,.0f} lines/s, {self.bytes / elapsed / 1e6:,.2f} MB/s "
+                f"({self.wire_bytes / elapsed / 1e6:,.2f} MB/s on the wire), "
+                f"{self.retried} retries")
+
+def submit_tracked(pusher: BatchPusher, payload: bytes, n: int, last_ts: int, tracker=None):
+    """Submits a batch and reports its ack (with last_ts) to a manifest tracker."""
+    if tracker is None:
+        return pusher.submit(payload, n)
+    index = tracker.next_index()
+    return pusher.submit(payload, n, on_done=lambda ok: tracker.ack(index, last_ts)
+                         if ok else tracker.fail(index))
+
+def process_file_streaming(csv_path: str, lp_path: str, vm_url: str, push: bool,
+                           metric_prefix: str, host: str, batch_size: int,
+                           time_fmt: str, pusher: BatchPusher = None,
+                           after_ns: int = None, push_after_ns: int = None,
+                           append: bool = False, tracker=None):
+    """
+    Streams one CSV into lp_path (and VM, if push) one batch-sized chunk at a time.
+
+    after_ns converts only newer rows and, with append, adds them to an
+    existing lp_path. push_after_ns writes every row but pushes only the
+    newer ones (resuming an interrupted push). Returns (lines, last_ts_ns).
+    """
+    total, last = 0, after_ns
+    with open(lp_path, "ab" if append else "wb") as outfh:
+        for n, payload, last_ts in csv_to_lp_chunks(csv_path, metric_prefix, host, time_fmt,
+                                                    chunk_size=batch_size, after_ns=after_ns):
+            with stage("write", rows=n, bytes=len(payload)):
+                outfh.write(payload)
+            total, last = total + n, last_ts
+            if not push:
+                continue
+            if push_after_ns is not None:
+                if last_ts <= push_after_ns:
+                    continue
+                n, payload = lines_after(payload, push_after_ns)
+            if pusher is not None:
+                submit_tracked(pusher, payload, n, last_ts, tracker)
+            else:
+                push_payload(vm_url, payload)
+    if tracker is not None:
+        tracker.seal()
+    if total == 0 and not append:
+        os.remove(lp_path)
+    return total, last
+
+def convert_columnar(csv_path: str, col_path: str, metric_prefix: str, host: str,
+                     batch_size: int, time_fmt: str, after_ns: int = None,
+                     append: bool = False):
+    """
+    Converts one CSV to a columnar file (columnar.py); with after_ns/append
+    only the newer rows are parsed and added to the existing col_path.
+    Returns (points, last_ts_ns).
+    """
+    parts = list(csv_to_arrays(csv_path, time_fmt, batch_size, after_ns))
+    if not parts:
+        if not append and os.path.exists(col_path):
+            os.remove(col_path)
+        return 0, after_ns
+    ts = np.concatenate([p[0] for p in parts])
+    vals = np.concatenate([p[1] for p in parts])
+    with stage("write", rows=len(ts)) as s:
+        save = append_series if append else write_series
+        s.add(bytes=save(col_path, metric_prefix, {"host": host}, ts, vals))
+    return len(ts), int(ts[-1])
+
+def convert_file(csv_path: str, out_path: str, metric_prefix: str, host: str,
+                 batch_size: int, time_fmt: str, after_ns: int = None,
+                 append: bool = False):
+    """
+    Worker-process entry point: converts one CSV to out_path (.lp or .col)
+    without pushing. Returns (lines, last_ts_ns, stage stats of the
+    conversion) for the parent to merge.
+    """
+    if out_path.endswith(".col"):
+        total, last = convert_columnar(csv_path, out_path, metric_prefix, host, batch_size,
+                                       time_fmt, after_ns=after_ns, append=append)
+    else:
+        total, last = process_file_streaming(csv_path, out_path, None, False, metric_prefix,
+                                             host, batch_size, time_fmt, after_ns=after_ns,
+                                             append=append)
+    return total, last, STATS.drain()
+
+def iter_lp_batches(lp_path: str, batch_size: int, after_ns: int = None):
+    """
+    Yields (n_lines, bytes, last_ts_ns) batches of batch_size lines read back
+    from an .lp file, skipping the leading lines not newer than after_ns.
+    """
+    with open(lp_path, "rb") as fh:
+        lines_iter = iter(fh)
+        if after_ns is not None:
+            for line in fh:
+                if lp_timestamp(line) > after_ns:
+                    lines_iter = chain([line], fh)
+                    break
+            else:
+                return
+        while True:
+            lines = list(islice(lines_iter, batch_size))
+            if not lines:
+                return
+            yield len(lines), b"".join(lines), lp_timestamp(lines[-1])
+
+def iter_file_batches(path: str, batch_size: int, after_ns: int = None):
+    """iter_lp_batches for .lp files; line protocol rendered from a .col file otherwise."""
+    if not path.endswith(".col"):
+        yield from iter_lp_batches(path, batch_size, after_ns)
+        return
+    if not os.path.exists(path):
+        return  # no rows converted
+    with ColumnarSeries(path) as series:
+        yield from series.iter_lines("influx", batch_size, after_ns)
+
+def push_file(pusher: BatchPusher, manifest: Manifest, csv_path: str, path: str,
+              batch_size: int, plan: dict):
+    """Queues the converted lines of csv_path (those the plan has not pushed yet)."""
+    tracker = manifest.tracker(csv_path) if manifest is not None else None
+    push_from = plan.get("after_ns", plan.get("push_after_ns"))
+    for n, payload, batch_last in iter_file_batches(path, batch_size, push_from):
+        submit_tracked(pusher, payload, n, batch_last, tracker)
+    if tracker is not None:
+        tracker.seal()
+
+def plan_file(manifest: Manifest, csv_path: str, lp_path: str, push: bool, full: bool):
+    """
+    Decides how much of csv_path to process from its manifest entry.
+
+    Returns None when the file can be skipped, otherwise the keyword arguments
+    for process_file_streaming: after_ns/append to convert only appended rows,
+    push_after_ns to resume a push after its last acknowledged batch.
+    """
+    action = "pushed" if push else "converted"
+    status = None if full else manifest.status(csv_path, action)
+    entry = manifest.entry(csv_path)
+    plan = {}
+    if status == UNCHANGED and (push or os.path.exists(lp_path)):
+        return None
+    if status == APPENDED and os.path.exists(lp_path) and entry.get("last_written_ts") is not None:
+        plan = {"after_ns": entry["last_written_ts"], "append": True}
+    elif status == PARTIAL and push:
+        plan = {"push_after_ns": entry["last_pushed_ts"]}
+    else:
+        status = None
+    manifest.begin(csv_path, status)
+    return plan
+
+def finish_file(manifest: Manifest, csv_path: str, total: int, last_ts: int):
+    """Records a completed conversion in the manifest."""
+    if manifest is not None:
+        manifest.update(csv_path, converted=True, last_written_ts=last_ts,
+                        rows=(manifest.entry(csv_path).get("rows") or 0) + total)
+
+def process_dir_parallel(files: list, input_dir: str, out_dir: str, push: bool,
+                         metric_prefix: str, batch_size: int, time_fmt: str,
+                         workers: int, pusher: BatchPusher = None,
+                         manifest: Manifest = None, full: bool = False, out_format: str = "lp"):
+    """
+    Converts files in a process pool; as each file finishes, its batches are
+    handed to the pusher so uploads overlap with the remaining conversions.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=reset_stats) as pool:
+        futures = {}
+        for fname in files:
+            csv_path = os.path.join(input_dir, fname)
+            host = os.path.splitext(fname)[0]
+            lp_path = os.path.join(out_dir, f"{host}.{out_format}")
+            plan = {}
+            if manifest is not None:
+                plan = plan_file(manifest, csv_path, lp_path, push, full)
+                if plan is None:
+                    print(f"[=] {host}: unchanged, skipping")
+                    continue
+            future = pool.submit(convert_file, csv_path, lp_path, metric_prefix, host,
+                                 batch_size, time_fmt, plan.get("after_ns"),
+                                 plan.get("append", False))
+            futures[future] = (csv_path, host, lp_path, plan)
+        for future in as_completed(futures):
+            csv_path, host, lp_path, plan = futures[future]
+            total, last_ts, stats = future.result()
+            STATS.merge(stats)
+            finish_file(manifest, csv_path, total, last_ts)
+            if not total and not plan.get("append"):
+                print(f"[+] {host}: no lines generated, skipping")
+                continue
+            print(f"[+] {host}: wrote {total} lines to {lp_path}")
+            if push:
+                push_file(pusher, manifest, csv_path, lp_path, batch_size, plan)
+
+def process_dir(input_dir: str, out_dir: str, vm_url: str, push: bool,
+                metric_prefix: str, batch_size: int, time_fmt: str,
+                engine: str = "vectorized", workers: int = 1, max_in_flight: int = 4,
+                retries: int = 3, use_gzip: bool = True, manifest_path: str = None,
+                full: bool = False, out_format: str = "lp"):
+    files = sorted([f for f in os.listdir(input_dir) if f.lower().endswith(".csv")])
+    if not files:
+        raise SystemExit("No .csv files found in input directory")
+    if out_format == "col" and engine != "vectorized":
+        raise SystemExit("--out-format col needs the vectorized engine")
+    os.makedirs(out_dir, exist_ok=True)
+    pusher = None
+    manifest = None
+    if engine == "vectorized":
+        manifest = Manifest(manifest_path or os.path.join(out_dir, "manifest.json"))
+        if push:
+            pusher = BatchPusher(vm_url, max_in_flight=max_in_flight, retries=retries,
+                                 use_gzip=use_gzip)
+    try:
+        if engine == "vectorized" and workers > 1:
+            process_dir_parallel(files, input_dir, out_dir, push, metric_prefix,
+                                 batch_size, time_fmt, workers, pusher, manifest, full,
+                                 out_format)
+            return
+        for fname in files:
+            csv_path = os.path.join(input_dir, fname)
+            host = os.path.splitext(fname)[0]
+            if engine == "vectorized":
+                lp_path = os.path.join(out_dir, f"{host}.{out_format}")
+                plan = plan_file(manifest, csv_path, lp_path, push, full)
+                if plan is None:
+                    print(f"[=] {csv_path} unchanged, skipping")
+                    continue
+                print(f"[+] Processing {csv_path}  -> host='{host}'")
+                if out_format == "col":
+                    total, last_ts = convert_columnar(csv_path, lp_path, metric_prefix, host,
+                                                      batch_size, time_fmt, plan.get("after_ns"),
+                                                      plan.get("append", False))
+                    if push:
+                        push_file(pusher, manifest, csv_path, lp_path, batch_size, plan)
+                else:
+                    tracker = manifest.tracker(csv_path) if push else None
+                    total, last_ts = process_file_streaming(csv_path, lp_path, vm_url, push,
+                                                            metric_prefix, host, batch_size,
+                                                            time_fmt, pusher, tracker=tracker,
+                                                            **plan)
+                finish_file(manifest, csv_path, total, last_ts)
+                if not total and not plan.get("append"):
+                    print("  (no lines generated, skipping)")
+                    continue
+                print(f"  Wrote {total} lines to {lp_path}" + (" and queued them for push" if push else ""))
+                continue
+            print(f"[+] Processing {csv_path}  -> host='{host}'")
+            lines = csv_to_lines(csv_path, metric_prefix, host, time_fmt)
+            if not lines:
+                print("  (no lines generated, skipping)")
+                continue
+
+            # either write .lp file or push in batches
+            lp_path = os.path.join(out_dir, f"{host}.lp")
+            with open(lp_path, "w") as outfh:
+                outfh.write("\n".join(lines) + ("\n" if lines else ""))
+
+            print(f"  Wrote {len(lines)} lines to {lp_path}")
+            if push:
+                print("  Pushing to VictoriaMetrics in batches...")
+                for i in range(0, len(lines), batch_size):
+                    batch = lines[i:i+batch_size]
+                    push_batch(vm_url, batch)
+                print("  Push completed.")
+    finally:
+        # a failed close() must not lose the acks recorded before it
+        try:
+            if pusher is not None:
+                pusher.close()
+                print(f"Push completed: {pusher.report()}")
+        finally:
+            if manifest is not None:
+                manifest.save()
+
+def run(args):
+    """Entry point of `aiops convert` (see cli.py for the arguments)."""
+    process_dir(args.input_dir, args.out_dir, args.vm_url, args.push,
+                args.metric_prefix, args.batch_size, args.time_format, args.engine,
+                args.workers, args.max_in_flight, args.retries, not args.no_gzip,
+                args.manifest, args.full, args.out_format)
@@ -0,0 +1,450 @@
+"""
+query_client.py
+
+Shared Prometheus / VictoriaMetrics query client that decodes results
+straight into NumPy arrays.
+
+query_range responses are not walked point by point: for every series only
+the small "metric" object goes through the json module, while its "values"
+block is located in the raw body and parsed in one C-level pass
+(np.fromstring), so no per-point Python objects are created. Bodies in any
+other layout (e.g. pretty-printed) fall back to the json module.
+
+  query_range(base_url, query, start, end, step)   -> [Series, ...]
+  fetch_range(base_url, query, start, end, step)   -> same, split into aligned sub-ranges
+                                                      fetched concurrently and stitched
+  iter_query_range(..., chunk_size=...)            -> streams Series as they arrive
+  export(base_url, match, start, end)              -> VictoriaMetrics /api/v1/export fast path
+  aquery_range / afetch_range(client, base_url, ...) -> the same on an httpx.AsyncClient
+
+base_url is the server root (e.g. http://localhost:9090 for Prometheus,
+http://localhost:8428 or http://localhost:8428/prometheus for VictoriaMetrics).
+Timestamps are float64 Unix seconds, values float64.
+"""
+import asyncio
+import json
+import math
+import re
+import warnings
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import requests
+
+from .instrumentation import stage
+
+Series = namedtuple("Series", ["labels", "timestamps", "values"])
+
+_decoder = json.JSONDecoder()
+_STRIP = b'[]"'
+
+# Prometheus rejects query_range requests resolving to more than 11,000 points per series
+MAX_POINTS = 11000
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+class QueryError(RuntimeError):
+    """The server answered with status=error or an unexpected payload."""
+
+def series_key(labels: dict) -> str:
+    """Stable key of a label set, e.g. 'cpu{instance="a",job="b"}'."""
+    name = labels.get("__name__", "")
+    rest = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()) if k != "__name__")
+    return f"{name}{{{rest}}}"
+
+def _parse_numbers(segment: bytes) -> np.ndarray:
+    """Parses '[1,"2"],[3,"4"]' or '1,2,3' into a flat float64 array."""
+    flat = bytes(segment).translate(None, _STRIP)
+    if not flat.strip():
+        return np.empty(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            return np.fromstring(flat, sep=",")
+        except (ValueError, DeprecationWarning):
+            # unusual tokens: let NumPy convert token by token
+            return np.array(flat.split(b","), dtype=np.float64)
+
+class _Layout(ValueError):
+    """The body is not laid out the way the byte-level fast path expects."""
+
+def _compact(segment) -> bytes:
+    return bytes(segment).translate(None, b" \t\r\n")
+
+def _decode_labels(buf, start: int):
+    """
+    json-decodes the label object starting at buf[start] (labels are small).
+
+    Returns (labels, end_pos), or (None, -1) when buf does not yet hold the
+    whole object. Every '}' is tried as the end, so braces and keys such as
+    "values" inside label values cannot end the object early.
+    """
+    end = start
+    while True:
+        end = buf.find(b"}", end + 1)
+        if end < 0:
+            return None, -1
+        try:
+            labels, _ = _decoder.raw_decode(bytes(buf[start:end + 1]).decode("utf-8"))
+        except ValueError:
+            continue
+        if not isinstance(labels, dict):
+            raise _Layout("metric is not an object")
+        return labels, end + 1
+
+def _parse_series_at(buf, pos: int):
+    """
+    Parses the next {"metric":{...},"values":[[...]]} object at or after pos.
+
+    Returns (Series, end_pos), or None when buf does not yet hold the whole
+    object (streaming) or there is no further series. Raises _Layout when
+    the bytes around it are not the compact layout Prometheus and
+    VictoriaMetrics emit.
+    """
+    key = buf.find(b'"metric"', pos)
+    if key < 0:
+        return None
+    if _compact(buf[pos:key]) not in (b"{", b",{"):
+        raise _Layout("unexpected bytes before a series")
+    start = buf.find(b"{", key)
+    if start < 0:
+        return None
+    if _compact(buf[key + 8:start]) != b":":
+        raise _Layout("unexpected bytes after \"metric\"")
+    labels, labels_end = _decode_labels(buf, start)
+    if labels is None:
+        return None
+    vkey = buf.find(b'"values"', labels_end)
+    vstart = buf.find(b"[", vkey)
+    if vkey < 0 or vstart < 0:
+        return None
+    if _compact(buf[labels_end:vkey]) != b"," or _compact(buf[vkey + 8:vstart]) != b":":
+        raise _Layout("\"values\" does not follow \"metric\"")
+    empty = buf[vstart + 1:vstart + 2] == b"]"
+    vend = vstart + 1 if empty else buf.find(b"]]", vstart)
+    if vend < 0:
+        return None
+    obj_end = buf.find(b"}", vend)
+    if obj_end < 0:
+        return None
+    if _compact(buf[vend + (1 if empty else 2):obj_end]):
+        raise _Layout("unexpected bytes after \"values\"")
+    pairs = _parse_numbers(buf[vstart + 1:vend + 1]).reshape(-1, 2)
+    return Series(labels, pairs[:, 0].copy(), pairs[:, 1].copy()), obj_end + 1
+
+_RESULT_TYPE = re.compile(rb'"resultType"\s*:\s*"([^"]*)"')
+
+def _result_start(buf) -> int:
+    """
+    Position just after the '[' of the result array, or -1 when buf does
+    not hold it yet. Raises QueryError for a non-matrix resultType and
+    _Layout when resultType does not come first.
+    """
+    key = buf.find(b'"result"')
+    if key < 0:
+        return -1
+    start = buf.find(b"[", key)
+    if start < 0:
+        return -1
+    rtype = _RESULT_TYPE.search(buf, 0, key)
+    if rtype is None:
+        raise _Layout("no resultType before result")
+    if rtype.group(1) != b"matrix":
+        raise QueryError(f"Expected a matrix result, got {rtype.group(1).decode()!r}")
+    if _compact(buf[key + 8:start]) != b":":
+        raise _Layout("unexpected bytes after \"result\"")
+    return start + 1
+
+def _ended(buf, pos: int) -> bool:
+    """True when only the closing ']' of the result array (and the rest) follow pos."""
+    return bytes(buf[pos:pos + 64]).lstrip().startswith(b"]")
+
+def _decode_matrix_json(body) -> list:
+    """Slow path: decodes a query_range body of any layout with the json module."""
+    try:
+        payload = json.loads(bytes(body))
+        data = payload["data"]
+        result_type, result = data["resultType"], data["result"]
+    except (ValueError, TypeError, KeyError):
+        raise QueryError(f"Unexpected response: {bytes(body[:500])!r}")
+    if result_type != "matrix":
+        raise QueryError(f"Expected a matrix result, got {result_type!r}")
+    out = []
+    for item in result:
+        pairs = np.array(item.get("values") or [], dtype=np.float64).reshape(-1, 2)
+        out.append(Series(item.get("metric", {}), pairs[:, 0].copy(), pairs[:, 1].copy()))
+    return out
+
+def decode_matrix(body: bytes) -> list:
+    """
+    Decodes a full query_range response body into [Series, ...].
+
+    Bodies that are not compact JSON (e.g. pretty-printed) go through the
+    json module instead of being dropped.
+    """
+    try:
+        pos = _result_start(body)
+        if pos <= 0:
+            raise _Layout("no result array")
+        out = []
+        while True:
+            parsed = _parse_series_at(body, pos)
+            if parsed is None:
+                break
+            series, pos = parsed
+            out.append(series)
+        if not _ended(body, pos):
+            raise _Layout("result array does not end after the last series")
+        return out
+    except _Layout:
+        return _decode_matrix_json(body)
+
+def iter_decode_matrix(chunks):
+    """
+    Streaming decode: yields Series as soon as each one is complete in the
+    incoming byte chunks, keeping only the unfinished tail buffered.
+
+    Until the first Series is out the whole body is kept, so a body the fast
+    path cannot read is decoded by the json module at the end; a layout
+    surprise after Series were yielded raises QueryError.
+    """
+    buf = bytearray()
+    pos = -1
+    yielded = slow = False
+    for chunk in chunks:
+        buf += chunk
+        if slow:
+            continue
+        try:
+            if pos < 0:
+                pos = _result_start(buf)
+                if pos <= 0:
+                    pos = -1
+                    continue
+            while True:
+                parsed = _parse_series_at(buf, pos)
+                if parsed is None:
+                    break
+                series, pos = parsed
+                yielded = True
+                yield series
+        except _Layout as e:
+            if yielded:
+                raise QueryError(f"Unexpected response layout: {e}")
+            slow = True
+            continue
+        if yielded:
+            del buf[:pos]
+            pos = 0
+    if not slow and pos >= 0 and _ended(buf, pos):
+        return
+    if yielded:
+        raise QueryError(f"Truncated response: {bytes(buf[:500])!r}")
+    yield from _decode_matrix_json(buf)
+
+def query_range(base_url: str, query: str, start, end, step, session=None,
+                timeout: float = 300, **params) -> list:
+    """Runs /api/v1/query_range and returns [Series, ...]."""
+    with stage("query") as s:
+        resp = (session or requests).get(
+            f"{base_url.rstrip('/')}/api/v1/query_range",
+            params={"query": query, "start": start, "end": end, "step": step, **params},
+            timeout=timeout)
+        s.add(bytes=len(resp.content))
+    if resp.status_code != 200:
+        raise QueryError(f"query_range returned {resp.status_code}: {resp.text[:500]}")
+    with stage("decode", bytes=len(resp.content)) as s:
+        series = decode_matrix(resp.content)
+        s.add(rows=sum(len(r.timestamps) for r in series))
+    return series
+
+def iter_query_range(base_url: str, query: str, start, end, step, session=None,
+                     timeout: float = 300, chunk_size: int = 1 << 20, **params):
+    """Like query_range, but streams the response and yields Series one at a time."""
+    with (session or requests).get(
+            f"{base_url.rstrip('/')}/api/v1/query_range",
+            params={"query": query, "start": start, "end": end, "step": step, **params},
+            timeout=timeout, stream=True) as resp:
+        if resp.status_code != 200:
+            raise QueryError(f"query_range returned {resp.status_code}: {resp.text[:500]}")
+        yield from iter_decode_matrix(resp.iter_content(chunk_size=chunk_size))
+
+def parse_duration(step) -> float:
+    """'300', 300, '5m' or '1h30m' -> seconds."""
+    if isinstance(step, (int, float)):
+        return float(step)
+    try:
+        return float(step)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(step)
+    if not parts or "".join(n + u for n, u in parts) != step.strip():
+        raise ValueError(f"Invalid duration: {step!r}")
+    return sum(float(n) * _UNITS[u] for n, u in parts)
+
+def parse_time(value) -> float:
+    """Unix seconds (number or numeric string) or RFC3339 -> Unix seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt.timestamp()
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    """requests.Session with a keep-alive pool of pool_size connections per host."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def floor_step(t: float, step: float) -> float:
+    """t floored to the absolute grid (k * step) that fetch_range evaluates on."""
+    return math.floor(t / step) * step
+
+def split_range(start: float, end: float, step: float, max_points: int = MAX_POINTS) -> list:
+    """
+    Splits [start, end] into sub-ranges of at most max_points steps each.
+
+    start is floored to a multiple of step, so every sub-range evaluates on
+    the same absolute grid (k * step) and the pieces stitch without gaps.
+    """
+    start = floor_step(start, step)
+    span = (max_points - 1) * step
+    ranges = []
+    while start <= end:
+        ranges.append((start, min(start + span, end)))
+        start += span + step
+    return ranges
+
+def stitch(parts) -> list:
+    """Merges lists of Series by label set; timestamps sorted and de-duplicated."""
+    merged = {}
+    for part in parts:
+        for series in part:
+            key = tuple(sorted(series.labels.items()))
+            merged.setdefault(key, (series.labels, [], []))
+            merged[key][1].append(series.timestamps)
+            merged[key][2].append(series.values)
+    out = []
+    for labels, stamps, values in merged.values():
+        ts, vals = np.concatenate(stamps), np.concatenate(values)
+        ts, first = np.unique(ts, return_index=True)
+        out.append(Series(labels, ts, vals[first]))
+    return out
+
+def fetch_range(base_url: str, query: str, start, end, step, session=None,
+                max_points: int = MAX_POINTS, max_workers: int = 4,
+                timeout: float = 300, cache=None, **params) -> list:
+    """
+    query_range for windows of any length at native resolution.
+
+    The window is split with split_range(), the sub-ranges are fetched
+    concurrently over one pooled session and the results are stitched and
+    de-duplicated into a single Series per label set. With a
+    ts_cache.SeriesCache only the spans it does not hold are requested.
+    """
+    step_s = parse_duration(step)
+    if cache is not None:
+        return cache.get(base_url, query, parse_time(start), parse_time(end), step_s,
+                         lambda s, e: fetch_range(base_url, query, s, e, step_s, session,
+                                                  max_points, max_workers, timeout, **params),
+                         params=params)
+    ranges = split_range(parse_time(start), parse_time(end), step_s, max_points)
+    if len(ranges) == 1:
+        return query_range(base_url, query, ranges[0][0], ranges[0][1], step_s,
+                           session=session, timeout=timeout, **params)
+    own_session = session is None
+    session = session or make_session(max_workers)
+    try:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ranges))) as pool:
+            parts = pool.map(lambda r: query_range(base_url, query, r[0], r[1], step_s,
+                                                   session=session, timeout=timeout, **params),
+                             ranges)
+            return stitch(parts)
+    finally:
+        if own_session:
+            session.close()
+
+async def aquery_range(client, base_url: str, query: str, start, end, step,
+                       timeout: float = 300, **params) -> list:
+    """query_range on an httpx.AsyncClient, for asyncio callers."""
+    with stage("query") as s:
+        resp = await client.get(
+            f"{base_url.rstrip('/')}/api/v1/query_range",
+            params={"query": query, "start": start, "end": end, "step": step, **params},
+            timeout=timeout)
+        s.add(bytes=len(resp.content))
+    if resp.status_code != 200:
+        raise QueryError(f"query_range returned {resp.status_code}: {resp.text[:500]}")
+    with stage("decode", bytes=len(resp.content)) as s:
+        series = decode_matrix(resp.content)
+        s.add(rows=sum(len(r.timestamps) for r in series))
+    return series
+
+async def afetch_range(client, base_url: str, query: str, start, end, step,
+                       max_points: int = MAX_POINTS, timeout: float = 300, **params) -> list:
+    """fetch_range on an httpx.AsyncClient: the sub-ranges are awaited concurrently."""
+    step_s = parse_duration(step)
+    ranges = split_range(parse_time(start), parse_time(end), step_s, max_points)
+    parts = await asyncio.gather(*(aquery_range(client, base_url, query, s, e, step_s,
+                                                timeout=timeout, **params) for s, e in ranges))
+    return parts[0] if len(parts) == 1 else stitch(parts)
+
+def _segment(line: bytes, key: bytes, pos: int = 0) -> bytes:
+    k = line.find(key, pos)
+    if k < 0:
+        raise QueryError(f"export line without {key!r}")
+    s = line.find(b"[", k)
+    return line[s + 1:line.find(b"]", s)]
+
+def decode_export(lines) -> list:
+    """
+    Decodes VictoriaMetrics /api/v1/export JSON lines. Lines of the same series
+    are merged and sorted by time; timestamps are converted from ms to seconds.
+    """
+    merged = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        start = line.find(b"{", line.find(b'"metric"'))
+        labels, end = _decode_labels(line, start)
+        if labels is None:
+            raise QueryError(f"export line without a metric object: {line[:500]!r}")
+        values = _parse_numbers(_segment(line, b'"values"', end))
+        stamps = _parse_numbers(_segment(line, b'"timestamps"', end)) / 1000.0
+        key = tuple(sorted(labels.items()))
+        merged.setdefault(key, (labels, [], []))
+        merged[key][1].append(stamps)
+        merged[key][2].append(values)
+    out = []
+    for labels, stamps, values in merged.values():
+        ts, vals = np.concatenate(stamps), np.concatenate(values)
+        order = np.argsort(ts, kind="stable")
+        out.append(Series(labels, ts[order], vals[order]))
+    return out
+
+def export(base_url: str, match: str, start=None, end=None, session=None,
+           timeout: float = 300, chunk_size: int = 1 << 20) -> list:
+    """
+    Fast path for raw samples from VictoriaMetrics /api/v1/export (native
+    resolution, no step alignment), streamed line by line.
+    """
+    params = {"match[]": match}
+    if start is not None:
+        params["start"] = start
+    if end is not None:
+        params["end"] = end
+    with (session or requests).get(f"{base_url.rstrip('/')}/api/v1/export", params=params,
+                                   timeout=timeout, stream=True) as resp:
+        if resp.status_code != 200:
+            raise QueryError(f"export returned {resp.status_code}: {resp.text[:500]}")
+        return decode_export(resp.iter_lines(chunk_size=chunk_size))
@@ -0,0 +1,208 @@
+"""
+replay.py
+
+Replays NAB CSVs as live host metrics, for load-testing dashboards and
+alerting. Every CSV is a host; --hosts N cycles through the CSVs, naming the
+extra copies <csv name>-1, <csv name>-2, ... with rotated values, to
+simulate hundreds of hosts from one process.
+
+  bulk      every host's whole history, moved to end now, imported into
+            VictoriaMetrics (/api/v1/import/prometheus) in gzip'd batches of
+            --batch-size samples over one pooled keep-alive session
+            (nab_to_vm.BatchPusher).
+  realtime  every host sends its samples one at a time, at their original
+            spacing divided by --speedup, from one asyncio task per host on
+            a shared httpx.AsyncClient. Sends are scheduled against fixed
+            deadlines from the start, so slow requests do not add up to
+            drift; how late each send was is recorded as the `lag` stage.
+            Goes to the Pushgateway (/metrics/job/<job>/instance/<host>) or
+            to VictoriaMetrics' import endpoint, without timestamps: the
+            samples are stamped on arrival.
+
+The Pushgateway keeps one value per series and rejects timestamps, so bulk
+mode always imports into VictoriaMetrics.
+
+Usage:
+  python -m aiops replay --mode bulk --input data/nab/realAWSCloudwatch
+  python -m aiops replay --hosts 300 --speedup 60 --duration 600 [--target vm]
+"""
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+from .config import PROJECT_DIR, config, log_file
+from .export_format import escape_label_value, format_samples, import_url
+from .ingest_data import list_inputs, read_series
+from .instrumentation import STATS, stage
+from .nab_to_vm import BatchPusher
+
+PUSH_GATEWAY = config.get('Prometheus', 'PushGateway', fallback='http://localhost:9091')
+VM_URL = config.get('VictoriaMetrics', 'URL', fallback='http://localhost:8428')
+DEFAULT_INPUT = os.path.join(PROJECT_DIR, 'data', 'nab', 'realAWSCloudwatch')
+LOG_FILE = log_file('ingestion.log')
+
+# Configure logging
+logging.basicConfig(
+    filename=LOG_FILE,
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+def load_hosts(inputs, n_hosts=None, time_fmt=None):
+    """
+    [(host, ts_ms, values)] for n_hosts hosts (default: one per CSV), each
+    series moved to end now. Host i replays CSV i % len(inputs); copies after
+    the first have their values rotated so no two hosts move in lockstep.
+    """
+    series = []
+    for path in inputs:
+        ts, vals = read_series(path, shift='now', time_fmt=time_fmt)
+        if len(ts) < 2:
+            logging.info("Skipping %s: fewer than two samples", path)
+            continue
+        series.append((os.path.splitext(os.path.basename(path))[0], ts, vals))
+    if not series:
+        raise ValueError("No CSV with at least two samples to replay")
+    hosts = []
+    for i in range(n_hosts or len(series)):
+        name, ts, vals = series[i % len(series)]
+        copy = i // len(series)
+        if copy:
+            name = f"{name}-{copy}"
+            vals = np.roll(vals, copy * 7919 % len(vals))
+        hosts.append((name, ts, vals))
+    return hosts
+
+def replay_bulk(hosts, vm_url=VM_URL, metric='node_cpu_usage', job='node', batch_size=5000,
+                max_in_flight=4, use_gzip=True):
+    """Imports every host's history into VictoriaMetrics; returns the closed BatchPusher."""
+    pusher = BatchPusher(vm_url, max_in_flight=max_in_flight, use_gzip=use_gzip,
+                         url=import_url(vm_url))
+    try:
+        for host, ts, vals in hosts:
+            lines = format_samples(metric, {'job': job, 'instance': host}, ts / 1000.0, vals)
+            for i in range(0, len(lines), batch_size):
+                batch = lines.iloc[i:i + batch_size]
+                pusher.submit(("\n".join(batch) + "\n").encode('utf-8'), len(batch))
+    finally:
+        pusher.close()
+    return pusher
+
+def host_url(target, base_url, job, host):
+    """Where a host's live samples go: its Pushgateway group or the VictoriaMetrics import."""
+    if target == 'pushgateway':
+        return (f"{base_url.rstrip('/')}/metrics/job/{quote(job, safe='')}"
+                f"/instance/{quote(host, safe='')}")
+    if target == 'vm':
+        return import_url(base_url)
+    raise ValueError(f"Unsupported replay target: {target}")
+
+async def replay_host(client, url, host, ts, vals, prefix, speedup, start, stop, repeat, counts):
+    """
+    Sends one host's samples to url, sample k at loop time
+    start + (ts[k] - ts[0]) / speedup, until stop; with repeat the series
+    starts over one step after its last sample.
+    """
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    offsets = (ts - ts[0]) / 1000.0 / speedup
+    period = offsets[-1] + float(np.median(np.diff(offsets)))
+    cycle = 0
+    while True:
+        base = start + cycle * period
+        for k in range(len(offsets)):
+            due = base + offsets[k]
+            if stop is not None and due >= stop:
+                return
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif stop is not None and loop.time() >= stop:
+                return
+            STATS.record("lag", max(loop.time() - due, 0.0))
+            body = f"{prefix}{vals[k]}\n".encode('utf-8')
+            try:
+                with stage("push", rows=1, bytes=len(body)):
+                    resp = await client.post(url, content=body)
+                    resp.raise_for_status()
+                counts["sent"] += 1
+            except httpx.HTTPError as e:
+                counts["errors"] += 1
+                if counts["errors"] == 1 or counts["errors"] % 1000 == 0:
+                    logging.error("Replay push for %s failed (%d errors so far): %s",
+                                  host, counts["errors"], e)
+        if not repeat:
+            return
+        cycle += 1
+
+async def replay_realtime(hosts, target='pushgateway', base_url=PUSH_GATEWAY,
+                          metric='node_cpu_usage', job='node', speedup=60.0, duration=None,
+                          repeat=False, max_connections=100, timeout=10.0, counts=None):
+    """
+    Replays all hosts concurrently (see replay_host), their first sends
+    spread over one step so they do not all fire together. Runs until every
+    series ends, or for `duration` seconds. Returns {"sent", "errors"}.
+    """
+    import httpx
+
+    if speedup <= 0:
+        raise ValueError("speedup must be positive")
+    counts = counts if counts is not None else {"sent": 0, "errors": 0}
+    limits = httpx.Limits(max_connections=max_connections,
+                          max_keepalive_connections=max_connections)
+    loop = asyncio.get_running_loop()
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        start = loop.time()
+        stop = start + duration if duration else None
+        tasks = []
+        for i, (host, ts, vals) in enumerate(hosts):
+            labels = {'job': job, 'instance': host}
+            label_str = ",".join(f'{k}="{escape_label_value(v)}"' for k, v in labels.items())
+            step = float(np.median(np.diff(ts))) / 1000.0 / speedup
+            tasks.append(asyncio.create_task(replay_host(
+                client, host_url(target, base_url, job, host), host, ts, vals,
+                f"{metric}{{{label_str}}} ", speedup, start + step * i / len(hosts), stop,
+                repeat, counts)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+    return counts
+
+def run(args):
+    """Entry point of `aiops replay` (see cli.py for the arguments)."""
+    target = args.target or ('vm' if args.mode == 'bulk' else 'pushgateway')
+    if args.mode == 'bulk' and target != 'vm':
+        raise SystemExit("The Pushgateway keeps one value per series and rejects timestamps: "
+                         "bulk replay imports into VictoriaMetrics (--target vm)")
+    base_url = args.url or (PUSH_GATEWAY if target == 'pushgateway' else VM_URL)
+    hosts = load_hosts(list_inputs(args.input or DEFAULT_INPUT), args.hosts, args.time_format)
+    logging.info("Replaying %d hosts (%s) to %s at %s", len(hosts), args.mode, target, base_url)
+
+    if args.mode == 'bulk':
+        pusher = replay_bulk(hosts, base_url, args.metric, args.job, args.batch_size,
+                             args.max_in_flight, not args.no_gzip)
+        print(f"Replayed {len(hosts)} hosts into {base_url}: {pusher.report()}")
+        return
+
+    counts = {"sent": 0, "errors": 0}
+    t0 = time.perf_counter()
+    try:
+        asyncio.run(replay_realtime(hosts, target, base_url, args.metric, args.job, args.speedup,
+                                    args.duration, args.loop, args.max_connections,
+                                    counts=counts))
+    except KeyboardInterrupt:
+        print("Interrupted.")
+    elapsed = max(time.perf_counter() - t0, 1e-9)
+    lag = STATS.snapshot().get("lag", {"count": 0, "seconds": 0.0, "max_seconds": 0.0})
+    mean_lag = lag["seconds"] / max(lag["count"], 1)
+    print(f"Replayed {len(hosts)} hosts to {base_url} for {elapsed:.1f}s: "
+          f"{counts['sent']} samples ({counts['sent'] / elapsed:,.0f}/s), "
+          f"{counts['errors']} errors, lag mean {mean_lag * 1000:.1f} ms, "
+          f"max {lag['max_seconds'] * 1000:.1f} ms")
@@ -0,0 +1,74 @@
+"""
+triage.py
+
+Cheap fleet-wide pre-screen in front of the LLM agent. Every host's series
+comes from one query_range, is aligned into one matrix and scored in a
+single vectorized pass (matrix_scoring):
+
+  spike     99.9th percentile of the seasonal robust z-scores (a point far
+            from the same time one season earlier)
+  shift     size of the strongest level shift, in units of the noise
+            around it (changepoint_scores)
+
+suspicion = max(spike / ZThreshold, shift / ShiftThreshold); a host at 1 or
+above looks abnormal. Only the TopK most suspicious hosts are handed to the
+agent (agentic_victoria_metrics.triage_windows), so healthy hosts cost no
+LLM round trips.
+"""
+import datetime
+import warnings
+
+import numpy as np
+
+from .config import config
+from .instrumentation import stage
+from .matrix_scoring import align_series, changepoint_scores, score_matrix
+from .query_client import floor_step, parse_duration, parse_time
+
+Z_THRESHOLD = config.getfloat('Triage', 'ZThreshold', fallback=8.0)
+SHIFT_THRESHOLD = config.getfloat('Triage', 'ShiftThreshold', fallback=3.0)
+TOP_K = config.getint('Triage', 'TopK', fallback=5)
+SEASON = config.getfloat('Triage', 'Season', fallback=86400)
+
+def host_name(labels, host_label="host"):
+    """A series' host: its host_label, else its instance label, else all its labels."""
+    return labels.get(host_label) or labels.get("instance") or str(labels)
+
+def rank_hosts(labels, grid, matrix, step, host_label="host", z_threshold=Z_THRESHOLD,
+               shift_threshold=SHIFT_THRESHOLD, season=SEASON):
+    """
+    Scores every row of a series x time matrix (labels[i] is row i) and
+    returns one dict per row, most suspicious first: host, suspicion,
+    spike, anomaly_fraction (share of points above z_threshold), shift and
+    shift_time (first timestamp after the shift, RFC3339).
+    """
+    with stage("score", rows=matrix.size):
+        z = score_matrix(matrix, "seasonal_robust", season=max(int(round(season / step)), 1))
+        valid = np.maximum((~np.isnan(z)).sum(axis=1), 1)
+        with warnings.catch_warnings():
+            # hosts without a single point in the window: all-NaN rows score 0
+            warnings.simplefilter("ignore", RuntimeWarning)
+            spike = np.nan_to_num(np.nanpercentile(z, 99.9, axis=1))
+        fraction = (np.nan_to_num(z) > z_threshold).sum(axis=1) / valid
+        shift, split = changepoint_scores(matrix)
+    suspicion = np.maximum(spike / z_threshold, shift / shift_threshold)
+    ranked = []
+    for i in np.argsort(-suspicion, kind="stable"):
+        shift_time = datetime.datetime.fromtimestamp(float(grid[split[i]]), datetime.timezone.utc)
+        ranked.append({
+            "host": host_name(labels[i], host_label),
+            "suspicion": round(float(suspicion[i]), 3),
+            "spike": round(float(spike[i]), 3),
+            "anomaly_fraction": round(float(fraction[i]), 4),
+            "shift": round(float(shift[i]), 3),
+            "shift_time": shift_time.isoformat().replace("+00:00", "Z"),
+        })
+    return ranked
+
+def rank_series(series, start, end, step, **params):
+    """rank_hosts() for a query_range result [Series, ...] over [start, end]."""
+    step_s = parse_duration(step)
+    # on fetch_range's grid, so every point lands on its own column
+    grid, matrix = align_series([(s.timestamps, s.values) for s in series],
+                                floor_step(parse_time(start), step_s), parse_time(end), step_s)
+    return rank_hosts([s.labels for s in series], grid, matrix, step_s, **params)
@@ -0,0 +1,286 @@
+"""
+ts_cache.py
+
+Local on-disk cache for query_range results, keyed by (server, query, step
+and any extra query_range parameters such as limit).
+
+Each key owns a directory holding the time spans it already covers and one
+segment per fetched span. A segment is two .npy files (timestamps, values of
+all series back to back) opened with mmap_mode='r', plus the label sets and
+row offsets in the key's index.json. A request is answered from the
+segments that overlap it; only the uncovered gaps (typically the new right
+edge) are fetched from the server.
+
+Data newer than `settle_seconds` before now is still being written by the
+TSDB, so it is returned but never cached. When the cache grows beyond
+max_bytes whole keys are evicted, least recently used first.
+
+    cache = SeriesCache("../data/cache", max_bytes=512 * 2**20)
+    series = fetch_range(api, query, start, end, "5m", cache=cache)
+    cache.stats()  # {'hits': ..., 'partial_hits': ..., 'misses': ...}
+
+config_cache() builds the cache every command shares from the [Cache]
+section of config.ini on first use (None when MaxBytes = 0).
+
+A cache directory is meant to be used by one process at a time.
+
+TTLCache is the in-memory counterpart for small derived results (e.g. the
+agent tool's summaries) that may be reused for a few minutes.
+"""
+import functools
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from .config import config, resolve_path
+from .query_client import Series, stitch
+
+INDEX = "index.json"
+
+def _subtract(span, covered, step):
+    """Grid spans of span = [start, end] not in the sorted, merged `covered` spans."""
+    start, end = span
+    gaps = []
+    cursor = start
+    for c_start, c_end in covered:
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start - step))
+        cursor = max(cursor, c_end + step)
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+def _merge(spans, step):
+    """Sorts spans and joins those that overlap or touch on the step grid."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + step:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+class SeriesCache:
+    """Size-bounded LRU cache of query_range results on local disk."""
+
+    def __init__(self, root: str, max_bytes: int = 512 * 2**20, settle_seconds: float = 600,
+                 max_segments: int = 16):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.settle_seconds = settle_seconds
+        self.max_segments = max_segments
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.bytes_read = 0
+        self._usage = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(base_url: str, query: str, step: float, params: dict = None) -> str:
+        """Directory name of a query; extra query_range params (e.g. limit) are part of it."""
+        text = f"{base_url}\n{query}\n{step!r}"
+        if params:
+            text += "\n" + json.dumps(sorted((k, str(v)) for k, v in params.items()))
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def stats(self) -> dict:
+        with self._lock:
+            on_disk = sum(size for _, size in self._entries().values())
+        return {"hits": self.hits, "partial_hits": self.partial_hits, "misses": self.misses,
+                "bytes_read": self.bytes_read, "bytes_on_disk": on_disk}
+
+    def _entries(self) -> dict:
+        """{key directory: [last_access, bytes]}, read from disk once and then kept current."""
+        if self._usage is None:
+            self._usage = {}
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                try:
+                    with open(os.path.join(self.root, name, INDEX)) as fh:
+                        index = json.load(fh)
+                except (OSError, ValueError):
+                    continue
+                self._usage[name] = [index.get("last_access", 0), index.get("bytes", 0)]
+        return self._usage
+
+    def _load_index(self, path: str, base_url: str, query: str, step: float) -> dict:
+        try:
+            with open(os.path.join(path, INDEX)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {"base_url": base_url, "query": query, "step": step,
+                    "spans": [], "segments": [], "bytes": 0}
+
+    def _save_index(self, path: str, index: dict):
+        index["last_access"] = time.time()
+        tmp = os.path.join(path, INDEX + ".tmp")
+        with open(tmp, "w") as fh:
+            json.dump(index, fh)
+        os.replace(tmp, os.path.join(path, INDEX))
+        self._entries()[os.path.basename(path)] = [index["last_access"], index["bytes"]]
+
+    def _read_segment(self, path: str, segment: dict, start: float, end: float) -> list:
+        ts = np.load(os.path.join(path, segment["name"] + ".ts.npy"), mmap_mode="r")
+        vals = np.load(os.path.join(path, segment["name"] + ".val.npy"), mmap_mode="r")
+        out = []
+        offsets = segment["offsets"]
+        for labels, lo, hi in zip(segment["labels"], offsets[:-1], offsets[1:]):
+            row_ts = ts[lo:hi]
+            a = np.searchsorted(row_ts, start, side="left")
+            b = np.searchsorted(row_ts, end, side="right")
+            if b > a:
+                out.append(Series(labels, np.asarray(row_ts[a:b]), np.asarray(vals[lo:hi][a:b])))
+                self.bytes_read += int(b - a) * 16
+        return out
+
+    def _write_segment(self, path: str, name: str, series: list) -> dict:
+        ts = np.concatenate([s.timestamps for s in series]) if series else np.empty(0)
+        vals = np.concatenate([s.values for s in series]) if series else np.empty(0)
+        np.save(os.path.join(path, name + ".ts.npy"), ts.astype(np.float64))
+        np.save(os.path.join(path, name + ".val.npy"), vals.astype(np.float64))
+        offsets = np.concatenate([[0], np.cumsum([len(s.timestamps) for s in series])]).tolist()
+        return {"name": name, "labels": [s.labels for s in series],
+                "offsets": [int(o) for o in offsets], "bytes": int(ts.nbytes + vals.nbytes)}
+
+    def _compact(self, path: str, index: dict):
+        """Rewrites all segments of a key as one, once there are too many."""
+        if len(index["segments"]) <= self.max_segments:
+            return
+        parts = [self._read_segment(path, seg, -math.inf, math.inf) for seg in index["segments"]]
+        merged = self._write_segment(path, f"seg{time.time_ns()}", stitch(parts))
+        for seg in index["segments"]:
+            for ext in (".ts.npy", ".val.npy"):
+                os.remove(os.path.join(path, seg["name"] + ext))
+        index["segments"] = [merged]
+        index["bytes"] = merged["bytes"]
+
+    def get(self, base_url: str, query: str, start: float, end: float, step: float,
+            fetch, params: dict = None) -> list:
+        """
+        Returns [Series, ...] for [start, end] on the step grid, calling
+        fetch(gap_start, gap_end) only for the spans the cache does not cover.
+        params are the extra query_range parameters fetch() sends.
+
+        fetch() runs without the lock, so other callers are not held up by
+        this one's round trips; the index is re-read before the fetched
+        segments are added to it.
+        """
+        start = math.floor(start / step) * step
+        end = math.floor(end / step) * step
+        path = os.path.join(self.root, self.key(base_url, query, step, params))
+        with self._lock:
+            index = self._load_index(path, base_url, query, step)
+            gaps = _subtract((start, end), index["spans"], step)
+            parts = [self._read_segment(path, seg, start, end) for seg in index["segments"]]
+            if not gaps:
+                self.hits += 1
+                self._save_index(path, index)
+                return stitch(parts)
+            if len(gaps) == 1 and gaps[0] == (start, end):
+                self.misses += 1
+            else:
+                self.partial_hits += 1
+
+        settled = math.floor((time.time() - self.settle_seconds) / step) * step
+        fetched = [(gap_start, gap_end, fetch(gap_start, gap_end)) for gap_start, gap_end in gaps]
+        parts.extend(series for _, _, series in fetched)
+
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            index = self._load_index(path, base_url, query, step)
+            for gap_start, gap_end, series in fetched:
+                keep_end = min(gap_end, settled)
+                if keep_end < gap_start:
+                    continue
+                keep = []
+                for s in series:
+                    mask = s.timestamps <= keep_end
+                    keep.append(Series(s.labels, s.timestamps[mask], s.values[mask]))
+                segment = self._write_segment(path, f"seg{time.time_ns()}", keep)
+                index["segments"].append(segment)
+                index["bytes"] += segment["bytes"]
+                index["spans"] = _merge(index["spans"] + [[gap_start, keep_end]], step)
+            self._compact(path, index)
+            self._save_index(path, index)
+            self._evict()
+        return stitch(parts)
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size in entries.values())
+        for _, size, name in sorted((e[0], e[1], name) for name, e in entries.items()):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            del entries[name]
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._usage = {}
+
+@functools.cache
+def config_cache(section: str = "Cache"):
+    """
+    SeriesCache from Dir, MaxBytes and Settle (seconds) of a config.ini
+    section, or None when MaxBytes is 0 or missing (cache disabled). Built
+    on first use and shared by every caller in the process.
+    """
+    max_bytes = config.getint(section, 'MaxBytes', fallback=0)
+    if not max_bytes:
+        return None
+    return SeriesCache(resolve_path(config.get(section, 'Dir', fallback='../data/cache')),
+                       max_bytes, config.getfloat(section, 'Settle', fallback=600))
+
+class TTLCache:
+    """Thread-safe in-memory map whose entries expire `ttl` seconds after they are stored."""
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """The live value stored under key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            if self.ttl <= 0:
+                return
+            now = time.monotonic()
+            if len(self._entries) >= self.max_entries:
+                self._entries = {k: e for k, e in self._entries.items() if e[0] > now}
+                while len(self._entries) >= self.max_entries:
+                    # dicts keep insertion order: drop the oldest entry
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (now + self.ttl, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
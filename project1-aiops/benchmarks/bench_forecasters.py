@@ -0,0 +1,88 @@
+"""
+bench_forecasters.py
+
+Accuracy and wall time of the forecasting backends (aiops/forecasters.py)
+on the bundled NAB corpus (data/nab/**/*.csv). Every series with enough
+points is cut to --length training points followed by --horizon held-out
+points; each backend forecasts the held-out part from the training part.
+
+Reported per backend, over the series it ran on:
+  seconds   wall time of the forecast call(s), Prophet import excluded
+  mase      mean absolute error / in-sample MAE of the seasonal-naive forecast
+  coverage  share of held-out points inside [yhat_lower, yhat_upper] (target 0.8)
+
+Prophet is slow, so it only runs on the first --prophet-max-series series;
+the NumPy backends are reported on that subset too for a like-for-like row.
+
+Usage:
+  python benchmarks/bench_forecasters.py [--length 4032] [--horizon 288] [--prophet-max-series 10]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiops.forecasters import make_forecaster  # noqa: E402
+
+def load_corpus(data_dir, length):
+    names, rows = [], []
+    for path in sorted(glob.glob(os.path.join(data_dir, "**", "*.csv"), recursive=True)):
+        values = pd.read_csv(path, usecols=["value"])["value"].to_numpy(dtype=np.float64)
+        if len(values) >= length:
+            names.append(os.path.relpath(path, data_dir))
+            rows.append(values[:length])
+    return names, np.vstack(rows)
+
+def evaluate(kind, train, test, season, step=300.0):
+    """Returns (seconds, mase, coverage) of one backend over all rows."""
+    grid = np.arange(train.shape[1], dtype=np.float64) * step
+    forecaster = make_forecaster(kind) if kind == "prophet" else make_forecaster(kind, season=season)
+    t0 = time.perf_counter()
+    yhat, lower, upper = forecaster.forecast(train, test.shape[1], grid)
+    elapsed = time.perf_counter() - t0
+    n = train.shape[1]
+    yhat, lower, upper = yhat[:, n:], lower[:, n:], upper[:, n:]
+    scale = np.abs(train[:, season:] - train[:, :-season]).mean(axis=1)
+    mase = np.abs(yhat - test).mean(axis=1) / np.maximum(scale, 1e-9)
+    coverage = ((test >= lower) & (test <= upper)).mean()
+    return elapsed, float(np.median(mase)), float(coverage)
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--data-dir", default=os.path.join(ROOT, "data", "nab"))
+    p.add_argument("--length", default=4032, type=int, help="training points (14 days at 5m)")
+    p.add_argument("--horizon", default=288, type=int, help="held-out points (1 day at 5m)")
+    p.add_argument("--season", default=288, type=int, help="season length in points")
+    p.add_argument("--prophet-max-series", default=10, type=int,
+                   help="series forecast with prophet (0 skips it)")
+    args = p.parse_args()
+
+    names, corpus = load_corpus(args.data_dir, args.length + args.horizon)
+    train, test = corpus[:, :args.length], corpus[:, args.length:]
+    print(f"{len(names)} NAB series, {args.length} training + {args.horizon} held-out points, "
+          f"season={args.season}")
+    print(f"{'backend':>15} {'series':>7} {'seconds':>9} {'series/s':>10} {'mase':>7} {'coverage':>9}")
+
+    subsets = [("all", len(names))]
+    if args.prophet_max_series:
+        subsets.append(("prophet subset", min(args.prophet_max_series, len(names))))
+    for label, n in subsets:
+        kinds = ["seasonal_naive", "holt_winters"]
+        if label != "all":
+            # pay the Prophet / cmdstan import outside the timed run
+            import prophet  # noqa: F401
+            kinds.append("prophet")
+        print(f"-- {label}")
+        for kind in kinds:
+            elapsed, mase, coverage = evaluate(kind, train[:n], test[:n], args.season)
+            print(f"{kind:>15} {n:>7} {elapsed:9.3f} {n / elapsed:10.1f} {mase:7.3f} {coverage:9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+bench_import_time.py
+
+Startup cost of the `aiops` command line, measured with `python -X importtime`.
+
+Two checks, both failing the run (exit status 1) on a regression so it can
+gate CI:
+
+  * `aiops --help` and `aiops <command> --help` must not import any of the
+    heavy dependencies (numpy, pandas, sklearn, prophet, langchain, ...)
+  * their total import time must stay under --budget-ms
+
+The import cost of every command module is reported as well (informational:
+those imports are expected to be heavy, they only must not leak into --help).
+
+Usage:
+  python benchmarks/bench_import_time.py [--budget-ms 50] [--top 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiops.cli import COMMANDS  # noqa: E402
+
+HEAVY = ("numpy", "pandas", "sklearn", "scipy", "prophet", "cmdstanpy", "langchain",
+         "langchain_core", "langgraph", "requests", "prometheus_client")
+
+def importtime(args):
+    """
+    Runs python -X importtime args; returns [(module, depth, self_us, cumulative_us), ...]
+    where depth 0 is imported by the command itself, 1 by one of those, ...
+    """
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT,
+                          capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative)))
+    return rows
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--budget-ms", default=50.0, type=float,
+                   help="maximum total import time of a --help invocation")
+    p.add_argument("--top", default=5, type=int, help="heaviest imports listed per module")
+    args = p.parse_args()
+
+    failed = False
+    print(f"{'invocation':>34} {'imports':>8} {'ms':>8}  heavy modules")
+    for argv in [["--help"]] + [[command, "--help"] for command in COMMANDS]:
+        rows = importtime(["-m", "aiops", *argv])
+        total_ms = sum(r[2] for r in rows) / 1000
+        heavy = sorted({r[0] for r in rows if r[0].split(".")[0] in HEAVY})
+        bad = heavy or total_ms > args.budget_ms
+        failed |= bool(bad)
+        print(f"{'aiops ' + ' '.join(argv):>34} {len(rows):>8} {total_ms:8.1f}  "
+              f"{', '.join(heavy) or '-'}{'  <-- FAIL' if bad else ''}")
+
+    print(f"\n{'module':>34} {'ms':>8}  heaviest imports")
+    for module in COMMANDS.values():
+        rows = importtime(["-c", f"import aiops.{module}"])
+        total_ms = sum(r[2] for r in rows) / 1000
+        # direct imports of the module itself (depth 1 under the depth-0 aiops.<module>)
+        direct = [r for r in rows if r[1] == 1]
+        top = sorted(direct, key=lambda r: -r[3])[:args.top]
+        print(f"{'aiops.' + module:>34} {total_ms:8.1f}  "
+              + ", ".join(f"{name} {cum / 1000:.0f}" for name, _, _, cum in top))
+
+    if failed:
+        print(f"\nFAIL: --help must stay under {args.budget_ms:.0f} ms without heavy imports")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
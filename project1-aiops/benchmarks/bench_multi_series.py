@@ -0,0 +1,73 @@
+"""
+bench_multi_series.py
+
+Scaling of the multi-series anomaly engine (aiops/matrix_scoring.py) with
+series count and worker processes. Series are built from the bundled NAB
+corpus (data/nab/**/*.csv), tiled up to the requested count, each cut to
+--length points.
+
+Usage:
+  python benchmarks/bench_multi_series.py [--series 10 100 500] [--workers 1 2 4]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiops.matrix_scoring import align_series, score_matrix  # noqa: E402
+
+def load_corpus(data_dir, length):
+    rows = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "**", "*.csv"), recursive=True)):
+        values = pd.read_csv(path, usecols=["value"])["value"].to_numpy(dtype=np.float64)
+        if len(values) >= length:
+            rows.append(values[:length])
+    return np.vstack(rows)
+
+def build_matrix(corpus, n_series, step=300.0):
+    """Tiles the corpus to n_series rows and runs them through align_series."""
+    rows = corpus[np.arange(n_series) % len(corpus)]
+    ts = np.arange(rows.shape[1], dtype=np.float64) * step
+    _, matrix = align_series([(ts, row) for row in rows], 0.0, ts[-1], step)
+    return matrix
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--data-dir", default=os.path.join(ROOT, "data", "nab"))
+    p.add_argument("--length", default=4032, type=int, help="points per series (14 days at 5m)")
+    p.add_argument("--series", default=[10, 100, 500], type=int, nargs="+")
+    p.add_argument("--workers", default=[1, 2, 4], type=int, nargs="+")
+    p.add_argument("--forest-max-series", default=100, type=int,
+                   help="largest series count run through isolation_forest")
+    args = p.parse_args()
+
+    corpus = load_corpus(args.data_dir, args.length)
+    # pay the scikit-learn import outside the timed runs
+    score_matrix(build_matrix(corpus, 1)[:, :64], "isolation_forest", workers=1)
+    print(f"{len(corpus)} NAB series with >= {args.length} points, cpu_count={os.cpu_count()}")
+    print(f"{'method':>17} {'series':>7} {'workers':>7} {'seconds':>9} {'series/s':>10}")
+    for n in args.series:
+        matrix = build_matrix(corpus, n)
+        for method in ("robust", "rolling_robust"):
+            elapsed = timed(lambda: score_matrix(matrix, method))
+            print(f"{method:>17} {n:>7} {1:>7} {elapsed:9.3f} {n / elapsed:10.1f}")
+        if n > args.forest_max_series:
+            continue
+        for workers in args.workers:
+            elapsed = timed(lambda: score_matrix(matrix, "isolation_forest", workers=workers))
+            print(f"{'isolation_forest':>17} {n:>7} {workers:>7} {elapsed:9.3f} {n / elapsed:10.1f}")
+
+if __name__ == "__main__":
+    main()
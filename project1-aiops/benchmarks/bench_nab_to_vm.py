@@ -0,0 +1,83 @@
+"""
+bench_nab_to_vm.py
+
+Compare the legacy csv_to_lines path with the vectorized csv_to_lp_chunks
+engine of nab_to_vm.py over the bundled NAB corpus (data/nab/**/*.csv).
+
+Usage:
+  python benchmarks/bench_nab_to_vm.py [--repeat 3] [--chunk-size 5000]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from aiops.nab_to_vm import csv_to_lines, csv_to_lp_chunks  # noqa: E402
+
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+def run_legacy(files):
+    lines, size = 0, 0
+    for path in files:
+        out = csv_to_lines(path, "nab", os.path.basename(path)[:-4], TIME_FMT)
+        payload = ("\n".join(out) + ("\n" if out else "")).encode()
+        lines += len(out)
+        size += len(payload)
+    return lines, size
+
+def run_vectorized(files, chunk_size):
+    lines, size = 0, 0
+    for path in files:
+        for n, payload, _ in csv_to_lp_chunks(path, "nab", os.path.basename(path)[:-4],
+                                              TIME_FMT, chunk_size=chunk_size):
+            lines += n
+            size += len(payload)
+    return lines, size
+
+def check_identical(files, chunk_size):
+    for path in files:
+        host = os.path.basename(path)[:-4]
+        out = csv_to_lines(path, "nab", host, TIME_FMT)
+        legacy = ("\n".join(out) + ("\n" if out else "")).encode()
+        vectorized = b"".join(c[1] for c in csv_to_lp_chunks(path, "nab", host, TIME_FMT,
+                                                             chunk_size=chunk_size))
+        if legacy != vectorized:
+            raise SystemExit(f"output mismatch for {path}")
+
+def best_of(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--data-dir", default=os.path.join(ROOT, "data", "nab"))
+    p.add_argument("--repeat", default=3, type=int)
+    p.add_argument("--chunk-size", default=5000, type=int)
+    args = p.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.data_dir, "**", "*.csv"), recursive=True))
+    if not files:
+        raise SystemExit(f"No .csv files found under {args.data_dir}")
+    check_identical(files, args.chunk_size)
+    print(f"{len(files)} files, outputs identical")
+
+    results = {}
+    for name, fn in (("legacy", lambda: run_legacy(files)),
+                     ("vectorized", lambda: run_vectorized(files, args.chunk_size))):
+        elapsed, (lines, size) = best_of(fn, args.repeat)
+        results[name] = elapsed
+        print(f"{name:>10}: {elapsed:7.3f}s  {lines / elapsed:12,.0f} lines/s  "
+              f"{size / elapsed / 1e6:8.1f} MB/s")
+    print(f"speed-up: {results['legacy'] / results['vectorized']:.1f}x")
+
+if __name__ == "__main__":
+    main()
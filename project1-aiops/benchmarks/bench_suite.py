@@ -0,0 +1,387 @@
+"""
+bench_suite.py
+
+Reproducible benchmarks of the pipeline hot paths on the bundled NAB corpus
+(data/nab/**/*.csv). HTTP traffic goes to a local stub sink (tests/stub_sink.py),
+never to a real VictoriaMetrics.
+
+  csv_to_lines      CSV -> line protocol, legacy csv module path (nab_to_vm)
+  csv_to_lp_chunks  the same with the vectorized engine
+  convert_push      nab_to_vm.process_dir --push into the sink, by --workers
+  openmetrics       OpenMetrics backfill (ingest_data.backfill, one process)
+  readback          converted .lp / .col files read back as push batches (lines)
+                    or as timestamp / value arrays (arrays), by format
+  decode            query_range from the sink + query_client decode, by series
+  isolation_forest  matrix_scoring isolation_forest, by series and workers
+  iforest_model     anomaly_models.score_many on window features, cold (fit and
+                    save) vs hit (load the stored model and score), by series
+  forecast          holt_winters / seasonal_naive forecasters, by series
+
+File workloads run on the first N corpus files (--files); matrix workloads on
+N series of --length points (--series), built by tiling the corpus. Every case
+runs in a fresh interpreter, so its peak RSS is its own, and keeps the best of
+--repeat runs. Reported per case: seconds, rows/s, MB/s (if the workload
+moves bytes), peak RSS in MB (child processes included) and the per-stage
+breakdown from aiops/instrumentation.py.
+
+Results can be saved as a JSON baseline; a later run compared against it
+fails (exit status 1) when a case is more than --tolerance slower. Compare
+baselines from the same machine only; none are checked in.
+
+Usage:
+  python benchmarks/bench_suite.py [--workloads decode forecast] [--quick]
+  python benchmarks/bench_suite.py --save benchmarks/baselines/local.json
+  python benchmarks/bench_suite.py --compare benchmarks/baselines/local.json [--tolerance 0.25]
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tests"))
+
+DATA_DIR = os.path.join(ROOT, "data", "nab")
+TIME_FMT = "%Y-%m-%d %H:%M:%S"
+WORKLOADS = ("csv_to_lines", "csv_to_lp_chunks", "convert_push", "openmetrics", "readback",
+             "decode", "isolation_forest", "iforest_model", "forecast")
+
+def corpus_files(n):
+    return sorted(glob.glob(os.path.join(DATA_DIR, "**", "*.csv"), recursive=True))[:n]
+
+def corpus_matrix(n_series, length):
+    """n_series x length float64 matrix of NAB values, corpus series tiled as needed."""
+    import numpy as np
+    import pandas as pd
+
+    rows = []
+    for path in corpus_files(None):
+        values = pd.read_csv(path, usecols=["value"])["value"].to_numpy(dtype=np.float64)
+        if len(values) >= length:
+            rows.append(values[:length])
+    return np.vstack([rows[i % len(rows)] for i in range(n_series)])
+
+def query_range_body(matrix, step=300.0, start=1_700_000_000.0):
+    """A Prometheus query_range JSON response holding every row of matrix as one series."""
+    import numpy as np
+
+    grid = start + step * np.arange(matrix.shape[1])
+    result = [{"metric": {"__name__": "nab", "instance": f"s{i}"},
+               "values": [[t, repr(v)] for t, v in zip(grid.tolist(), row.tolist())]}
+              for i, row in enumerate(matrix)]
+    return json.dumps({"status": "success",
+                       "data": {"resultType": "matrix", "result": result}}).encode()
+
+# --- workloads: setup(params) -> (run() -> (rows, bytes), cleanup) ---
+
+def setup_csv_to_lines(params):
+    from aiops.nab_to_vm import csv_to_lines
+
+    files = corpus_files(params["files"])
+
+    def run():
+        rows = size = 0
+        for path in files:
+            lines = csv_to_lines(path, "nab", os.path.basename(path)[:-4], TIME_FMT)
+            rows += len(lines)
+            size += sum(len(line) + 1 for line in lines)
+        return rows, size
+    return run, None
+
+def setup_csv_to_lp_chunks(params):
+    from aiops.nab_to_vm import csv_to_lp_chunks
+
+    files = corpus_files(params["files"])
+
+    def run():
+        rows = size = 0
+        for path in files:
+            for n, payload, _ in csv_to_lp_chunks(path, "nab", os.path.basename(path)[:-4],
+                                                  TIME_FMT):
+                rows += n
+                size += len(payload)
+        return rows, size
+    return run, None
+
+def setup_convert_push(params):
+    from aiops.nab_to_vm import process_dir
+    from stub_sink import StubSink
+
+    tmp = tempfile.mkdtemp(prefix="bench_convert_")
+    input_dir = os.path.join(tmp, "in")
+    os.makedirs(input_dir)
+    for path in corpus_files(params["files"]):
+        shutil.copy(path, input_dir)
+    sink = StubSink()
+
+    def run():
+        before = sink.stats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            process_dir(input_dir, os.path.join(tmp, "out"), sink.url, True, "nab", 5000,
+                        TIME_FMT, workers=params["workers"], full=True)
+        after = sink.stats()
+        return after["lines"] - before["lines"], after["bytes"] - before["bytes"]
+
+    def cleanup():
+        sink.close()
+        shutil.rmtree(tmp, ignore_errors=True)
+    return run, cleanup
+
+def setup_openmetrics(params):
+    from aiops.ingest_data import backfill
+
+    files = corpus_files(params["files"])
+    tmp = tempfile.mkdtemp(prefix="bench_om_")
+
+    def run():
+        out = os.path.join(tmp, "metrics.om")
+        results, _ = backfill(files, out, workers=1)
+        return sum(r["rows"] for r in results), os.path.getsize(out)
+    return run, lambda: shutil.rmtree(tmp, ignore_errors=True)
+
+def setup_readback(params):
+    from aiops.nab_to_vm import convert_file, iter_file_batches
+
+    tmp = tempfile.mkdtemp(prefix="bench_readback_")
+    paths = []
+    for path in corpus_files(params["files"]):
+        host = os.path.basename(path)[:-4]
+        paths.append(os.path.join(tmp, f"{host}.{params['format']}"))
+        convert_file(path, paths[-1], "nab", host, 5000, TIME_FMT)
+    on_disk = sum(os.path.getsize(p) for p in paths)
+
+    def lines():
+        rows = 0
+        for path in paths:
+            for n, _, _ in iter_file_batches(path, 5000):
+                rows += n
+        return rows, on_disk
+
+    def arrays():
+        import numpy as np
+        import pandas as pd
+        from aiops.columnar import ColumnarSeries
+
+        rows = 0
+        for path in paths:
+            if path.endswith(".col"):
+                with ColumnarSeries(path) as series:
+                    rows += min(len(series.timestamps), len(series.values))
+            else:
+                df = pd.read_csv(path, sep=" ", header=None, names=["key", "field", "ts"])
+                values = df["field"].str.slice(len("value=")).astype(np.float64).to_numpy()
+                rows += len(values)
+        return rows, on_disk
+    return (lines if params["mode"] == "lines" else arrays), \
+        lambda: shutil.rmtree(tmp, ignore_errors=True)
+
+def setup_decode(params):
+    from aiops.query_client import make_session, query_range
+    from stub_sink import StubSink
+
+    body = query_range_body(corpus_matrix(params["series"], params["length"]))
+    sink = StubSink(query_body=body)
+    session = make_session(1)
+
+    def run():
+        series = query_range(sink.url, "nab", 0, 1, 300, session=session)
+        return sum(len(s.timestamps) for s in series), len(body)
+
+    def cleanup():
+        session.close()
+        sink.close()
+    return run, cleanup
+
+def setup_isolation_forest(params):
+    from aiops.matrix_scoring import score_matrix
+
+    matrix = corpus_matrix(params["series"], params["length"])
+
+    def run():
+        score_matrix(matrix, method="isolation_forest", workers=params["workers"])
+        return matrix.size, 0
+    return run, None
+
+def setup_iforest_model(params):
+    import numpy as np
+    from aiops.anomaly_models import score_many
+
+    matrix = corpus_matrix(params["series"], params["length"])
+    grid = np.arange(matrix.shape[1], dtype=np.float64) * 300.0
+    series = {f"s{i}": (grid, row) for i, row in enumerate(matrix)}
+    tmp = tempfile.mkdtemp(prefix="bench_iforest_")
+    if params["model"] == "hit":
+        list(score_many(series, tmp, workers=1))
+
+    def run():
+        store = tmp if params["model"] == "hit" else tempfile.mkdtemp(dir=tmp)
+        scored = sum(len(scores) for _, _, scores, _ in score_many(series, store, workers=1))
+        return scored, 0
+    return run, lambda: shutil.rmtree(tmp, ignore_errors=True)
+
+def setup_forecast(params):
+    import numpy as np
+    from aiops.forecasters import make_forecaster
+
+    matrix = corpus_matrix(params["series"], params["length"])
+    grid = np.arange(matrix.shape[1], dtype=np.float64) * 300.0
+    forecaster = make_forecaster(params["backend"])
+
+    def run():
+        forecaster.forecast(matrix, 288, grid)
+        return matrix.size, 0
+    return run, None
+
+SETUP = {name: globals()["setup_" + name] for name in WORKLOADS}
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024  # bytes on macOS, KiB elsewhere
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * scale / 2 ** 20, 1)
+
+def run_case(case, repeat):
+    """Runs one case in this process; returns its result dict."""
+    from aiops.instrumentation import STATS, report
+
+    run, cleanup = SETUP[case["workload"]](case["params"])
+    base_rss = peak_rss_mb()
+    best = None
+    try:
+        for _ in range(repeat):
+            STATS.drain()
+            t0 = time.perf_counter()
+            rows, size = run()
+            elapsed = time.perf_counter() - t0
+            if best is None or elapsed < best[0]:
+                best = (elapsed, rows, size, report())
+    finally:
+        if cleanup is not None:
+            cleanup()
+    elapsed, rows, size, stages = best
+    return {"seconds": round(elapsed, 6), "rows": rows, "bytes": size,
+            "rows_per_second": round(rows / elapsed, 1),
+            "mb_per_second": round(size / elapsed / 1e6, 3) if size else None,
+            "base_rss_mb": base_rss, "peak_rss_mb": peak_rss_mb(),
+            "stages": {name: {"seconds": s["seconds"], "count": s["count"]}
+                       for name, s in stages.items()}}
+
+def case_id(case):
+    return case["workload"] + "[" + ",".join(f"{k}={v}" for k, v in case["params"].items()) + "]"
+
+def plan(workload, args):
+    """The params of every case of a workload, along its scaling axes."""
+    if workload in ("csv_to_lines", "csv_to_lp_chunks", "openmetrics"):
+        return [{"files": n} for n in args.files]
+    if workload == "readback":
+        return [{"files": max(args.files), "format": f, "mode": m}
+                for m in ("lines", "arrays") for f in ("lp", "col")]
+    if workload == "convert_push":
+        return [{"files": max(args.files), "workers": w} for w in args.workers]
+    if workload == "decode":
+        return [{"series": n, "length": args.length} for n in args.series]
+    if workload == "isolation_forest":
+        return [{"series": n, "length": args.length, "workers": w}
+                for n in args.series for w in args.workers]
+    if workload == "iforest_model":
+        return [{"series": n, "length": args.length, "model": m}
+                for m in ("cold", "hit") for n in args.series]
+    return [{"series": n, "length": args.length, "backend": b}
+            for b in ("seasonal_naive", "holt_winters") for n in args.series]
+
+def run_isolated(case, repeat):
+    """Runs a case in a fresh interpreter (own peak RSS); returns its result dict."""
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(case),
+                           "--repeat", str(repeat)], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"{case_id(case)} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def machine():
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+def compare(results, baseline, tolerance):
+    """Prints the seconds ratio per case; returns the ids slower than baseline * (1 + tolerance)."""
+    slower = []
+    print(f"\n{'case':>56} {'baseline s':>11} {'now s':>9} {'ratio':>7}")
+    for cid, result in results.items():
+        old = baseline["results"].get(cid)
+        if old is None:
+            print(f"{cid:>56} {'-':>11} {result['seconds']:9.3f}")
+            continue
+        ratio = result["seconds"] / max(old["seconds"], 1e-9)
+        bad = ratio > 1 + tolerance
+        if bad:
+            slower.append(cid)
+        print(f"{cid:>56} {old['seconds']:11.3f} {result['seconds']:9.3f} {ratio:7.2f}"
+              + ("  <-- SLOWER" if bad else ""))
+    return slower
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    p.add_argument("--files", nargs="+", type=int, default=[1, 8, 58], help="corpus file counts")
+    p.add_argument("--series", nargs="+", type=int, default=[10, 100], help="matrix series counts")
+    p.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4], help="worker counts")
+    p.add_argument("--length", type=int, default=4032, help="points per series (14 days at 5m)")
+    p.add_argument("--repeat", type=int, default=3, help="runs per case, the best is kept")
+    p.add_argument("--quick", action="store_true",
+                   help="small smoke run: --files 1 8 --series 10 --workers 1 2 --repeat 1")
+    p.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    p.add_argument("--compare", metavar="FILE", help="compare with a JSON baseline")
+    p.add_argument("--tolerance", type=float, default=0.25,
+                   help="allowed slowdown against the baseline (0.25 = 25%%)")
+    p.add_argument("--case", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case), args.repeat)))
+        return
+    if args.quick:
+        args.files, args.series, args.workers, args.repeat = [1, 8], [10], [1, 2], 1
+
+    results = {}
+    print(f"{'case':>56} {'seconds':>9} {'rows/s':>12} {'MB/s':>8} {'peak MB':>8}")
+    for workload in args.workloads:
+        for params in plan(workload, args):
+            case = {"workload": workload, "params": params}
+            result = results[case_id(case)] = run_isolated(case, args.repeat)
+            mbps = f"{result['mb_per_second']:8.1f}" if result["mb_per_second"] else f"{'-':>8}"
+            print(f"{case_id(case):>56} {result['seconds']:9.3f} "
+                  f"{result['rows_per_second']:12,.0f} {mbps} {result['peak_rss_mb'] or '-':>8}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as fh:
+            json.dump({"machine": machine(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "repeat": args.repeat, "results": results}, fh, indent=2)
+        print(f"\nbaseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        if baseline.get("machine") != machine():
+            print(f"\nwarning: baseline recorded on {baseline.get('machine')}")
+        slower = compare(results, baseline, args.tolerance)
+        if slower:
+            print(f"\nFAIL: {len(slower)} case(s) more than {args.tolerance:.0%} slower")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
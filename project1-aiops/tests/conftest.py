@@ -0,0 +1,15 @@
+import pytest
+
+from stub_sink import StubSink
+
+@pytest.fixture
+def stub_sink():
+    """Starts a StubSink(**kwargs) per call; all of them are closed after the test."""
+    sinks = []
+
+    def start(**kwargs):
+        sinks.append(StubSink(**kwargs))
+        return sinks[-1]
+    yield start
+    for sink in sinks:
+        sink.close()
@@ -0,0 +1,101 @@
+"""
+stub_sink.py
+
+Local stand-in for Prometheus / VictoriaMetrics / the Pushgateway in the
+tests (the stub_sink fixture of conftest.py) and benchmarks/bench_suite.py.
+Any POST or PUT is accepted and counted (requests, lines and bytes, after
+gunzipping Content-Encoding: gzip bodies); any GET, e.g.
+/api/v1/query_range, is answered with a fixed body.
+
+fail_first answers the first N POST / PUT requests with fail_status instead,
+and delay holds every accepted request for that many seconds, so retries
+and the number of requests in flight at once can be observed.
+
+    with StubSink(query_body=body) as sink:
+        requests.post(sink.url + "/write", data=b"a value=1 1\n")
+        sink.stats()  # {'requests': 1, 'lines': 1, 'bytes': 12, 'failed': 0, ...}
+"""
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMPTY_MATRIX = b'{"status":"success","data":{"resultType":"matrix","result":[]}}'
+
+class StubSink:
+    """HTTP sink on 127.0.0.1 (an ephemeral port unless given), served from a thread."""
+
+    def __init__(self, query_body: bytes = EMPTY_MATRIX, host: str = "127.0.0.1", port: int = 0,
+                 fail_first: int = 0, fail_status: int = 503, delay: float = 0.0):
+        self.query_body = query_body
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "lines": 0, "bytes": 0, "failed": 0, "gzip": 0,
+                       "max_in_flight": 0}
+        self._in_flight = 0
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, body=b""):
+                self.send_response(code)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(200, sink.query_body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                gzipped = self.headers.get("Content-Encoding") == "gzip"
+                if gzipped:
+                    body = gzip.decompress(body)
+                with sink._lock:
+                    if sink._stats["failed"] < sink.fail_first:
+                        sink._stats["failed"] += 1
+                        fail = True
+                    else:
+                        fail = False
+                        sink._in_flight += 1
+                        sink._stats["max_in_flight"] = max(sink._stats["max_in_flight"],
+                                                           sink._in_flight)
+                if fail:
+                    self._reply(sink.fail_status)
+                    return
+                time.sleep(sink.delay)
+                with sink._lock:
+                    sink._in_flight -= 1
+                    sink._stats["requests"] += 1
+                    sink._stats["lines"] += body.count(b"\n")
+                    sink._stats["bytes"] += len(body)
+                    sink._stats["gzip"] += gzipped
+                self._reply(204)
+
+            do_PUT = do_POST
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
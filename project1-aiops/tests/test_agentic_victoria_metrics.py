@@ -0,0 +1,65 @@
+import asyncio
+import re
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from aiops import agentic_victoria_metrics as avm
+
+class SlowChatModel(BaseChatModel):
+    """Answers after delays[host] seconds without calling tools; 'bad' raises."""
+
+    delays: dict
+    running: int = 0
+    max_running: int = 0
+
+    @property
+    def _llm_type(self):
+        return "slow-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        raise NotImplementedError
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        host = re.search(r"host=(\S+)", messages[-1].content).group(1)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays[host])
+        finally:
+            self.running -= 1
+        if host == "bad":
+            raise RuntimeError("model unavailable")
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=f"report {host}"))])
+
+def collect(windows, model, concurrency):
+    async def main():
+        return [(w["host"], r) async for w, r in
+                avm.investigate_many(windows, concurrency, react_agent=avm.make_agent(model))]
+    return asyncio.run(main())
+
+def test_investigate_many_yields_as_completed_and_isolates_errors():
+    model = SlowChatModel(delays={"slow": 0.3, "fast": 0.05, "bad": 0.15})
+    windows = [{"host": h, "start": "2024-01-01T00:00:00Z", "end": "2024-01-02T00:00:00Z"}
+               for h in ("slow", "fast", "bad")]
+    results = collect(windows, model, concurrency=3)
+    assert [host for host, _ in results] == ["fast", "bad", "slow"]
+    assert isinstance(results[1][1], RuntimeError)
+    assert results[0][1]["messages"][-1].content == "report fast"
+    assert results[2][1]["messages"][-1].content == "report slow"
+
+def test_investigate_many_bounds_concurrency():
+    hosts = [f"h{i}" for i in range(6)]
+    model = SlowChatModel(delays=dict.fromkeys(hosts, 0.05))
+    windows = [{"host": h, "start": "0", "end": "3600"} for h in hosts]
+    results = collect(windows, model, concurrency=2)
+    assert sorted(host for host, _ in results) == hosts
+    assert model.max_running == 2
+
+def test_query_cpu_description_states_the_configured_sample_limit():
+    assert f"at most {avm.MAX_SAMPLES}\n" in avm.query_cpu.description
+    assert "{" not in avm.query_cpu.description
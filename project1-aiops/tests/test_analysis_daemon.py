@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from aiops import analysis_daemon
+from aiops.query_client import Series
+
+STEP = 300
+
+def make_results(end, n=60):
+    ts = end - STEP * np.arange(n)[::-1]
+    values = np.sin(ts / 3600.0) * 10 + 50
+    values[-1] = 500.0
+    return [Series({'__name__': 'cpu', 'instance': 'a'}, ts.astype(float), values)]
+
+def test_failed_push_keeps_detector_state_for_retry(tmp_path, monkeypatch):
+    now = 1_700_000_000.0
+    daemon = analysis_daemon.AnalysisDaemon(selector='cpu', step=str(STEP), lookback=60 * STEP,
+                                            lag=0, forecast_interval=float('inf'),
+                                            state_file=str(tmp_path / 'daemon.json'))
+    end = np.floor(now / STEP) * STEP
+    monkeypatch.setattr(analysis_daemon, 'fetch_range',
+                        lambda *a, **kw: make_results(end))
+    pushed = []
+
+    def failing_sink(session, endpoint, lines, batch_size):
+        raise ConnectionError("sink down")
+
+    monkeypatch.setattr(analysis_daemon, 'post_lines', failing_sink)
+    with pytest.raises(ConnectionError):
+        daemon.run_cycle(now)
+    assert daemon.cursor is None
+    assert daemon.scorer.watermarks == {}
+
+    def sink(session, endpoint, lines, batch_size):
+        pushed.append(list(lines))
+        return len(lines)
+
+    monkeypatch.setattr(analysis_daemon, 'post_lines', sink)
+    summary = daemon.run_cycle(now)
+    assert daemon.cursor == end
+    assert summary['scored'] == 60
+    assert len(pushed) == 1 and len(pushed[0]) == 60
+
+    # a fresh daemon scoring the same window emits exactly the retried lines
+    fresh = analysis_daemon.AnalysisDaemon(selector='cpu', step=str(STEP), lookback=60 * STEP,
+                                           lag=0, forecast_interval=float('inf'),
+                                           state_file=str(tmp_path / 'fresh.json'))
+    fresh_lines, _ = fresh.score(make_results(end))
+    assert pushed[0] == fresh_lines
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from aiops import analyze_anomalies
+from aiops.analyze_anomalies import push_anomalies_bulk, push_anomalies_to_prometheus
+
+def scored(n):
+    return pd.DataFrame({"timestamp": 1_700_000_000 + 300 * np.arange(n, dtype=float),
+                         "anomaly_score": np.linspace(0.25, 0.75, n)})
+
+class Session:
+    def __init__(self):
+        self.posts = []
+
+    def post(self, endpoint, data, timeout):
+        self.posts.append((endpoint, data))
+        return self
+
+    def raise_for_status(self):
+        pass
+
+def test_bulk_push_sends_full_batches_then_the_rest():
+    session = Session()
+    sent = push_anomalies_bulk(scored(12), labels={"job": "t"}, url="http://vm",
+                               batch_size=5, fmt="prometheus", session=session)
+    assert sent == 12
+    assert [data.count(b"\n") for _, data in session.posts] == [5, 5, 2]
+    assert {endpoint for endpoint, _ in session.posts} == {"http://vm/api/v1/import/prometheus"}
+    lines = b"".join(data for _, data in session.posts).decode().splitlines()
+    assert lines[0] == 'aws_cpu_anomaly_score{job="t"} 0.25 1700000000000'
+    assert lines[-1] == 'aws_cpu_anomaly_score{job="t"} 0.75 1700003300000'
+
+def test_bulk_push_over_http(stub_sink):
+    sink = stub_sink()
+    assert push_anomalies_bulk(scored(10), url=sink.url, batch_size=4, fmt="influx") == 10
+    stats = sink.stats()
+    assert (stats["requests"], stats["lines"]) == (3, 10)
+    assert push_anomalies_bulk(scored(0), url=sink.url, batch_size=4) == 0
+    assert sink.stats()["requests"] == 3
+
+def test_pushgateway_push_sends_every_score(monkeypatch):
+    pushed = []
+    monkeypatch.setattr(analyze_anomalies, "push_to_gateway", lambda gateway, job, registry:
+                        pushed.append(registry.get_sample_value("aws_cpu_anomaly_score")))
+    push_anomalies_to_prometheus(pd.Series([0.1, 0.9, 0.4]))
+    assert pushed == [0.1, 0.9, 0.4]
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+from aiops import anomaly_models
+from aiops.anomaly_models import IForestStore, score_many, score_series
+
+STEP = 300
+PARAMS = {"windows": (12,), "n_estimators": 20, "min_drift_points": 12}
+
+def history(n, level=50.0, start=0, seed=0):
+    rng = np.random.default_rng(seed)
+    ts = 1_700_000_000 + STEP * np.arange(start, start + n, dtype=float)
+    return ts, level + rng.normal(0, 1, n)
+
+def extend(ts, vals, n, level=50.0, seed=1):
+    more_ts, more_vals = history(n, level, start=len(ts), seed=seed)
+    return np.concatenate([ts, more_ts]), np.concatenate([vals, more_vals])
+
+def test_store_versions_and_pruning(tmp_path):
+    store = IForestStore(str(tmp_path), keep_versions=2)
+    assert store.load("k") == (None, None)
+    for i in range(4):
+        assert store.save("k", {"model": i}, {"points": i}) == i + 1
+    assert sorted(os.listdir(store.path("k"))) == ["meta.json", "v3.joblib", "v4.joblib"]
+    model, meta = store.load("k")
+    assert (model, meta["version"], meta["points"], meta["key"]) == ({"model": 3}, 4, 3, "k")
+    assert store.load("k", version=3)[0] == {"model": 2}
+    assert store.load("k", version=1) == (None, None)
+    store.update_meta("k", checked_until=5.0)
+    assert store.meta("k")["checked_until"] == 5.0 and store.meta("k")["version"] == 4
+
+def test_cold_hit_drift_and_scheduled(tmp_path):
+    root = str(tmp_path)
+    ts, vals = history(300)
+    _, scored_ts, scores, info = score_series("k", ts, vals, root, **PARAMS)
+    assert (info["model"], info["version"], info["saved_version"]) == ("cold", 1, 1)
+    assert len(scored_ts) == len(scores) == 300 - 3    # the first max(LAGS) rows lack lags
+
+    # fewer than min_drift_points new points: no drift check, watermark stays
+    ts, vals = extend(ts, vals, 5)
+    _, _, _, info = score_series("k", ts, vals, root, **PARAMS)
+    assert (info["model"], info["drift"]) == ("hit", None)
+    assert "checked_until" not in IForestStore(root).meta("k")
+
+    # enough of them: checked, and the watermark moves past them
+    ts, vals = extend(ts, vals, 10, seed=2)
+    _, _, _, info = score_series("k", ts, vals, root, **PARAMS)
+    assert info["model"] == "hit" and info["drift"] is not None
+    assert IForestStore(root).meta("k")["checked_until"] == ts[-1]
+    _, _, _, info = score_series("k", ts, vals, root, **PARAMS)
+    assert (info["model"], info["drift"]) == ("hit", None)
+
+    # a level shift: scored by v1, then v2 is fitted
+    ts, vals = extend(ts, vals, 20, level=90.0, seed=3)
+    _, _, scores, info = score_series("k", ts, vals, root, **PARAMS)
+    assert (info["model"], info["version"], info["saved_version"]) == ("drift", 1, 2)
+    assert scores[-20:].mean() > scores[:-20].mean()
+
+    _, _, _, info = score_series("k", ts, vals, root, max_age=0, **PARAMS)
+    assert (info["model"], info["version"], info["saved_version"]) == ("scheduled", 2, 3)
+
+def test_changed_features_refit_cold(tmp_path):
+    ts, vals = history(100)
+    score_series("k", ts, vals, str(tmp_path), **PARAMS)
+    _, _, _, info = score_series("k", ts, vals, str(tmp_path), **dict(PARAMS, windows=(6,)))
+    assert (info["model"], info["saved_version"]) == ("cold", 2)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_score_many_reports_errors_per_series(tmp_path, workers):
+    anomaly_models.STATS.drain()
+    series = {"ok": history(100), "short": history(2)}
+    results = {key: (ts, scores, info)
+               for key, ts, scores, info in score_many(series, str(tmp_path), workers, **PARAMS)}
+    assert results["ok"][2]["model"] == "cold"
+    ts, scores, info = results["short"]
+    assert info["model"] == "error" and "Not enough points" in info["error"]
+    assert len(ts) == len(scores) == 0
+    assert anomaly_models.STATS.drain()["fit"]["count"] == 1
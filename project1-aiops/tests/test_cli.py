@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from aiops.cli import COMMANDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("numpy", "pandas", "sklearn", "scipy", "prophet", "cmdstanpy", "langchain",
+         "langchain_core", "langgraph", "requests", "prometheus_client")
+
+# runs `aiops <argv>` and prints the top-level modules imported by then
+PROBE = """
+import json, sys
+from aiops.cli import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+@pytest.mark.parametrize("argv", [["--help"]] + [[command, "--help"] for command in COMMANDS])
+def test_help_imports_no_heavy_modules(argv):
+    proc = subprocess.run([sys.executable, "-c", PROBE, *argv], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    usage, _, modules = proc.stdout.rpartition("\n[")
+    assert "usage: aiops" in usage
+    assert not set(json.loads("[" + modules)) & set(HEAVY)
+
+def test_package_docstring_lists_every_command():
+    import aiops
+
+    assert "{" + ",".join(COMMANDS) + "}" in aiops.__doc__
@@ -0,0 +1,70 @@
+import io
+
+import numpy as np
+import pytest
+
+from aiops.columnar import (TS_DELTA, TS_RAW, TS_REGULAR, VAL_DECIMAL, VAL_RAW, ColumnarSeries,
+                            append_series, render, write_series)
+
+STEP = 300 * 10**9
+T0 = 1_700_000_000 * 10**9
+N = 50
+
+def timestamps(kind):
+    ts = T0 + STEP * np.arange(N, dtype=np.int64)
+    if kind == TS_DELTA:
+        ts[N // 2:] += 3 * STEP    # a gap
+    elif kind == TS_RAW:
+        ts[[10, 11]] = ts[[11, 10]]    # out of order
+    return ts
+
+def values(kind):
+    vals = np.round(np.linspace(0.5, 99.125, N), 3)
+    if kind == VAL_RAW:
+        vals[7] = np.pi
+    return vals
+
+@pytest.mark.parametrize("ts_kind", [TS_REGULAR, TS_DELTA, TS_RAW])
+@pytest.mark.parametrize("val_kind", [VAL_DECIMAL, VAL_RAW])
+def test_roundtrip(tmp_path, ts_kind, val_kind):
+    path = str(tmp_path / "s.col")
+    ts, vals = timestamps(ts_kind), values(val_kind)
+    write_series(path, "cpu", {"host": "a b"}, ts, vals)
+    with ColumnarSeries(path) as s:
+        assert (s.ts_encoding, s.value_encoding) == (ts_kind, val_kind)
+        assert (s.name, s.labels, s.n) == ("cpu", {"host": "a b"}, N)
+        np.testing.assert_array_equal(s.timestamps, ts)
+        assert s.values.tobytes() == vals.tobytes()
+
+def test_append_keeps_only_newer_points(tmp_path):
+    path = str(tmp_path / "s.col")
+    ts, vals = timestamps(TS_REGULAR), values(VAL_DECIMAL)
+    append_series(path, "cpu", {}, ts[:30], vals[:30])
+    # overlaps the stored points: 20..29 are already there, with other values
+    append_series(path, "cpu", {}, ts[20:], vals[20:] + 1000)
+    with ColumnarSeries(path) as s:
+        np.testing.assert_array_equal(s.timestamps, ts)
+        np.testing.assert_array_equal(s.values[:30], vals[:30])
+        np.testing.assert_array_equal(s.values[30:], vals[30:] + 1000)
+
+def test_iter_lines_matches_per_row_formatting(tmp_path):
+    path = str(tmp_path / "s.col")
+    ts, vals = timestamps(TS_DELTA), values(VAL_RAW)
+    write_series(path, "cpu", {"host": "a b"}, ts, vals)
+    with ColumnarSeries(path) as s:
+        batches = list(s.iter_lines("influx", batch_size=16, after_ns=int(ts[4])))
+    assert [n for n, _, _ in batches] == [16, 16, 13]
+    assert batches[-1][2] == int(ts[-1])
+    expected = "".join(f"cpu,host=a\\ b value={v} {t}\n"
+                       for v, t in zip(vals[5:].tolist(), ts[5:].tolist()))
+    assert b"".join(data for _, data, _ in batches).decode() == expected
+
+def test_render_openmetrics(tmp_path):
+    path = str(tmp_path / "s.col")
+    write_series(path, "cpu", {"host": "a"}, timestamps(TS_REGULAR)[:2], [1.5, 2.0])
+    out = io.BytesIO()
+    assert render([path], out) == 2
+    assert out.getvalue().decode() == ('# TYPE cpu gauge\n'
+                                       'cpu{host="a"} 1.5 1700000000\n'
+                                       'cpu{host="a"} 2.0 1700000300\n'
+                                       '# EOF\n')
@@ -0,0 +1,24 @@
+import pytest
+
+from aiops.export_format import post_lines
+
+class Session:
+    def __init__(self):
+        self.payloads = []
+
+    def post(self, endpoint, data, timeout):
+        self.payloads.append(data)
+        return self
+
+    def raise_for_status(self):
+        pass
+
+@pytest.mark.parametrize("as_generator", [False, True])
+def test_post_lines_batches(as_generator):
+    lines = [f"m {i} {i}" for i in range(12)]
+    session = Session()
+    sent = post_lines(session, "http://vm/write", (l for l in lines) if as_generator else lines,
+                      batch_size=5)
+    assert sent == 12
+    assert [p.count(b"\n") for p in session.payloads] == [5, 5, 2]
+    assert b"".join(session.payloads).decode().splitlines() == lines
@@ -0,0 +1,107 @@
+import json
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from aiops import forecast_engine
+from aiops.forecast_engine import ModelStore, forecast_series
+
+class FakeProphet:
+    """Stands in for prophet.Prophet: delta has one entry per changepoint, beta per feature."""
+
+    fits = []
+
+    def __init__(self, n_changepoints=25, seasonality_width=6):
+        self.kwargs = {"n_changepoints": n_changepoints, "seasonality_width": seasonality_width}
+        self.mcmc_samples = 0
+
+    def setup_dataframe(self, df, initialize_scales=False):
+        return df
+
+    def set_auto_seasonalities(self):
+        pass
+
+    def make_all_seasonality_features(self, df):
+        return np.zeros((len(df), self.kwargs["seasonality_width"])), None, None, None
+
+    def set_changepoints(self):
+        n = min(self.kwargs["n_changepoints"], len(self.history) // 4)
+        self.changepoints_t = np.zeros(max(n, 1))
+
+    def fit(self, df, init=None):
+        FakeProphet.fits.append(init)
+        self.history = df
+        self.set_changepoints()
+        self.params = {"k": [[0.1]], "m": [[0.2]], "sigma_obs": [[0.3]],
+                       "delta": [[0.01] * len(self.changepoints_t)],
+                       "beta": [[0.0] * self.kwargs["seasonality_width"]]}
+        self.last = float(df["y"].iloc[-1])
+        return self
+
+    def predict(self, future):
+        return future.assign(yhat=self.last, yhat_lower=self.last - 1, yhat_upper=self.last + 1)
+
+def model_to_json(model):
+    return json.dumps({"kwargs": model.kwargs, "params": model.params, "last": model.last})
+
+def model_from_json(text):
+    state = json.loads(text)
+    model = FakeProphet(**state["kwargs"])
+    model.params, model.last = state["params"], state["last"]
+    return model
+
+@pytest.fixture
+def fake_prophet(monkeypatch):
+    module = types.ModuleType("prophet")
+    module.Prophet = FakeProphet
+    serialize = types.ModuleType("prophet.serialize")
+    serialize.model_to_json, serialize.model_from_json = model_to_json, model_from_json
+    monkeypatch.setitem(sys.modules, "prophet", module)
+    monkeypatch.setitem(sys.modules, "prophet.serialize", serialize)
+    FakeProphet.fits = []
+    return FakeProphet
+
+def series(n):
+    ts = 1_700_000_000 + 300.0 * np.arange(n)
+    return ts, np.arange(n, dtype=float)
+
+def forecast(tmp_path, n, refit_after=5, **prophet_params):
+    ts, values = series(n)
+    return forecast_series("cpu{host=\"a\"}", ts, values, str(tmp_path), horizon=3,
+                           refit_after=refit_after, prophet_params=prophet_params)
+
+def test_model_store_roundtrip(tmp_path):
+    store = ModelStore(str(tmp_path))
+    assert store.load("missing") == (None, None)
+    store.save("a", '{"model": 1}', {"fitted_at": 1.0})
+    assert store.load("a") == ('{"model": 1}', {"fitted_at": 1.0})
+
+def test_cold_hit_warm_paths(tmp_path, fake_prophet):
+    _, first, info = forecast(tmp_path, 200)
+    assert info["cache"] == "cold" and fake_prophet.fits == [None]
+    assert len(first) == 3 and first["yhat"].iloc[0] == 199
+
+    _, _, info = forecast(tmp_path, 202)
+    assert info["cache"] == "hit" and len(fake_prophet.fits) == 1
+
+    _, second, info = forecast(tmp_path, 210)
+    assert info["cache"] == "warm"
+    assert len(fake_prophet.fits[-1]["delta"]) == 25
+    assert second["yhat"].iloc[0] == 209
+
+def test_mismatched_init_is_reported_cold(tmp_path, fake_prophet):
+    forecast(tmp_path, 40)    # 10 changepoints
+    _, _, info = forecast(tmp_path, 200)    # 25 changepoints: the stored delta does not fit
+    assert info["cache"] == "cold" and fake_prophet.fits[-1] is None
+
+    _, _, info = forecast(tmp_path, 210, seasonality_width=8)
+    assert info["cache"] == "cold" and fake_prophet.fits[-1] is None
+
+def test_model_shapes(fake_prophet):
+    import pandas as pd
+
+    ts, values = series(200)
+    history = pd.DataFrame({"ds": pd.to_datetime(ts, unit="s"), "y": values})
+    assert forecast_engine.model_shapes(history, {"seasonality_width": 4}) == (25, 4)
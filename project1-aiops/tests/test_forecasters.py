@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aiops import forecast_trends
+from aiops.forecasters import (Forecaster, HoltWintersForecaster, SeasonalNaiveForecaster,
+                               horizon_steps, make_forecaster)
+from aiops.query_client import Series
+
+def test_holt_winters_picks_alpha_per_series():
+    rng = np.random.default_rng(0)
+    walk = np.cumsum(rng.normal(0, 1, 200))    # follows the last value: large alpha
+    noise = 10 + rng.normal(0, 1, 200)         # averages the noise out: small alpha
+    matrix = np.vstack([walk, noise])
+    alphas = (0.01, 0.9)
+    yhat, lower, upper = HoltWintersForecaster(season=4, alphas=alphas).forecast(matrix, 5)
+    assert yhat.shape == lower.shape == upper.shape == (2, 205)
+    assert (lower <= yhat).all() and (yhat <= upper).all()
+    for row, alpha in ((0, 0.9), (1, 0.01)):
+        single, _, _ = HoltWintersForecaster(season=4, alphas=(alpha,)).forecast(
+            matrix[row:row + 1], 5)
+        np.testing.assert_allclose(yhat[row], single[0])
+
+def test_holt_winters_bands_widen_with_the_horizon():
+    rng = np.random.default_rng(1)
+    matrix = (np.sin(np.arange(96) * np.pi / 6) + rng.normal(0, 0.1, 96))[None, :]
+    yhat, lower, upper = HoltWintersForecaster(season=12, alphas=(0.5,)).forecast(matrix, 24)
+    width = (upper - lower)[0, 96:]
+    assert (np.diff(width) > 0).all()
+
+def test_seasonal_naive_repeats_the_last_season():
+    season = np.array([1.0, 2.0, 3.0, 4.0])
+    matrix = np.vstack([np.tile(season, 3), np.tile(season, 3) + np.repeat([0.0, 4.0], [8, 4])])
+    matrix[0, 5] = np.nan    # gaps are forward-filled
+    yhat, lower, upper = SeasonalNaiveForecaster(season=4).forecast(matrix, 6)
+    assert yhat[0, 12:].tolist() == [1, 2, 3, 4, 1, 2]
+    assert yhat[1, 12:].tolist() == [5, 6, 7, 8, 5, 6]
+    np.testing.assert_array_equal(lower[0], yhat[0])    # perfectly periodic: no band
+    yhat, _, _ = SeasonalNaiveForecaster(season=4, seasons=2).forecast(matrix[1:], 4)
+    assert yhat[0, 12:].tolist() == [3, 4, 5, 6]
+
+def test_horizon_steps():
+    assert horizon_steps(30, "D", 300) == 8640
+    assert horizon_steps(1, "h", 7) == 515
+    assert horizon_steps(1, "min", 3600) == 1
+
+def test_make_forecaster_and_abstract_base():
+    assert isinstance(make_forecaster("seasonal_naive", season=4), SeasonalNaiveForecaster)
+    with pytest.raises(ValueError, match="Unknown forecaster"):
+        make_forecaster("arima")
+    with pytest.raises(TypeError):
+        Forecaster()
+
+def test_forecast_trend_merges_concatenated_series():
+    ts = pd.to_datetime(1_700_000_000 + 300 * np.arange(8), unit="s")
+    # two series back to back, so the raw timestamps go backwards
+    data = pd.DataFrame({"timestamp": np.concatenate([ts, ts]),
+                         "value": np.concatenate([np.full(8, 1.0), np.full(8, 3.0)])})
+    forecast = forecast_trends.forecast_trend(data, backend="seasonal_naive", periods=1, freq="h")
+    assert len(forecast) == 8 + 12
+    assert forecast["ds"].is_monotonic_increasing
+    np.testing.assert_allclose(forecast["yhat"], 2.0)
+
+def test_forecast_fleet_skips_empty_series(monkeypatch):
+    ts = 1_700_000_000 + 300 * np.arange(24, dtype=float)
+    results = [Series({"host": "empty"}, np.array([]), np.array([])),
+               Series({"host": "a"}, ts, np.ones(24))]
+    monkeypatch.setattr(forecast_trends, "fetch_range", lambda *args, **kwargs: results)
+    monkeypatch.setattr(forecast_trends, "config_cache", lambda: None)
+    labels, forecasts, _ = forecast_trends.forecast_fleet("cpu", end=ts[-1], horizon=3,
+                                                          backend="seasonal_naive")
+    assert [lab["host"] for lab in labels.values()] == ["a"]
+    assert [len(f) for f in forecasts.values()] == [3]
@@ -0,0 +1,139 @@
+import argparse
+import os
+
+import numpy as np
+import pytest
+
+from aiops import ingest_data
+from aiops.columnar import ColumnarSeries
+from aiops.ingest_data import assemble, convert_csv, format_openmetrics, read_series
+
+T0_MS = 1_388_534_400_000    # 2014-01-01 00:00:00 UTC
+STEP_MS = 300_000
+
+def stamp(i):
+    return f"2014-01-01 {i * 5 // 60:02d}:{i * 5 % 60:02d}:00"
+
+def write_csv(path, rows):
+    with open(path, "w") as fh:
+        fh.write("timestamp,value\n")
+        fh.writelines(f"{t},{v}\n" for t, v in rows)
+    return str(path)
+
+def ingest_args(path, output, **overrides):
+    args = {"input": path, "output": output, "format": "columnar", "workers": 1,
+            "block_range": None, "shift": "none", "metric": None, "time_format": None,
+            "manifest": None, "full": False}
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+def test_read_series_sorts_dedups_and_drops_bad_rows(tmp_path):
+    path = write_csv(tmp_path / "a.csv", [(stamp(2), 3), (stamp(0), 1), ("garbage", 9),
+                                          (stamp(1), "nan"), (stamp(2), 4), (stamp(1), 2)])
+    ts, vals = read_series(path, shift='none')
+    assert ts.tolist() == [T0_MS, T0_MS + STEP_MS, T0_MS + 2 * STEP_MS]
+    assert vals.tolist() == [1.0, 2.0, 4.0]
+
+def test_read_series_shifts_keep_spacing(tmp_path):
+    path = write_csv(tmp_path / "a.csv", [(stamp(i), i) for i in range(3)])
+    ts, _ = read_series(path, shift='now', now_ms=2_000_000_000_000)
+    assert ts.tolist() == [2_000_000_000_000 - 2 * STEP_MS, 2_000_000_000_000 - STEP_MS,
+                           2_000_000_000_000]
+    ts, _ = read_series(path, shift='year')
+    assert np.diff(ts).tolist() == [STEP_MS, STEP_MS]
+    ts, _ = read_series(path, offset_ms=1000)
+    assert ts[0] == T0_MS + 1000
+    with pytest.raises(ValueError, match="shift"):
+        read_series(path, shift='week')
+
+def test_format_openmetrics_seconds_and_millis():
+    vals = np.array([1.5, 2.0])
+    assert format_openmetrics(np.array([1000, 2000]), vals, "m ") == "m 1.5 1\nm 2.0 2\n"
+    assert format_openmetrics(np.array([1005, 2000]), vals, "m ") == "m 1.5 1.005\nm 2.0 2.000\n"
+
+def test_convert_and_assemble_blocks(tmp_path):
+    a = write_csv(tmp_path / "a.csv", [(stamp(i), i) for i in range(24)])
+    b = write_csv(tmp_path / "b.csv", [(stamp(i), -i) for i in range(12)])
+    hour = 3_600_000
+    results = [convert_csv(p, str(tmp_path / f"{i}.part"), metric="cpu",
+                           series={"instance": name}, shift='none', block_ms=hour)
+               for i, (p, name) in enumerate([(a, "a"), (b, "b")])]
+    assert [r["rows"] for r in results] == [24, 12]
+    assert [start for start, _, _ in results[0]["blocks"]] == [T0_MS, T0_MS + hour]
+    assert (results[0]["first_ts"], results[0]["last_ts"]) == (T0_MS, T0_MS + 23 * STEP_MS)
+
+    written = assemble(results, str(tmp_path / "out.om"), "cpu", hour)
+    assert [os.path.basename(p) for p in written] == \
+        [f"out-{T0_MS // 1000}.om", f"out-{T0_MS // 1000 + 3600}.om"]
+    with open(written[0]) as fh:
+        lines = fh.read().splitlines()
+    assert lines[0] == "# TYPE cpu gauge" and lines[-1] == "# EOF"
+    assert lines[1] == f'cpu{{instance="a"}} 0.0 {T0_MS // 1000}'
+    assert len(lines) == 2 + 12 + 12
+    assert lines[13].startswith('cpu{instance="b"} 0.0 ')    # series stay contiguous
+
+def test_convert_after_ms_appends_to_columnar(tmp_path):
+    path = write_csv(tmp_path / "a.csv", [(stamp(i), i) for i in range(10)])
+    col = str(tmp_path / "a.col")
+    convert_csv(path, col, 'columnar', shift='none')
+    write_csv(tmp_path / "a.csv", [(stamp(i), i) for i in range(15)])
+    result = convert_csv(path, col, 'columnar', offset_ms=0, after_ms=T0_MS + 9 * STEP_MS)
+    assert (result["rows"], result["first_ts"]) == (5, T0_MS + 10 * STEP_MS)
+    with ColumnarSeries(col) as s:
+        assert s.values.tolist() == list(map(float, range(15)))
+
+def test_manifest_skips_unchanged_and_converts_appended_rows(tmp_path, capsys):
+    src = tmp_path / "csv"
+    src.mkdir()
+    a = write_csv(src / "a.csv", [(stamp(i), i) for i in range(10)])
+    write_csv(src / "b.csv", [(stamp(i), i) for i in range(10)])
+    out = str(tmp_path / "col")
+
+    ingest_data.run(ingest_args(str(src), out))
+    ingest_data.run(ingest_args(str(src), out))
+    assert "nothing to do" in capsys.readouterr().out
+
+    with open(a, "a") as fh:
+        fh.writelines(f"{stamp(i)},{i}\n" for i in range(10, 14))
+    ingest_data.run(ingest_args(str(src), out))
+    assert "Converting 1 file(s)" in capsys.readouterr().out
+    with ColumnarSeries(os.path.join(out, "a.col")) as s:
+        assert s.values.tolist() == list(map(float, range(14)))
+    entry = ingest_data.Manifest(f"{out}.manifest.json").entry(a)
+    assert (entry["rows"], entry["last_written_ts"]) == (14, T0_MS + 13 * STEP_MS)
+
+def test_interrupted_columnar_run_redoes_only_unfinished_files(tmp_path, monkeypatch, capsys):
+    src = tmp_path / "csv"
+    src.mkdir()
+    for name in "abc":
+        write_csv(src / f"{name}.csv", [(stamp(i), i) for i in range(10)])
+    out = str(tmp_path / "col")
+    convert = ingest_data.convert_csv
+
+    def crash_on_c(csv_path, *args, **kwargs):
+        if csv_path.endswith("c.csv"):
+            raise KeyboardInterrupt
+        return convert(csv_path, *args, **kwargs)
+    monkeypatch.setattr(ingest_data, "convert_csv", crash_on_c)
+    with pytest.raises(KeyboardInterrupt):
+        ingest_data.run(ingest_args(str(src), out))
+    monkeypatch.setattr(ingest_data, "convert_csv", convert)
+
+    ingest_data.run(ingest_args(str(src), out))
+    assert "Converting 1 file(s)" in capsys.readouterr().out
+    assert sorted(os.listdir(out)) == ["a.col", "b.col", "c.col"]
+
+def test_openmetrics_output_holds_only_new_samples(tmp_path):
+    a = write_csv(tmp_path / "a.csv", [(stamp(i), i) for i in range(10)])
+    out = str(tmp_path / "metrics.om")
+    ingest_data.run(ingest_args(a, out, format="openmetrics"))
+    with open(a, "a") as fh:
+        fh.write(f"{stamp(10)},10\n")
+    ingest_data.run(ingest_args(a, out, format="openmetrics"))
+    with open(out) as fh:
+        assert fh.read().splitlines()[1:-1] == \
+            [f'numenta_cpu_aws{{job="numenta_import",instance="cloudwatch_benchmark"}} '
+             f'10.0 {(T0_MS + 10 * STEP_MS) // 1000}']
+    ingest_data.run(ingest_args(a, out, format="openmetrics", full=True))
+    with open(out) as fh:
+        assert len(fh.read().splitlines()) == 2 + 11
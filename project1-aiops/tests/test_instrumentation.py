@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from aiops.instrumentation import BUCKETS, StageStats, make_registry, report, stage, summary
+
+def test_stage_stats_aggregate_and_merge():
+    stats = StageStats()
+    stats.record("push", 0.002, rows=10, bytes=100)
+    stats.record("push", 0.2, rows=5)
+    stats.retry("push", 2)
+    entry = stats.snapshot()["push"]
+    assert (entry["count"], entry["rows"], entry["bytes"], entry["retries"]) == (2, 15, 100, 2)
+    assert entry["seconds"] == pytest.approx(0.202) and entry["max_seconds"] == 0.2
+    assert sum(entry["buckets"]) == 2
+    assert entry["buckets"][BUCKETS.index(0.0025)] == entry["buckets"][BUCKETS.index(0.25)] == 1
+
+    worker = StageStats()
+    worker.record("push", 0.5, rows=1)
+    worker.record("parse", 0.01)
+    stats.merge(worker.drain())
+    assert worker.snapshot() == {}
+    merged = stats.snapshot()
+    assert (merged["push"]["count"], merged["push"]["rows"]) == (3, 16)
+    assert merged["push"]["max_seconds"] == 0.5 and merged["parse"]["count"] == 1
+
+def test_nested_stages_are_timed_separately_and_on_error():
+    stats = StageStats()
+    with stage("outer", stats=stats) as outer:
+        with stage("inner", rows=3, stats=stats) as inner:
+            time.sleep(0.01)
+            inner.add(rows=2, bytes=7)
+        outer.add(bytes=1)
+    with pytest.raises(ValueError):
+        with stage("inner", stats=stats):
+            raise ValueError
+    snap = stats.snapshot()
+    assert snap["outer"]["seconds"] >= snap["inner"]["seconds"] > 0
+    assert outer.seconds >= inner.seconds >= 0.01
+    assert (snap["inner"]["count"], snap["inner"]["rows"], snap["inner"]["bytes"]) == (2, 5, 7)
+    assert summary(stats).startswith("inner 2x ")
+    assert report(stats)["outer"]["bytes"] == 1
+
+def test_stage_collector_exposes_histograms_and_counters():
+    stats = StageStats()
+    stats.record("decode", 0.003, rows=8, bytes=64)
+    stats.record("decode", 7.0)
+    stats.retry("decode")
+    registry = make_registry(stats)
+
+    def sample(name, **labels):
+        return registry.get_sample_value(name, dict(stage="decode", **labels))
+    assert sample("aiops_stage_seconds_count") == 2
+    assert sample("aiops_stage_seconds_sum") == pytest.approx(7.003)
+    assert sample("aiops_stage_seconds_bucket", le="0.0025") == 0
+    assert sample("aiops_stage_seconds_bucket", le="0.005") == 1
+    assert sample("aiops_stage_seconds_bucket", le="10.0") == 2
+    assert sample("aiops_stage_seconds_bucket", le="+Inf") == 2
+    assert sample("aiops_stage_rows_total") == 8
+    assert sample("aiops_stage_bytes_total") == 64
+    assert sample("aiops_stage_retries_total") == 1
@@ -0,0 +1,88 @@
+import json
+import os
+
+import pytest
+
+from aiops.manifest import APPENDED, CHANGED, NEW, PARTIAL, UNCHANGED, Manifest
+from aiops.nab_to_vm import process_dir
+
+def write(path, text, mode="w"):
+    with open(path, mode) as fh:
+        fh.write(text)
+    return str(path)
+
+@pytest.fixture
+def manifest(tmp_path):
+    return Manifest(str(tmp_path / "manifest.json"), autosave_interval=0)
+
+def test_status_skip_append_and_change(tmp_path, manifest):
+    src = write(tmp_path / "a.csv", "one\n")
+    assert manifest.status(src, "converted") == NEW
+    manifest.begin(src, None)
+    manifest.update(src, converted=True)
+    assert manifest.status(src, "converted") == UNCHANGED
+    os.utime(src, ns=(1, 1))    # touched only: still unchanged, new mtime remembered
+    assert manifest.status(src, "converted") == UNCHANGED
+    assert manifest.entry(src)["mtime_ns"] == 1
+
+    write(src, "two\n", "a")
+    assert manifest.status(src, "converted") == APPENDED
+    assert manifest.status(src, "pushed") == CHANGED    # never pushed, nothing to resume
+    write(src, "ONE\ntwo\nthree\n")
+    assert manifest.status(src, "converted") == CHANGED
+
+def test_reload_from_disk(tmp_path, manifest):
+    src = write(tmp_path / "a.csv", "one\n")
+    manifest.begin(src, None, rows=3)
+    again = Manifest(manifest.path)
+    assert again.entry(src)["rows"] == 3
+    write(manifest.path, json.dumps({"version": -1, "files": {"x": {}}}))
+    assert Manifest(manifest.path).files == {}
+
+def test_acks_record_only_the_contiguous_prefix(tmp_path, manifest):
+    src = write(tmp_path / "a.csv", "one\n")
+    manifest.begin(src, None)
+    tracker = manifest.tracker(src)
+    batches = [tracker.next_index() for _ in range(4)]
+    assert batches == [0, 1, 2, 3]
+    tracker.ack(1, 200)
+    assert manifest.entry(src)["last_pushed_ts"] is None
+    tracker.ack(0, 100)
+    tracker.ack(3, 400)
+    entry = manifest.entry(src)
+    assert (entry["last_acked_batch"], entry["last_pushed_ts"]) == (1, 200)
+    tracker.fail(2)
+    tracker.seal()
+    assert not manifest.entry(src)["pushed"]
+
+    # the next run resumes after batch 1 and numbers its batches from 2
+    write(src, "two\n", "a")
+    assert manifest.status(src, "pushed") == PARTIAL
+    entry = manifest.begin(src, PARTIAL)
+    assert (entry["last_acked_batch"], entry["last_pushed_ts"]) == (1, 200)
+    tracker = manifest.tracker(src)
+    assert tracker.next_index() == 2
+    tracker.ack(2, 300)
+    tracker.seal()
+    entry = manifest.entry(src)
+    assert entry["pushed"] and entry["last_pushed_ts"] == 300
+    assert Manifest(manifest.path).entry(src)["pushed"]
+
+def test_begin_resets_the_checkpoint_of_a_changed_file(tmp_path, manifest):
+    src = write(tmp_path / "a.csv", "one\n")
+    manifest.begin(src, None)
+    manifest.update(src, last_acked_batch=4, last_pushed_ts=500)
+    entry = manifest.begin(src, CHANGED)
+    assert (entry["last_acked_batch"], entry["last_pushed_ts"]) == (-1, None)
+
+def test_process_dir_saves_manifest_when_push_fails(tmp_path, stub_sink):
+    src = tmp_path / "csv"
+    src.mkdir()
+    write(src / "h.csv", "timestamp,value\n2014-01-01 00:00:00,1\n2014-01-01 00:05:00,2\n")
+    out = tmp_path / "out"
+    with pytest.raises(RuntimeError, match="503"):
+        process_dir(str(src), str(out), stub_sink(fail_first=10).url, True, "nab", 1,
+                    "%Y-%m-%d %H:%M:%S", retries=0)
+    with open(out / "manifest.json") as fh:
+        entry = json.load(fh)["files"][os.path.abspath(src / "h.csv")]
+    assert entry["converted"] and not entry["pushed"]
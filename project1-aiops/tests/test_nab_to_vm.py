@@ -0,0 +1,83 @@
+import glob
+import os
+
+import pytest
+
+from aiops.config import PROJECT_DIR
+from aiops.instrumentation import STATS
+from aiops.nab_to_vm import BatchPusher, csv_to_arrays, csv_to_lines, csv_to_lp_chunks
+
+def payload(i, n=10):
+    return "".join(f"cpu,host=h{i} value={j} {j}\n" for j in range(n)).encode()
+
+def test_flaky_sink_is_retried_with_backoff(stub_sink):
+    sink = stub_sink(fail_first=2)
+    pusher = BatchPusher(sink.url, max_in_flight=1, retries=3, backoff=0.01)
+    pusher.submit(payload(0), 10)
+    pusher.close()
+    stats = sink.stats()
+    assert pusher.retried == 2
+    assert (pusher.batches, pusher.lines) == (1, 10)
+    assert stats["failed"] == 2
+    assert (stats["requests"], stats["lines"], stats["gzip"]) == (1, 10, 1)
+    assert stats["bytes"] == len(payload(0))
+
+def test_retries_are_bounded(stub_sink):
+    sink = stub_sink(fail_first=10)
+    pusher = BatchPusher(sink.url, max_in_flight=1, retries=2, backoff=0.01)
+    acks = []
+    pusher.submit(payload(0), 10, on_done=acks.append)
+    with pytest.raises(RuntimeError, match="503"):
+        pusher.close()
+    assert sink.stats()["failed"] == 3
+    assert acks == [False]
+
+def test_in_flight_batches_are_bounded(stub_sink):
+    sink = stub_sink(delay=0.05)
+    pusher = BatchPusher(sink.url, max_in_flight=3, use_gzip=False)
+    for i in range(12):
+        pusher.submit(payload(i), 10)
+    pusher.close()
+    stats = sink.stats()
+    assert (stats["requests"], stats["lines"], stats["gzip"]) == (12, 120, 0)
+    assert stats["max_in_flight"] == 3
+
+NAB_TIME_FMT = "%Y-%m-%d %H:%M:%S"
+
+def vectorized_lines(path, prefix, host, chunk_size):
+    return b"".join(data for _, data, _ in
+                    csv_to_lp_chunks(path, prefix, host, NAB_TIME_FMT, chunk_size))
+
+def legacy_lines(path, prefix, host):
+    lines = csv_to_lines(path, prefix, host, NAB_TIME_FMT)
+    return "".join(f"{line}\n" for line in lines).encode()
+
+@pytest.mark.parametrize("path", sorted(glob.glob(
+    os.path.join(PROJECT_DIR, "data", "nab", "realAWSCloudwatch", "*.csv")))[:3])
+def test_lp_chunks_match_csv_to_lines_on_nab(path):
+    assert vectorized_lines(path, "nab", "h", 1000) == legacy_lines(path, "nab", "h")
+
+def test_lp_chunks_match_csv_to_lines_on_edge_cases(tmp_path):
+    path = tmp_path / "edge.csv"
+    path.write_text("timestamp,value\n"
+                    "2014-01-01 00:00:00,5\n"
+                    "2014-01-01 00:05:00, 0.1\n"
+                    "2014-01-01 00:10:00,\n"
+                    "2014-01-01 00:15:00,abc\n"
+                    ",3\n"
+                    "2014-01-01 00:20:00,1e-07\n"
+                    "2014-01-01 00:25:00,123456789.123456789\n"
+                    "2014-01-01 00:30:00,-2.5\n")
+    for chunk_size in (1, 2, 100):
+        assert vectorized_lines(str(path), "my metric", "a,b=c", chunk_size) == \
+            legacy_lines(str(path), "my metric", "a,b=c")
+
+def test_parse_stage_counts_only_parsed_chunks(tmp_path):
+    path = tmp_path / "h.csv"
+    path.write_text("timestamp,value\n" + "".join(f"2014-01-01 00:{i:02d}:00,{i}\n"
+                                                   for i in range(10)))
+    STATS.drain()
+    chunks = list(csv_to_arrays(str(path), NAB_TIME_FMT, chunk_size=4))
+    assert [len(vals) for _, vals in chunks] == [4, 4, 2]
+    parse = STATS.drain()["parse"]
+    assert (parse["count"], parse["rows"]) == (3, 10)
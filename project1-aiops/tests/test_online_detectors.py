@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aiops.analyze_anomalies import detect_anomalies_streaming
+from aiops.online_detectors import (EWMADetector, OnlineDetector, RollingRobustZDetector,
+                                    StreamingScorer, make_detector)
+
+def stream(n=200, seed=0):
+    return 10 + np.random.default_rng(seed).normal(0, 1, n)
+
+def test_ewma_warmup_and_spike():
+    detector = EWMADetector(alpha=0.1, warmup=30)
+    scores = detector.score_many(stream(100))
+    assert (scores[:30] == 0).all() and (scores[30:] < 5).all()
+    assert detector.update(30.0) > 10
+    assert abs(detector.mean - 10) < 3
+
+def test_nan_scores_nan_and_leaves_state_alone():
+    for kind in ("ewma", "zscore", "robust_z"):
+        detector = make_detector(kind, warmup=5)
+        detector.score_many(stream(20))
+        state = detector.get_state()
+        assert np.isnan(detector.update(float("nan")))
+        assert detector.get_state() == state
+
+@pytest.mark.parametrize("kind", ["ewma", "zscore", "robust_z"])
+def test_state_round_trip_continues_the_stream(kind):
+    values = stream(300)
+    whole = make_detector(kind, warmup=10).score_many(values)
+    first = make_detector(kind, warmup=10)
+    head = first.score_many(values[:150])
+    restored = OnlineDetector.from_state(json.loads(json.dumps(first.get_state())))
+    np.testing.assert_allclose(np.concatenate([head, restored.score_many(values[150:])]), whole)
+
+def test_robust_window_stays_sorted_and_ignores_spikes():
+    detector = RollingRobustZDetector(window=50, warmup=10)
+    values = stream(120)
+    values[60:63] = 1000    # a burst barely moves the median / IQR
+    scores = detector.score_many(values)
+    assert len(detector.buf) == 50 and detector.sorted == sorted(detector.buf)
+    assert scores[61] > 100 and scores[62] > 100
+    assert scores[70:].max() < 5
+
+def test_unknown_detector_and_abstract_base():
+    with pytest.raises(ValueError, match="Unknown detector"):
+        make_detector("lof")
+    with pytest.raises(TypeError):
+        OnlineDetector()
+
+def test_scorer_scores_only_points_after_the_watermark():
+    ts = 1_700_000_000 + 300 * np.arange(100, dtype=float)
+    values = stream(100)
+    scorer = StreamingScorer("ewma", warmup=5)
+    new_ts, scores = scorer.update("a", ts[:60], values[:60])
+    assert len(new_ts) == len(scores) == 60
+    new_ts, scores = scorer.update("a", ts[40:80], values[40:80])
+    np.testing.assert_array_equal(new_ts, ts[60:80])
+    assert scorer.update("a", ts[:80], values[:80])[0].size == 0
+    assert scorer.watermarks == {"a": ts[79]}
+
+    restored = StreamingScorer.from_state(json.loads(json.dumps(scorer.get_state())))
+    expected = scorer.update("a", ts, values)
+    got = restored.update("a", ts, values)
+    np.testing.assert_array_equal(got[0], ts[80:])
+    np.testing.assert_allclose(got[1], expected[1])
+    assert len(restored.update("b", ts, values)[0]) == 100    # series are independent
+
+def test_detect_anomalies_streaming_returns_only_newer_rows():
+    ts = pd.to_datetime(1_700_000_000 + 300 * np.arange(50), unit="s")
+    data = pd.DataFrame({"timestamp": ts, "value": stream(50)})
+    scorer = StreamingScorer("robust_z", warmup=5)
+    first = detect_anomalies_streaming(data.iloc[:30].sample(frac=1, random_state=0), scorer)
+    assert first["timestamp"].is_monotonic_increasing and len(first) == 30
+    second = detect_anomalies_streaming(data.iloc[20:], scorer)
+    assert second["timestamp"].tolist() == ts[30:].tolist()
+    assert second["anomaly_score"].notna().all()
@@ -0,0 +1,77 @@
+import json
+
+import numpy as np
+import pytest
+
+from aiops.query_client import (QueryError, Series, decode_export, decode_matrix, floor_step,
+                                iter_decode_matrix, split_range, stitch)
+
+RESULT = [
+    {"metric": {"__name__": "cpu", "job": "values"}, "values": [[1, "1.5"], [2, "NaN"]]},
+    {"metric": {"job": "a}b", "note": "\"values\":[[9,\"9\"]]"}, "values": [[3, "+Inf"]]},
+    {"metric": {}, "values": []},
+]
+
+def body(result=RESULT, result_type="matrix", **dump):
+    return json.dumps({"status": "success",
+                       "data": {"resultType": result_type, "result": result}}, **dump).encode()
+
+def check(series):
+    assert [s.labels for s in series] == [r["metric"] for r in RESULT]
+    np.testing.assert_array_equal(series[0].timestamps, [1.0, 2.0])
+    np.testing.assert_array_equal(series[0].values, [1.5, np.nan])
+    np.testing.assert_array_equal(series[1].values, [np.inf])
+    assert len(series[2].timestamps) == 0
+
+@pytest.mark.parametrize("dump", [{"separators": (",", ":")}, {}, {"indent": 2}])
+def test_decode_matrix_layouts(dump):
+    check(decode_matrix(body(**dump)))
+
+@pytest.mark.parametrize("dump", [{"separators": (",", ":")}, {"indent": 2}])
+@pytest.mark.parametrize("size", [1, 7, 1 << 20])
+def test_iter_decode_matrix_chunks(dump, size):
+    data = body(**dump)
+    check(list(iter_decode_matrix(data[i:i + size] for i in range(0, len(data), size))))
+
+def test_non_matrix_result_is_an_error():
+    with pytest.raises(QueryError):
+        decode_matrix(body([], result_type="vector", separators=(",", ":")))
+    with pytest.raises(QueryError):
+        decode_matrix(body([], result_type="vector", indent=2))
+    with pytest.raises(QueryError):
+        decode_matrix(b'{"status":"error","error":"bad query"}')
+
+def test_decode_export_labels_named_values():
+    line = json.dumps({"metric": {"job": "values", "x": "\"timestamps\":[5]"},
+                       "values": [1, 2], "timestamps": [2000, 1000]}).encode()
+    [series] = decode_export([line])
+    assert series.labels["job"] == "values"
+    np.testing.assert_array_equal(series.timestamps, [1.0, 2.0])
+    np.testing.assert_array_equal(series.values, [2.0, 1.0])
+
+def grid_points(ranges, step):
+    return np.concatenate([a + step * np.arange((b - a) // step + 1) for a, b in ranges])
+
+def test_split_range_aligns_start_to_the_step():
+    ranges = split_range(1001, 5000, 300, max_points=4)
+    assert ranges[0][0] == 900 == floor_step(1001, 300)
+    assert all(a % 300 == 0 for a, _ in ranges)
+    # every grid point once: no overlap or gap between the pieces
+    np.testing.assert_array_equal(grid_points(ranges, 300), np.arange(900, 5001, 300))
+
+def test_split_range_uneven_last_chunk():
+    ranges = split_range(0, 3000, 300, max_points=4)
+    assert ranges == [(0, 900), (1200, 2100), (2400, 3000)]
+    assert split_range(0, 3600, 300, max_points=4)[-1] == (3600, 3600)
+    assert split_range(0, 600, 300, max_points=11000) == [(0, 600)]
+
+def test_stitch_dedups_boundary_points_per_label_set():
+    a = {"host": "a", "job": "x"}
+    parts = [[Series(a, np.array([0.0, 300.0]), np.array([1.0, 2.0])),
+              Series({"host": "b"}, np.array([0.0]), np.array([5.0]))],
+             [Series(dict(reversed(a.items())), np.array([300.0, 600.0]), np.array([9.0, 3.0]))]]
+    merged = stitch(parts)
+    assert [s.labels for s in merged] == [a, {"host": "b"}]
+    np.testing.assert_array_equal(merged[0].timestamps, [0, 300, 600])
+    np.testing.assert_array_equal(merged[0].values, [1, 2, 3])    # first copy of 300 kept
+    assert stitch([]) == []
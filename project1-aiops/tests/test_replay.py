@@ -0,0 +1,88 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from aiops import replay
+from aiops.instrumentation import STATS
+from aiops.replay import load_hosts, replay_bulk, replay_host
+
+def write_csv(path, n):
+    rows = "".join(f"2014-01-01 {i // 12:02d}:{i % 12 * 5:02d}:00,{i}\n" for i in range(n))
+    path.write_text("timestamp,value\n" + rows)
+    return str(path)
+
+@pytest.fixture
+def inputs(tmp_path):
+    return [write_csv(tmp_path / "a.csv", 10), write_csv(tmp_path / "b.csv", 6)]
+
+def test_load_hosts_cycles_and_rotates(inputs):
+    hosts = load_hosts(inputs, n_hosts=3)
+    assert [h[0] for h in hosts] == ["a", "b", "a-1"]
+    assert abs(hosts[0][1][-1] / 1000 - time.time()) < 5    # moved to end now
+    np.testing.assert_array_equal(hosts[2][1], hosts[0][1])
+    np.testing.assert_array_equal(hosts[2][2], np.roll(hosts[0][2], 7919 % 10))
+
+def test_bulk_replay_into_the_stub_sink(inputs, stub_sink):
+    sink = stub_sink()
+    hosts = load_hosts(inputs, n_hosts=3)
+    pusher = replay_bulk(hosts, sink.url, batch_size=4, max_in_flight=2)
+    stats = sink.stats()
+    assert (stats["requests"], stats["lines"]) == (3 + 2 + 3, 10 + 6 + 10)
+    assert stats["gzip"] == stats["requests"]
+    assert (pusher.batches, pusher.lines) == (8, 26)
+
+class FakeClock:
+    """Stands in for the event loop's clock and asyncio.sleep: sleeping only advances time."""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+class Client:
+    def __init__(self, clock, latency=0.0):
+        self.clock, self.latency, self.sent = clock, latency, []
+
+    async def post(self, url, content):
+        self.sent.append((self.clock.now, content))
+        self.clock.now += self.latency
+        return SimpleNamespace(raise_for_status=lambda: None)
+
+def replay_one(monkeypatch, latency=0.0, stop=None, repeat=False):
+    clock = FakeClock()
+    monkeypatch.setattr(replay, "asyncio", SimpleNamespace(get_running_loop=lambda: clock,
+                                                           sleep=clock.sleep))
+    client = Client(clock, latency)
+    ts = 300_000 * np.arange(5)    # 5-minute samples: 5 s apart at speedup 60
+    counts = {"sent": 0, "errors": 0}
+    asyncio.run(replay_host(client, "http://pgw", "h", ts, np.arange(5.0), "cpu ", 60.0,
+                            100.0, stop, repeat, counts))
+    assert counts == {"sent": len(client.sent), "errors": 0}
+    return client.sent
+
+def test_realtime_sends_on_fixed_deadlines(monkeypatch):
+    sent = replay_one(monkeypatch)
+    assert [t for t, _ in sent] == [100, 105, 110, 115, 120]
+    assert [body for _, body in sent][:2] == [b"cpu 0.0\n", b"cpu 1.0\n"]
+    # slow requests do not push the later deadlines back
+    assert [t for t, _ in replay_one(monkeypatch, latency=2.0)] == [100, 105, 110, 115, 120]
+
+def test_realtime_late_sends_record_lag(monkeypatch):
+    STATS.drain()
+    sent = replay_one(monkeypatch, latency=7.0)
+    assert [t for t, _ in sent] == [100, 107, 114, 121, 128]
+    lag = STATS.drain()["lag"]
+    assert lag["count"] == 5 and lag["max_seconds"] == pytest.approx(8.0)
+
+def test_realtime_stop_and_repeat(monkeypatch):
+    assert [t for t, _ in replay_one(monkeypatch, stop=112.0)] == [100, 105, 110]
+    # the series starts over one step after its last sample
+    assert [t for t, _ in replay_one(monkeypatch, stop=131.0, repeat=True)] == \
+        [100, 105, 110, 115, 120, 125, 130]
@@ -0,0 +1,26 @@
+import numpy as np
+
+from aiops.query_client import Series, parse_time
+from aiops.triage import rank_series
+
+def test_rank_series_flags_the_shifted_host_with_rfc3339_shift_time():
+    step, n = 300, 2016
+    ts = 1_700_000_000 + step * np.arange(n, dtype=float)
+    rng = np.random.default_rng(0)
+    calm = 50 + rng.normal(0, 1, n)
+    shifted = 50 + rng.normal(0, 1, n)
+    shifted[1500:] += 30
+    ranked = rank_series([Series({"host": "calm"}, ts, calm),
+                          Series({"host": "shifted"}, ts, shifted)], ts[0], ts[-1], step)
+    assert [r["host"] for r in ranked] == ["shifted", "calm"]
+    top = ranked[0]
+    assert top["shift_time"].endswith("Z")
+    assert abs(parse_time(top["shift_time"]) - ts[1500]) <= step
+
+def test_rank_series_floors_start_to_the_step():
+    step = 300
+    ts = 1_700_000_100 + step * np.arange(40, dtype=float)    # on the 300 s grid
+    series = [Series({"host": "a"}, ts, np.arange(40.0)), Series({"host": "b"}, ts, np.ones(40))]
+    # an unaligned start must not shift the grid off the points fetch_range returns
+    aligned = rank_series(series, ts[0], ts[-1], step)
+    assert rank_series(series, ts[0] + 120, ts[-1], step) == aligned
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import numpy as np
+
+from aiops.query_client import Series
+from aiops.ts_cache import SeriesCache
+
+STEP = 300.0
+END = (time.time() // STEP - 100) * STEP
+
+def fetcher(calls, value=1.0, labels=None):
+    def fetch(start, stop):
+        calls.append((start, stop))
+        ts = np.arange(start, stop + 1, STEP)
+        return [Series(labels or {"host": "a"}, ts, np.full(len(ts), value))]
+    return fetch
+
+def test_extra_params_are_part_of_the_key(tmp_path):
+    cache = SeriesCache(str(tmp_path), settle_seconds=0)
+    calls = []
+    for limit in (100, 5, 100):
+        [series] = cache.get("http://vm", "cpu", END - 3000, END, STEP,
+                             fetcher(calls, limit, {"limit": str(limit)}), params={"limit": limit})
+        assert series.labels == {"limit": str(limit)}
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+def test_partial_hit_fetches_only_the_gap(tmp_path):
+    cache = SeriesCache(str(tmp_path), settle_seconds=0)
+    calls = []
+    cache.get("http://vm", "cpu", END - 3000, END - 1500, STEP, fetcher(calls))
+    [series] = cache.get("http://vm", "cpu", END - 3000, END, STEP, fetcher(calls))
+    assert calls == [(END - 3000, END - 1500), (END - 1500 + STEP, END)]
+    np.testing.assert_array_equal(series.timestamps, np.arange(END - 3000, END + 1, STEP))
+    stats = cache.stats()
+    assert (stats["misses"], stats["partial_hits"], stats["hits"]) == (1, 1, 0)
+
+def test_unsettled_points_are_returned_but_not_cached(tmp_path):
+    cache = SeriesCache(str(tmp_path), settle_seconds=600)
+    now = (time.time() // STEP) * STEP
+    calls = []
+    for _ in range(2):
+        [series] = cache.get("http://vm", "cpu", now - 3000, now, STEP, fetcher(calls))
+        assert series.timestamps[-1] == now
+    assert calls[1][0] > now - 3000
+
+def test_segments_are_compacted(tmp_path):
+    cache = SeriesCache(str(tmp_path), settle_seconds=0, max_segments=2)
+    calls = []
+    for i in range(4):
+        cache.get("http://vm", "cpu", END - 3000 + i * 900, END - 2700 + i * 900, STEP,
+                  fetcher(calls))
+    path = tmp_path / SeriesCache.key("http://vm", "cpu", STEP)
+    assert len(list(path.glob("*.ts.npy"))) <= 2
+    [series] = cache.get("http://vm", "cpu", END - 3000, END, STEP, fetcher(calls))
+    assert len(series.timestamps) == len(np.unique(series.timestamps))
+    assert len(calls) == 7    # 4 misses, then only the 3 uncovered gaps
+
+def test_least_recently_used_keys_are_evicted(tmp_path):
+    calls = []
+    probe = SeriesCache(str(tmp_path / "probe"), settle_seconds=0)
+    probe.get("http://vm", "probe", END - 3000, END, STEP, fetcher(calls))
+    size = probe.stats()["bytes_on_disk"]
+
+    cache = SeriesCache(str(tmp_path / "cache"), max_bytes=2 * size, settle_seconds=0)
+    for query in ("a", "b"):
+        cache.get("http://vm", query, END - 3000, END, STEP, fetcher(calls))
+        time.sleep(0.01)
+    cache.get("http://vm", "a", END - 3000, END, STEP, fetcher(calls))    # a is now newer than b
+    time.sleep(0.01)
+    cache.get("http://vm", "c", END - 3000, END, STEP, fetcher(calls))
+    assert cache.stats()["bytes_on_disk"] == 2 * size
+    assert not (tmp_path / "cache" / SeriesCache.key("http://vm", "b", STEP)).exists()
+    del calls[:]
+    cache.get("http://vm", "a", END - 3000, END, STEP, fetcher(calls))
+    assert calls == []
+    # a fresh instance reads the same usage from disk
+    assert SeriesCache(str(tmp_path / "cache")).stats()["bytes_on_disk"] == 2 * size
+
+def test_fetch_runs_without_the_lock(tmp_path):
+    cache = SeriesCache(str(tmp_path), settle_seconds=0)
+    entered, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_fetch(start, stop):
+        entered.set()
+        release.wait(5)
+        return fetcher(calls)(start, stop)
+
+    worker = threading.Thread(target=cache.get,
+                              args=("http://vm", "slow", END - 3000, END, STEP, slow_fetch))
+    worker.start()
+    assert entered.wait(5)
+    t0 = time.perf_counter()
+    cache.get("http://vm", "fast", END - 3000, END, STEP, fetcher(calls))
+    assert time.perf_counter() - t0 < 1
+    release.set()
+    worker.join()
+    assert cache.stats()["misses"] == 2